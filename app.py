@@ -1,18 +1,31 @@
+import time
+
+_STARTUP_BEGAN = time.perf_counter()
+
 import os
 import shutil
 import threading
 import customtkinter as ctk
 from tkinter import filedialog, messagebox, Tk, Label
 from tkinter import PhotoImage
-from natsort import natsorted
 import sys
 from datetime import datetime
 
 from manga_translator.translator import MangaTranslator
 from manga_translator.memory import TranslationMemory
+from manga_translator.archive import list_archives, output_archive_name, translate_archive
+from manga_translator.batch import archive_error, list_image_files
+from manga_translator.encoder import DEFAULT_JPEG_QUALITY, DEFAULT_WEBP_QUALITY, output_filename
+from manga_translator.manifest import RunManifest, config_version, file_hash
+from manga_translator.pipeline import PagePipeline
+from manga_translator.service import ServiceClient, ServiceError
+from manga_translator.watch import FolderWatcher, pending_pages, translate_as_they_land
 from db_editor import DatabaseEditorWindow
 import config_manager
 
+# Nothing above pulls in torch, ultralytics, manga_ocr or google.cloud; those load on the warm-up thread.
+_IMPORTS_SECONDS = time.perf_counter() - _STARTUP_BEGAN
+
 APP_DIR = os.path.dirname(os.path.abspath(__file__))
 DEB_LOG_FILE = os.path.join(APP_DIR, "deb.log")
 
@@ -68,12 +81,23 @@ class App(ctk.CTk):
         self.output_folder = ctk.StringVar(value=os.path.abspath("output"))
         self.api_key_path = ctk.StringVar()
         self.is_translating = False
+        self.is_watching = False
+        self.watch_stop = threading.Event()
         self.db_editor_window = None
         self.translator_instance = None
-
+        # Set when config.json names a running translation service; pages are then sent there.
+        self.service_client = None
+        # Set once the warm-up thread has finished, whether or not the models loaded.
+        self.engine_ready = threading.Event()
+        self.startup_status = "Loading..."
+        self.startup_timings = [("imports", _IMPORTS_SECONDS)]
+
+        window_start = time.perf_counter()
         self.create_widgets()
         self.load_initial_config()
+        self.startup_timings.append(("window", time.perf_counter() - window_start))
         log_to_deb_file("=== App.__init__ FINISHED ===")
+        self.start_warm_up()
 
     def set_window_icon(self):
         try:
@@ -129,7 +153,12 @@ class App(ctk.CTk):
         out_button.grid(row=1, column=2, padx=10, pady=10)
         self.start_button = ctk.CTkButton(translate_tab, text="Start Translation", font=ctk.CTkFont(size=18),
                                           command=self.start_translation_thread)
-        self.start_button.grid(row=2, column=0, padx=10, pady=20, sticky="ew", ipady=10)
+        self.start_button.grid(row=2, column=0, padx=10, pady=(20, 5), sticky="ew", ipady=10)
+        self.rerender_button = ctk.CTkButton(translate_tab, text="Re-render with Edited Translations",
+                                             command=lambda: self.start_translation_thread(rerender=True))
+        self.rerender_button.grid(row=3, column=0, padx=10, pady=5, sticky="ew")
+        self.watch_button = ctk.CTkButton(translate_tab, text="Watch Input Folder", command=self.toggle_watch)
+        self.watch_button.grid(row=4, column=0, padx=10, pady=(5, 20), sticky="ew")
         manage_tab = tab_view.tab("Manage Data")
         manage_tab.grid_columnconfigure(0, weight=1)
         manage_tab.grid_columnconfigure(1, weight=1)
@@ -177,6 +206,83 @@ class App(ctk.CTk):
         os.makedirs(self.output_folder.get(), exist_ok=True)
         log_to_deb_file("--- load_initial_config finished ---")
 
+    def translator_kwargs(self, config: dict) -> dict:
+        return {
+            "serve_unreviewed": config.get("serve_unreviewed_translations", True),
+            "fuzzy_threshold": config.get("fuzzy_match_threshold"),
+            "fast_clean": config.get("fast_clean", False),
+            "inference_backend": config.get("inference_backend", "torch"),
+            "quantize": config.get("quantize"),
+            "calibration_dir": config.get("calibration_dir"),
+            "output_format": config.get("output_format", "same"),
+            "jpeg_quality": config.get("jpeg_quality", DEFAULT_JPEG_QUALITY),
+            "webp_quality": config.get("webp_quality", DEFAULT_WEBP_QUALITY),
+            "png_compression": config.get("png_compression"),
+        }
+
+    def needs_new_translator(self) -> bool:
+        translator = self.translator_instance
+        return (translator is None or translator.translation_client.backend.name != "google"
+                or translator.google_api_key_path != self.api_key_path.get())
+
+    def start_warm_up(self):
+        self.start_button.configure(state="disabled", text="Loading models...")
+        self.rerender_button.configure(state="disabled")
+        self.watch_button.configure(state="disabled")
+        thread = threading.Thread(target=self.warm_up_worker, daemon=True)
+        thread.start()
+
+    def warm_up_worker(self):
+        """Build the translator and load both models in the background while the window is usable."""
+        try:
+            service_url = config_manager.load_config().get("translation_service_url")
+            if service_url:
+                self.startup_status = "Connecting to the translation service..."
+                client = ServiceClient(service_url)
+                if client.health() is not None:
+                    self.service_client = client
+                    self.log_status(f"Using the translation service at {service_url}.")
+                    return
+                self.log_status(f"⚠️ No translation service at {service_url}; loading the models locally.")
+
+            self.startup_status = "Loading PyTorch..."
+            # Importing torch is most of a cold start, so it gets its own line in the breakdown.
+            start = time.perf_counter()
+            import torch
+            self.startup_timings.append(("import torch", time.perf_counter() - start))
+
+            self.startup_status = "Loading translation memory..."
+            start = time.perf_counter()
+            api_key_path = self.api_key_path.get()
+            # Without a usable key the models are still loaded now; the translator is rebuilt around
+            # them once a key is set and translation starts.
+            backend = "google" if api_key_path and os.path.isfile(api_key_path) else "stub"
+            translator = MangaTranslator(google_api_key_path=api_key_path, translation_backend=backend,
+                                         **self.translator_kwargs(config_manager.load_config()))
+            self.startup_timings.append(("translator", time.perf_counter() - start))
+
+            self.startup_status = "Loading models..."
+            for step, seconds in translator.warm_up().items():
+                self.startup_timings.append((step, seconds))
+            if self.translator_instance is None:
+                self.translator_instance = translator
+        except Exception as e:
+            import traceback
+            log_to_deb_file(f"STARTUP: warm-up failed: {e}\n{traceback.format_exc()}")
+            self.log_status(f"⚠️ Could not preload the models ({e}); they will load when translation starts.")
+        finally:
+            total = time.perf_counter() - _STARTUP_BEGAN
+            breakdown = ", ".join(f"{step} {seconds:.2f}s" for step, seconds in self.startup_timings)
+            log_to_deb_file(f"STARTUP: ready {total:.2f}s after launch ({breakdown})")
+            self.engine_ready.set()
+            self.after(0, self.warm_up_finished)
+
+    def warm_up_finished(self):
+        self.start_button.configure(text="Start Translation")
+        if not self.is_translating and not self.is_watching:
+            self.set_ui_state(True)
+            self.log_status("✅ Models loaded. Ready to translate.")
+
     def save_current_config(self):
         config = {"google_api_key_path": self.api_key_path.get(), "input_folder": self.input_folder.get(),
                   "output_folder": self.output_folder.get()}
@@ -204,42 +310,188 @@ class App(ctk.CTk):
     def set_ui_state(self, is_enabled: bool):
         state = "normal" if is_enabled else "disabled"
         self.start_button.configure(state=state)
+        self.rerender_button.configure(state=state)
+        self.watch_button.configure(state=state)
 
-    def start_translation_thread(self):
-        if self.is_translating: return
+    def start_translation_thread(self, rerender=False):
+        if self.is_translating or self.is_watching or not self.engine_ready.is_set(): return
         if not all([self.input_folder.get(), self.output_folder.get(), self.api_key_path.get()]):
             self.log_status("❌ Error: Please specify API Key, Input, and Output folders.")
             return
         self.is_translating = True
         self.set_ui_state(False)
-        self.log_status("🚀 Starting translation process...")
+        self.log_status("🚀 Re-rendering pages with the current translations..." if rerender
+                        else "🚀 Starting translation process...")
         self.progress_bar.set(0)
-        thread = threading.Thread(target=self.translation_worker)
+        thread = threading.Thread(target=self.translation_worker, args=(rerender,))
         thread.daemon = True
         thread.start()
 
-    def translation_worker(self):
+    def prepare_translator(self, config: dict) -> dict:
+        """Build the translator if the key changed, reusing loaded models; returns its settings."""
+        translator_kwargs = self.translator_kwargs(config)
+        if self.service_client is None and self.needs_new_translator():
+            previous = self.translator_instance
+            self.translator_instance = MangaTranslator(google_api_key_path=self.api_key_path.get(),
+                                                       **translator_kwargs)
+            if previous is not None:
+                self.translator_instance.share_models(previous)
+                # The models live on in the new translator; the rest (translation client threads, TM
+                # writer and connections, OCR cache) would otherwise stay open until exit.
+                previous.close()
+        elif self.service_client is None:
+            # Output settings don't need new models, so they follow config.json on the existing translator.
+            output_settings = ("output_format", "jpeg_quality", "webp_quality", "png_compression")
+            self.translator_instance.set_output_format(**{key: translator_kwargs[key] for key in output_settings})
+        return translator_kwargs
+
+    def output_manifest(self, output_dir: str, translator_kwargs: dict) -> RunManifest:
+        if self.service_client is not None:
+            # Outputs are keyed by the settings the service renders with, not this window's.
+            health = self.service_client.health()
+            if health is None:
+                raise ConnectionError(f"The translation service at {self.service_client.url} stopped responding")
+            return RunManifest(output_dir, health["config_version"])
+        return RunManifest(output_dir, config_version(translator_kwargs))
+
+    def toggle_watch(self):
+        if self.is_watching:
+            self.watch_stop.set()
+            self.watch_button.configure(state="disabled", text="Stopping...")
+            return
+        if self.is_translating or not self.engine_ready.is_set():
+            return
+        input_dir, output_dir = self.input_folder.get(), self.output_folder.get()
+        if not all([input_dir, output_dir, self.api_key_path.get()]):
+            self.log_status("❌ Error: Please specify API Key, Input, and Output folders.")
+            return
+        if not os.path.isdir(input_dir) or os.path.realpath(input_dir) == os.path.realpath(output_dir):
+            self.log_status("❌ Error: Watching needs an existing input folder separate from the output folder.")
+            return
+        self.is_watching = True
+        self.watch_stop.clear()
+        self.set_ui_state(False)
+        self.watch_button.configure(state="normal", text="Stop Watching")
+        thread = threading.Thread(target=self.watch_worker, args=(input_dir, output_dir), daemon=True)
+        thread.start()
+
+    def watch_worker(self, input_dir, output_dir):
+        """Translate pages as they land in the input folder until Stop Watching is pressed."""
+        watcher = None
+        try:
+            config = config_manager.load_config()
+            translator_kwargs = self.prepare_translator(config)
+            os.makedirs(output_dir, exist_ok=True)
+            manifest = self.output_manifest(output_dir, translator_kwargs)
+            watcher = FolderWatcher(input_dir, poll_interval=config.get("watch_poll_interval", 1.0),
+                                    use_events=not config.get("watch_polling", False))
+            self.log_status(f"👀 Watching {input_dir} for new pages ({watcher.mode})...")
+            if self.service_client is not None:
+                results = self._watch_via_service(watcher, output_dir, manifest)
+            else:
+                pipeline = PagePipeline(self.translator_instance, stage_workers=config.get("pipeline_stage_workers"))
+                results = translate_as_they_land(pipeline, watcher, output_dir, manifest, self.watch_stop)
+            try:
+                for input_path, error in results:
+                    filename = os.path.basename(input_path)
+                    if error:
+                        self.log_status(f"❌ {filename}: {error}")
+                    else:
+                        self.log_status(f"Finished {filename}")
+            finally:
+                results.close()
+            if self.service_client is None:
+                self.log_status(f"💾 Output: {self.translator_instance.encoder.stats.take().summary()}")
+            self.log_status("Stopped watching.")
+        except Exception as e:
+            import traceback
+            self.log_status(f"\n❌ An error occurred: {e}\n{traceback.format_exc()}")
+        finally:
+            if watcher is not None:
+                watcher.close()
+            self.after(0, self.watch_finished)
+
+    def _watch_via_service(self, watcher, output_dir, manifest):
+        output_format = (self.service_client.health() or {}).get("output_format")
+        for input_path, output_path, input_hash in pending_pages(watcher, output_dir, manifest, self.watch_stop,
+                                                                 lambda name: output_filename(name, output_format)):
+            try:
+                self.service_client.translate_file(input_path, output_path)
+            except ServiceError as e:
+                yield input_path, str(e)
+                continue
+            manifest.record(output_path, input_hash)
+            yield input_path, None
+
+    def watch_finished(self):
+        self.is_watching = False
+        self.watch_button.configure(text="Watch Input Folder")
+        self.set_ui_state(self.engine_ready.is_set())
+
+    def translation_worker(self, rerender=False):
         try:
             self.log_status("Initializing translation engine...")
-            if not self.translator_instance or self.translator_instance.google_api_key_path != self.api_key_path.get():
-                self.translator_instance = MangaTranslator(google_api_key_path=self.api_key_path.get())
+            config = config_manager.load_config()
+            translator_kwargs = self.prepare_translator(config)
             input_dir = self.input_folder.get()
             output_dir = self.output_folder.get()
-            image_files = natsorted([f for f in os.listdir(input_dir) if f.lower().endswith((".png", ".jpg", ".jpeg"))])
-            if not image_files:
-                self.log_status("⚠️ No image files found in the input directory.")
+            image_files = list_image_files(input_dir)
+            archives = list_archives(input_dir)
+            if not image_files and not archives:
+                self.log_status("⚠️ No image files or CBZ/ZIP chapters found in the input directory.")
                 self.after(0, self.translation_finished)
                 return
-            total_files = len(image_files)
-            for i, filename in enumerate(image_files):
-                if not self.is_translating:
-                    self.log_status("Translation cancelled.")
-                    break
-                self.log_status(f"Processing page {i + 1}/{total_files}: {filename}")
-                self.translator_instance.process_page(os.path.join(input_dir, filename),
-                                                      os.path.join(output_dir, filename))
+            # Pages already rendered from the same input and settings are skipped; this also
+            # resumes a run that was interrupted part-way through. A re-render redoes every page
+            # from its cached detection and OCR so only TM lookup and typesetting run again; pages
+            # that were never detected fail rather than loading the models.
+            artifacts = "require" if rerender else "use"
+            manifest = self.output_manifest(output_dir, translator_kwargs)
+            if self.service_client is not None:
+                output_format = (self.service_client.health() or {}).get("output_format")
+            else:
+                output_format = self.translator_instance.encoder.output_format
+            pairs = [(os.path.join(input_dir, filename),
+                      os.path.join(output_dir, output_filename(filename, output_format)))
+                     for filename in image_files]
+            if rerender:
+                pending = [(input_path, output_path, file_hash(input_path)) for input_path, output_path in pairs]
+            else:
+                pending = manifest.pending(pairs)
+            skipped = len(image_files) - len(pending)
+            if skipped:
+                self.log_status(f"Skipping {skipped} page(s) unchanged since the last run.")
+            total_files = len(pending)
+            pages = ((input_path, output_path) for input_path, output_path, _ in pending)
+            if self.service_client is not None:
+                results = ((result["input_path"], result["error"])
+                           for result in self.service_client.translate_chapter(pages, artifacts))
+            else:
+                pipeline = PagePipeline(self.translator_instance, stage_workers=config.get("pipeline_stage_workers"),
+                                        artifacts=artifacts)
+                # Pages stream through the stages concurrently but finish in order.
+                results = pipeline.run(pages)
+            try:
+                for i, ((_, output_path, input_hash), (_, error)) in enumerate(zip(pending, results)):
+                    filename = os.path.basename(output_path)
+                    if not self.is_translating:
+                        self.log_status("Translation cancelled.")
+                        break
+                    if error:
+                        self.log_status(f"❌ Page {i + 1}/{total_files}: {filename}: {error}")
+                    else:
+                        manifest.record(output_path, input_hash)
+                        self.log_status(f"Finished page {i + 1}/{total_files}: {filename}")
+                    self.after(0, self.update_progress, (i + 1) / total_files)
+            finally:
+                results.close()
+            if archives and self.is_translating:
+                self.translate_archives(input_dir, output_dir, archives, manifest, config, rerender)
+            if self.translator_instance is not None:
+                # Counted once per run: count_entries() flushes queued TM writes first.
                 self.log_status(f"   -> TM has {self.translator_instance.tm.count_entries()} unique entries.")
-                self.after(0, self.update_progress, (i + 1) / total_files)
+            if self.service_client is None:
+                self.log_status(f"💾 Output: {self.translator_instance.encoder.stats.take().summary()}")
             self.log_status("\n🎉 Translation complete! Check the output folder.")
         except Exception as e:
             import traceback
@@ -247,9 +499,44 @@ class App(ctk.CTk):
         finally:
             self.after(0, self.translation_finished)
 
+    def translate_archives(self, input_dir, output_dir, archives, manifest, config, rerender):
+        """Translate each CBZ/ZIP chapter into a .cbz in the output folder, one chapter at a time."""
+        if self.service_client is not None:
+            self.log_status("⚠️ CBZ/ZIP chapters are not sent to the translation service; skipping them.")
+            return
+        pairs = [(os.path.join(input_dir, name), os.path.join(output_dir, output_archive_name(name)))
+                 for name in archives]
+        if rerender:
+            pending = [(input_path, output_path, file_hash(input_path)) for input_path, output_path in pairs]
+        else:
+            pending = manifest.pending(pairs)
+        if len(pending) < len(pairs):
+            self.log_status(f"Skipping {len(pairs) - len(pending)} chapter(s) unchanged since the last run.")
+
+        def on_page(done, total, entry_name, error):
+            if error:
+                self.log_status(f"❌ Page {done}/{total}: {entry_name}: {error}")
+            self.after(0, self.update_progress, done / total)
+
+        for i, (input_path, output_path, input_hash) in enumerate(pending):
+            if not self.is_translating:
+                self.log_status("Translation cancelled.")
+                return
+            self.log_status(f"📦 Chapter {i + 1}/{len(pending)}: {os.path.basename(input_path)}")
+            results = translate_archive(self.translator_instance, input_path, output_path,
+                                        {"stage_workers": config.get("pipeline_stage_workers"),
+                                         "artifacts": "require" if rerender else "use"},
+                                        progress_callback=on_page)
+            error = archive_error(results)
+            if error:
+                self.log_status(f"❌ {os.path.basename(output_path)}: {error}")
+            else:
+                manifest.record(output_path, input_hash)
+                self.log_status(f"Finished chapter {os.path.basename(output_path)} ({len(results)} pages)")
+
     def translation_finished(self):
         self.is_translating = False
-        self.set_ui_state(True)
+        self.set_ui_state(self.engine_ready.is_set())
         self.progress_bar.set(0)
 
     def clear_folder_contents(self, folder_path, folder_name):
@@ -0,0 +1,556 @@
+# cli.py
+# Headless entry point: python cli.py translate <input_dir> <output_dir> --workers 8
+
+import argparse
+import os
+import sys
+import time
+from typing import Optional
+
+import config_manager
+from manga_translator.batch import run_batch, run_service_batch, default_worker_count, list_image_files
+from manga_translator.encoder import (DEFAULT_JPEG_QUALITY, DEFAULT_WEBP_QUALITY, OUTPUT_FORMATS, WriteStats,
+                                      validate as validate_output)
+from manga_translator.inference import INFERENCE_BACKENDS, QUANTIZATION_MODES
+from manga_translator.pipeline import DEFAULT_STAGE_WORKERS
+from manga_translator.service import DEFAULT_HOST, DEFAULT_PORT, DEFAULT_URL
+from manga_translator.watch import POLL_INTERVAL, SETTLE_SECONDS
+
+
+def _add_inference_arguments(parser: argparse.ArgumentParser, default_backend: str = "torch"):
+    parser.add_argument("--inference-backend", choices=INFERENCE_BACKENDS, default=default_backend,
+                        help="Runtime for bubble detection and OCR. onnx and openvino export the models on "
+                             "first use and are usually faster on CPU.")
+    parser.add_argument("--quantize", choices=QUANTIZATION_MODES, default=None,
+                        help="Run the models in int8 (onnx/openvino only). 'static' also calibrates the "
+                             "detector's activations on --calibration-dir.")
+    parser.add_argument("--calibration-dir", default=None,
+                        help="Folder of representative pages for --quantize static.")
+
+
+def _add_translator_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--api-key", dest="api_key_path", default=None,
+                        help="Google API key (.json). Defaults to the path saved in config.json.")
+    parser.add_argument("--detect-batch", type=int, default=4,
+                        help="Pages per bubble-detection forward pass.")
+    parser.add_argument("--ocr-batch", type=int, default=16,
+                        help="Bubble crops per OCR forward pass.")
+    parser.add_argument("--backend", choices=["google", "stub"], default="google",
+                        help="Translation backend. 'stub' needs no network and is meant for load tests.")
+    parser.add_argument("--max-in-flight", type=int, default=4,
+                        help="Concurrent translation requests per worker.")
+    parser.add_argument("--rps", type=float, default=10.0,
+                        help="Translation requests per second per worker.")
+    parser.add_argument("--chars-per-minute", type=int, default=None,
+                        help="Characters sent per minute per worker (default: unlimited).")
+    parser.add_argument("--tm", dest="tm_path", default="translation_memory.db",
+                        help="Translation memory database, e.g. one per series.")
+    parser.add_argument("--reviewed-only", action="store_true",
+                        help="Only reuse TM entries that were edited in the DB editor.")
+    parser.add_argument("--fast-clean", action="store_true",
+                        help="Fill plain bubbles with their background colour instead of inpainting.")
+    parser.add_argument("--fuzzy-threshold", type=float, default=None,
+                        help="Reuse TM lines at least this similar (0-1, e.g. 0.85) to an OCR'd line "
+                             "that has no exact match. Off by default.")
+    parser.add_argument("--stage-workers", type=parse_stage_workers, default={},
+                        help="Threads per pipeline stage within a worker, e.g. 'translate=8,render=4'. "
+                             f"Stages: {', '.join(DEFAULT_STAGE_WORKERS)}.")
+    parser.add_argument("--detect-size", type=int, default=None,
+                        help="Downscale pages so their longer side is at most this many pixels before "
+                             "bubble detection (e.g. 1280). Check recall with benchmark-detection first.")
+    parser.add_argument("--max-megapixels", type=float, default=150.0,
+                        help="Decoded pixels (in millions) a worker may hold across pages in flight.")
+    parser.add_argument("--tile-height", type=int, default=None,
+                        help="Band height for detecting long webtoon strips (default: 1.5x the width).")
+    parser.add_argument("--tile-overlap", type=int, default=400,
+                        help="Rows shared by neighbouring bands; should exceed the tallest bubble.")
+    parser.add_argument("--artifact-cache", default="page_cache",
+                        help="Folder caching each page's bubbles and OCR text (empty to disable).")
+    parser.add_argument("--ocr-cache", default="ocr_cache.db",
+                        help="Database of OCR'd bubble crops reused for repeats across pages and "
+                             "chapters (empty to disable).")
+    parser.add_argument("--ocr-cache-size", type=int, default=20000,
+                        help="Most recently used crops kept in the OCR cache.")
+    parser.add_argument("--queue-size", type=int, default=4,
+                        help="Pages that may wait between two pipeline stages.")
+    parser.add_argument("--format", dest="output_format", choices=OUTPUT_FORMATS, default="same",
+                        help="Output image format. 'same' keeps each page's input format; the others rename "
+                             "the outputs (and CBZ entries) to that extension.")
+    parser.add_argument("--jpeg-quality", type=int, default=DEFAULT_JPEG_QUALITY,
+                        help="JPEG quality, 0-100.")
+    parser.add_argument("--webp-quality", type=int, default=DEFAULT_WEBP_QUALITY,
+                        help="WebP quality, 1-100; 101 writes lossless WebP.")
+    parser.add_argument("--png-compression", type=int, default=None,
+                        help="PNG zlib level, 0-9 (default: OpenCV's). Lower is faster to write but larger.")
+    _add_inference_arguments(parser)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="onyx", description="Onyx Manga Translator (headless)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    translate_parser = subparsers.add_parser("translate", help="Translate every page and CBZ/ZIP chapter in a "
+                                                               "folder, or a single CBZ/ZIP")
+    translate_parser.add_argument("input_dir")
+    translate_parser.add_argument("output_dir")
+    translate_parser.add_argument("--workers", type=int, default=default_worker_count(),
+                                  help="Number of worker processes, each with its own models.")
+    translate_parser.add_argument("--pages-per-task", type=int, default=16,
+                                  help="Pages handed to a worker at a time. Lines are deduplicated and "
+                                       "translated together within each task.")
+    redo = translate_parser.add_mutually_exclusive_group()
+    redo.add_argument("--force", action="store_true",
+                      help="Redo every page from scratch, even ones unchanged since they were last written, "
+                           "detecting and OCR'ing them again instead of using the artifact cache.")
+    redo.add_argument("--rerender", action="store_true",
+                      help="Re-typeset every page with the current TM from its cached detection and OCR "
+                           "results; pages missing from the cache fail. Use after fixing lines in the "
+                           "translation editor.")
+    translate_parser.add_argument("--service", default=None, metavar="URL",
+                                  help=f"Send the pages to a running 'serve' instance (e.g. {DEFAULT_URL}) instead "
+                                       "of loading the models here; the translator options below are then the "
+                                       "service's.")
+    _add_translator_arguments(translate_parser)
+
+    serve_parser = subparsers.add_parser("serve", help="Keep the models loaded and translate pages sent over "
+                                                       "local HTTP")
+    serve_parser.add_argument("--host", default=DEFAULT_HOST,
+                              help="Interface to listen on. Every request must carry the token the service "
+                                   "writes to ~/.onyx/service-<port>.token at launch; on a non-local interface, "
+                                   "anyone who obtains that token can translate pages and read and write files "
+                                   "as the service's user, so pair it with --root.")
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument("--root", dest="roots", action="append", default=[],
+                              help="Only read and write pages under this folder (repeatable). Without it, "
+                                   "any .png/.jpg/.webp path the service's user can access is allowed.")
+    _add_translator_arguments(serve_parser)
+
+    watch_parser = subparsers.add_parser("watch", help="Translate pages as they are dropped into a folder")
+    watch_parser.add_argument("input_dir")
+    watch_parser.add_argument("output_dir")
+    watch_parser.add_argument("--settle", type=float, default=SETTLE_SECONDS,
+                              help="Seconds a file must stay unchanged before it counts as fully written.")
+    watch_parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL,
+                              help="Seconds between folder scans when change notifications are unavailable.")
+    watch_parser.add_argument("--polling", action="store_true",
+                              help="Rescan the folder instead of using change notifications (e.g. for network "
+                                   "shares, which often don't deliver them).")
+    watch_parser.add_argument("--new-only", action="store_true",
+                              help="Ignore pages already in the folder when watching starts.")
+    _add_translator_arguments(watch_parser)
+
+    bench_parser = subparsers.add_parser("benchmark-detection",
+                                         help="Compare bubble detection on reduced-resolution pages against full "
+                                              "resolution")
+    bench_parser.add_argument("input_dir")
+    bench_parser.add_argument("--sizes", type=int, nargs="+", default=[1600, 1280, 960],
+                              help="Detection resolutions (longer side, px) to compare.")
+    bench_parser.add_argument("--limit", type=int, default=None, help="Only use the first N pages.")
+    bench_parser.add_argument("--iou", type=float, default=0.5,
+                              help="Overlap at which a reduced-resolution box counts as finding a full-resolution one.")
+
+    check_parser = subparsers.add_parser("check-backend",
+                                         help="Compare detection and OCR on an inference backend against PyTorch")
+    check_parser.add_argument("input_dir")
+    _add_inference_arguments(check_parser, default_backend="onnx")
+    check_parser.add_argument("--limit", type=int, default=None, help="Only use the first N pages.")
+    check_parser.add_argument("--iou", type=float, default=0.5,
+                              help="Overlap at which a backend box counts as finding a PyTorch one.")
+    check_parser.add_argument("--min-recall", type=float, default=0.98,
+                              help="Fail if the backend finds fewer of PyTorch's bubbles than this.")
+    check_parser.add_argument("--min-text-match", type=float, default=0.95,
+                              help="Fail if the mean character similarity of OCR text is below this.")
+    return parser
+
+
+def _box_iou(a, b) -> float:
+    ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - ix * iy
+    return ix * iy / union if union > 0 else 0.0
+
+
+def _matched_boxes(reference, candidates, min_iou: float) -> int:
+    """Greedy one-to-one matching; returns how many reference boxes were found."""
+    unused = list(candidates)
+    found = 0
+    for box in reference:
+        best = max(unused, key=lambda other: _box_iou(box, other), default=None)
+        if best is not None and _box_iou(box, best) >= min_iou:
+            unused.remove(best)
+            found += 1
+    return found
+
+
+def run_benchmark_detection(args) -> int:
+    from manga_translator.translator import MangaTranslator
+
+    image_files = list_image_files(args.input_dir)[:args.limit]
+    if not image_files:
+        print("⚠️ No image files found in the input directory.")
+        return 2
+    translator = MangaTranslator(google_api_key_path="", translation_backend="stub", artifact_cache_dir=None,
+                                 ocr_cache_path=None, detection_batch_size=1)
+    pages = [translator.read_page(os.path.join(args.input_dir, f))[0] for f in image_files]
+    pages = [page for page in pages if page is not None]
+    # The first forward pass pays for model loading and warm-up; keep it out of the timings.
+    translator.detect_bubbles_batch(pages[:1])
+
+    def detect_all(size):
+        translator.detection_size = size
+        start = time.perf_counter()
+        boxes = [translator.detect_bubbles_batch([page])[0][0] for page in pages]
+        return boxes, (time.perf_counter() - start) / len(pages)
+
+    reference, full_time = detect_all(None)
+    total = sum(len(boxes) for boxes in reference)
+    print(f"📊 {len(pages)} pages, {total} bubbles at full resolution, {full_time * 1000:.0f} ms/page")
+    print(f"{'size':>6} {'recall':>8} {'extra':>6} {'ms/page':>8} {'speedup':>8}")
+    for size in args.sizes:
+        detected, size_time = detect_all(size)
+        found = sum(_matched_boxes(ref, boxes, args.iou) for ref, boxes in zip(reference, detected))
+        extra = sum(len(boxes) for boxes in detected) - found
+        recall = found / total if total else 1.0
+        print(f"{size:>6} {recall:>8.1%} {extra:>6} {size_time * 1000:>8.0f} {full_time / size_time:>7.2f}x")
+    translator.close()
+    return 0
+
+
+def run_check_backend(args) -> int:
+    from difflib import SequenceMatcher
+    from manga_translator.inference import validate
+    from manga_translator.translator import MangaTranslator
+
+    try:
+        validate(args.inference_backend, args.quantize)
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        return 2
+    if args.quantize == "static" and not args.calibration_dir:
+        print("❌ Error: --quantize static needs --calibration-dir with a few representative pages.")
+        return 2
+    image_files = list_image_files(args.input_dir)[:args.limit]
+    if not image_files:
+        print("⚠️ No image files found in the input directory.")
+        return 2
+    common = {"google_api_key_path": "", "translation_backend": "stub", "artifact_cache_dir": None,
+              "ocr_cache_path": None, "detection_batch_size": 1}
+    reference = MangaTranslator(**common)
+    candidate = MangaTranslator(**common, inference_backend=args.inference_backend, quantize=args.quantize,
+                                calibration_dir=args.calibration_dir)
+    pages = [reference.read_page(os.path.join(args.input_dir, f))[0] for f in image_files]
+    pages = [page for page in pages if page is not None]
+
+    def timed(fn, *fn_args):
+        start = time.perf_counter()
+        result = fn(*fn_args)
+        return result, time.perf_counter() - start
+
+    # Model loading, export and quantization happen on the first call; keep them out of the timings.
+    for translator in (reference, candidate):
+        translator.detect_bubbles_batch(pages[:1])
+        translator.batch_ocr([pages[0][:64, :64]])
+
+    total = found = extra = 0
+    exact = 0
+    similarity = 0.0
+    crops_total = 0
+    times = {"reference_detect": 0.0, "candidate_detect": 0.0, "reference_ocr": 0.0, "candidate_ocr": 0.0}
+    for page in pages:
+        (ref_boxes, _), ref_time = timed(lambda: reference.detect_bubbles_batch([page])[0])
+        (cand_boxes, _), cand_time = timed(lambda: candidate.detect_bubbles_batch([page])[0])
+        times["reference_detect"] += ref_time
+        times["candidate_detect"] += cand_time
+        matched = _matched_boxes(ref_boxes, cand_boxes, args.iou)
+        total += len(ref_boxes)
+        found += matched
+        extra += len(cand_boxes) - matched
+
+        # OCR is compared on the same crops so detection differences don't leak into it.
+        crops = [page[y1:y2, x1:x2] for x1, y1, x2, y2 in ref_boxes]
+        ref_texts, ref_time = timed(reference.ocr_crops, crops)
+        cand_texts, cand_time = timed(candidate.ocr_crops, crops)
+        times["reference_ocr"] += ref_time
+        times["candidate_ocr"] += cand_time
+        for ref_text, cand_text in zip(ref_texts, cand_texts):
+            crops_total += 1
+            exact += ref_text == cand_text
+            similarity += SequenceMatcher(None, ref_text, cand_text).ratio() if ref_text or cand_text else 1.0
+    reference.close()
+    candidate.close()
+
+    recall = found / total if total else 1.0
+    text_match = similarity / crops_total if crops_total else 1.0
+    name = args.inference_backend + (f" int8 ({args.quantize})" if args.quantize else "")
+    print(f"📊 {len(pages)} pages, {total} bubbles, {crops_total} crops: {name} vs torch")
+    print(f"{'':>10} {'torch ms':>9} {'backend ms':>11} {'speedup':>8}")
+    for stage in ("detect", "ocr"):
+        ref_time, cand_time = times[f"reference_{stage}"], times[f"candidate_{stage}"]
+        print(f"{stage:>10} {ref_time * 1000 / len(pages):>9.0f} {cand_time * 1000 / len(pages):>11.0f} "
+              f"{ref_time / cand_time if cand_time else 0:>7.2f}x")
+    print(f"Detection recall {recall:.1%} ({extra} extra boxes); OCR exact match "
+          f"{exact / crops_total if crops_total else 1.0:.1%}, mean similarity {text_match:.1%}")
+    if recall < args.min_recall or text_match < args.min_text_match:
+        print(f"❌ {name} is below the accuracy thresholds (recall {args.min_recall:.0%}, "
+              f"text {args.min_text_match:.0%}); keep using torch for this material.")
+        return 1
+    print(f"✅ {name} matches torch within the accuracy thresholds.")
+    return 0
+
+
+def parse_stage_workers(value: str) -> dict:
+    stage_workers = {}
+    for part in filter(None, value.split(",")):
+        stage, _, count = part.partition("=")
+        stage = stage.strip()
+        if stage not in DEFAULT_STAGE_WORKERS or not count.strip().isdigit() or int(count) < 1:
+            raise argparse.ArgumentTypeError(f"expected stage=count with a stage from "
+                                             f"{', '.join(DEFAULT_STAGE_WORKERS)}, got '{part}'")
+        stage_workers[stage] = int(count)
+    return stage_workers
+
+
+def _check_translator_arguments(args) -> Optional[str]:
+    """The API key path to use, or None after printing why the translator options are unusable."""
+    api_key_path = args.api_key_path or config_manager.load_config().get("google_api_key_path", "")
+    if args.backend == "google" and (not api_key_path or not os.path.exists(api_key_path)):
+        print("❌ Error: Google API key not found. Pass --api-key or set it in the GUI first.")
+        return None
+    if args.quantize and args.inference_backend == "torch":
+        print("❌ Error: --quantize needs --inference-backend onnx or openvino.")
+        return None
+    if args.quantize == "static" and not args.calibration_dir:
+        print("❌ Error: --quantize static needs --calibration-dir with a few representative pages.")
+        return None
+    try:
+        validate_output(args.output_format, args.jpeg_quality, args.webp_quality, args.png_compression)
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        return None
+    return os.path.abspath(api_key_path) if api_key_path else ""
+
+
+def _translator_kwargs(args) -> dict:
+    return {
+        "detection_batch_size": args.detect_batch,
+        "ocr_batch_size": args.ocr_batch,
+        "translation_backend": args.backend,
+        "max_in_flight": args.max_in_flight,
+        "requests_per_second": args.rps,
+        "chars_per_minute": args.chars_per_minute,
+        "tm_path": args.tm_path,
+        "serve_unreviewed": not args.reviewed_only,
+        "fuzzy_threshold": args.fuzzy_threshold,
+        "fast_clean": args.fast_clean,
+        "artifact_cache_dir": args.artifact_cache or None,
+        "ocr_cache_path": args.ocr_cache or None,
+        "ocr_cache_size": args.ocr_cache_size,
+        "tile_height": args.tile_height,
+        "tile_overlap": args.tile_overlap,
+        "detection_size": args.detect_size,
+        "inference_backend": args.inference_backend,
+        "quantize": args.quantize,
+        "calibration_dir": args.calibration_dir,
+        "output_format": args.output_format,
+        "jpeg_quality": args.jpeg_quality,
+        "webp_quality": args.webp_quality,
+        "png_compression": args.png_compression,
+    }
+
+
+def _pipeline_kwargs(args) -> dict:
+    return {"stage_workers": args.stage_workers, "queue_size": args.queue_size,
+            "max_megapixels": args.max_megapixels}
+
+
+def _artifact_mode(args) -> str:
+    return "refresh" if args.force else "require" if args.rerender else "use"
+
+
+def run_serve(args) -> int:
+    from manga_translator.manifest import config_version
+    from manga_translator.service import TranslationService
+    from manga_translator.translator import MangaTranslator
+
+    api_key_path = _check_translator_arguments(args)
+    if api_key_path is None:
+        return 2
+    translator_kwargs = _translator_kwargs(args)
+    print("Loading models...")
+    translator = MangaTranslator(google_api_key_path=api_key_path, **translator_kwargs)
+    timings = translator.warm_up()
+    print("✅ Models ready (" + ", ".join(f"{step} {seconds:.1f}s" for step, seconds in timings.items()) + ")")
+    try:
+        TranslationService(translator, config_version(translator_kwargs), _pipeline_kwargs(args),
+                           roots=args.roots).serve(args.host, args.port)
+    finally:
+        translator.close()
+    print(f"💾 Output: {translator.encoder.stats.summary()}")
+    return 0
+
+
+def run_watch(args) -> int:
+    import threading
+    from manga_translator.manifest import RunManifest, config_version
+    from manga_translator.pipeline import PagePipeline
+    from manga_translator.translator import MangaTranslator
+    from manga_translator.watch import FolderWatcher, translate_as_they_land
+
+    api_key_path = _check_translator_arguments(args)
+    if api_key_path is None:
+        return 2
+    if not os.path.isdir(args.input_dir):
+        print(f"❌ Error: Input folder does not exist: {args.input_dir}")
+        return 2
+    if os.path.realpath(args.input_dir) == os.path.realpath(args.output_dir):
+        print("❌ Error: The output folder must differ from the watched folder.")
+        return 2
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    translator_kwargs = _translator_kwargs(args)
+    print("Loading models...")
+    translator = MangaTranslator(google_api_key_path=api_key_path, **translator_kwargs)
+    translator.warm_up()
+    manifest = RunManifest(args.output_dir, config_version(translator_kwargs))
+    watcher = FolderWatcher(args.input_dir, settle_seconds=args.settle, poll_interval=args.poll_interval,
+                            use_events=not args.polling, include_existing=not args.new_only)
+    stop = threading.Event()
+    print(f"👀 Watching {args.input_dir} ({watcher.mode}) -> {args.output_dir}. Press Ctrl+C to stop.")
+    done = failures = 0
+    try:
+        for input_path, error in translate_as_they_land(PagePipeline(translator, **_pipeline_kwargs(args)), watcher,
+                                                        args.output_dir, manifest, stop):
+            done += 1
+            if error:
+                failures += 1
+                print(f"[{done}] ❌ {os.path.basename(input_path)}: {error}")
+            else:
+                print(f"[{done}] {os.path.basename(input_path)}")
+    except KeyboardInterrupt:
+        stop.set()
+        print(f"\nStopped after {done} page(s).")
+    finally:
+        watcher.close()
+        translator.close()
+    print(f"💾 Output: {translator.encoder.stats.summary()}")
+    return 1 if failures else 0
+
+
+def _print_progress(done, total, input_path, error):
+    name = os.path.basename(input_path)
+    if error:
+        print(f"[{done}/{total}] ❌ {name}: {error}")
+    else:
+        print(f"[{done}/{total}] {name}")
+
+
+def run_translate_archive(args, api_key_path: str) -> int:
+    """Translate one CBZ/ZIP in this process, reporting progress per page."""
+    from manga_translator.archive import output_archive_name, translate_archive
+    from manga_translator.batch import archive_error
+    from manga_translator.manifest import RunManifest, config_version, file_hash
+    from manga_translator.translator import MangaTranslator
+
+    translator_kwargs = _translator_kwargs(args)
+    os.makedirs(args.output_dir, exist_ok=True)
+    output_path = os.path.join(args.output_dir, output_archive_name(os.path.basename(args.input_dir)))
+    manifest = RunManifest(args.output_dir, config_version(translator_kwargs))
+    input_hash = file_hash(args.input_dir)
+    if not (args.force or args.rerender) and manifest.is_current(output_path, input_hash):
+        print(f"✅ {output_path} is up to date; nothing to do. Pass --force to redo it.")
+        return 0
+
+    print(f"🚀 Translating {args.input_dir} -> {output_path}...")
+    start = time.perf_counter()
+    translator = MangaTranslator(google_api_key_path=api_key_path, **translator_kwargs)
+    try:
+        results = translate_archive(translator, args.input_dir, output_path,
+                                    {**_pipeline_kwargs(args), "artifacts": _artifact_mode(args)},
+                                    progress_callback=_print_progress)
+    finally:
+        translator.close()
+    elapsed = time.perf_counter() - start
+    print(f"💾 Output: {translator.encoder.stats.summary()}")
+    error = archive_error(results)
+    if error is None:
+        manifest.record(output_path, input_hash)
+    failures = sum(1 for _, page_error in results if page_error)
+    print(f"\n🎉 Done: {len(results) - failures}/{len(results)} pages in {elapsed:.1f}s "
+          f"({len(results) / elapsed if elapsed else 0:.2f} pages/s).")
+    return 1 if failures else 0
+
+
+def run_translate(args) -> int:
+    from manga_translator.archive import is_archive, list_archives
+
+    api_key_path = "" if args.service else _check_translator_arguments(args)
+    if api_key_path is None:
+        return 2
+    if args.rerender and not args.artifact_cache:
+        print("❌ Error: --rerender needs the artifact cache; drop the empty --artifact-cache.")
+        return 2
+    single_archive = os.path.isfile(args.input_dir) and is_archive(args.input_dir)
+    if not single_archive and not os.path.isdir(args.input_dir):
+        print(f"❌ Error: Input folder does not exist: {args.input_dir}")
+        return 2
+    if single_archive:
+        if args.service:
+            print("❌ Error: CBZ/ZIP chapters are translated locally; drop --service.")
+            return 2
+        return run_translate_archive(args, api_key_path)
+    if args.service and list_archives(args.input_dir):
+        print("⚠️ CBZ/ZIP chapters are not sent to the service; only loose pages will be translated.")
+
+    start = time.perf_counter()
+    write_stats = WriteStats()
+    if args.service:
+        from manga_translator.service import ServiceClient, ServiceError
+
+        print(f"🚀 Translating {args.input_dir} -> {args.output_dir} on the service at {args.service}...")
+        try:
+            results = run_service_batch(ServiceClient(args.service), args.input_dir, args.output_dir,
+                                        incremental=not (args.force or args.rerender),
+                                        progress_callback=_print_progress, artifacts=_artifact_mode(args))
+        except (ConnectionError, ServiceError) as e:
+            print(f"❌ Error: {e}")
+            return 2
+    else:
+        print(f"🚀 Translating {args.input_dir} -> {args.output_dir} with {args.workers} worker(s)...")
+        results = run_batch(args.input_dir, args.output_dir, api_key_path, workers=args.workers,
+                            pages_per_task=args.pages_per_task, translator_kwargs=_translator_kwargs(args),
+                            pipeline_kwargs={**_pipeline_kwargs(args), "artifacts": _artifact_mode(args)},
+                            incremental=not (args.force or args.rerender),
+                            progress_callback=_print_progress, write_stats=write_stats)
+    elapsed = time.perf_counter() - start
+
+    if not results:
+        if list_image_files(args.input_dir) or list_archives(args.input_dir):
+            print("✅ Every page is up to date; nothing to do. Pass --force to redo them.")
+        else:
+            print("⚠️ No image files or CBZ/ZIP chapters found in the input directory.")
+        return 0
+    failures = sum(1 for _, error in results if error)
+    print(f"\n🎉 Done: {len(results) - failures}/{len(results)} pages/chapters in {elapsed:.1f}s "
+          f"({len(results) / elapsed:.2f} per second).")
+    if write_stats.pages:
+        print(f"💾 Output: {write_stats.summary()}")
+    return 1 if failures else 0
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command == "translate":
+        return run_translate(args)
+    if args.command == "serve":
+        return run_serve(args)
+    if args.command == "watch":
+        return run_watch(args)
+    if args.command == "benchmark-detection":
+        return run_benchmark_detection(args)
+    if args.command == "check-backend":
+        return run_check_backend(args)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,9 @@ from tkinter import ttk, messagebox
 
 
 class DatabaseEditorWindow(ctk.CTkToplevel):
+    PAGE_SIZE = 200
+    SEARCH_DEBOUNCE_MS = 250
+
     def __init__(self, master, tm_instance):
         super().__init__(master)
         self.tm = tm_instance
@@ -16,6 +19,9 @@ class DatabaseEditorWindow(ctk.CTkToplevel):
         self.grid_rowconfigure(1, weight=1)
 
         self.selected_source_text = None
+        self._search_after_id = None
+        self._loaded_count = 0
+        self._has_more_entries = False
 
         self.setup_ui()
         self.load_entries()
@@ -26,7 +32,7 @@ class DatabaseEditorWindow(ctk.CTkToplevel):
         controls_frame.grid_columnconfigure(0, weight=1)
 
         self.search_var = ctk.StringVar()
-        self.search_var.trace_add("write", lambda *args: self.load_entries())
+        self.search_var.trace_add("write", lambda *args: self.schedule_search())
         search_entry = ctk.CTkEntry(controls_frame, textvariable=self.search_var,
                                     placeholder_text="Search Japanese or English text...")
         search_entry.grid(row=0, column=0, padx=10, pady=10, sticky="ew")
@@ -46,22 +52,25 @@ class DatabaseEditorWindow(ctk.CTkToplevel):
         style.map("Treeview.Heading", background=[('active', '#3484ba')])
         style.configure("Treeview", borderwidth=0, relief="flat", rowheight=25)
 
-        self.tree = ttk.Treeview(table_frame, columns=("id", "source", "translation"), show="headings")
+        self.tree = ttk.Treeview(table_frame, columns=("id", "source", "translation", "fuzzy"), show="headings")
         self.tree.heading("id", text="ID")
         self.tree.heading("source", text="Original (Japanese)")
         self.tree.heading("translation", text="Translation (English)")
+        self.tree.heading("fuzzy", text="Fuzzy Match Of")
         self.tree.column("id", width=50, stretch=False, anchor="center")
-        self.tree.column("source", width=350)
-        self.tree.column("translation", width=350)
+        self.tree.column("source", width=300)
+        self.tree.column("translation", width=300)
+        self.tree.column("fuzzy", width=150)
 
         self.tree.tag_configure("oddrow", background="#2a2d2e", foreground="white")
         self.tree.tag_configure("evenrow", background="#343638", foreground="white")
+        self.tree.tag_configure("fuzzyrow", foreground="#f0b429")
 
         self.tree.grid(row=0, column=0, sticky="nsew")
 
-        scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
-        scrollbar.grid(row=0, column=1, sticky="ns")
+        self.scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self.on_tree_scroll)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
 
         self.tree.bind("<Delete>", self.delete_on_key_press)
         self.tree.bind("<<TreeviewSelect>>", self.on_item_select)
@@ -95,16 +104,36 @@ class DatabaseEditorWindow(ctk.CTkToplevel):
             self.load_entries()
             messagebox.showinfo("Success", "The Translation Memory database has been flushed.", parent=self)
 
-    def load_entries(self):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-
-        search_term = self.search_var.get()
-        entries = self.tm.fetch_all_entries(search_term)
+    def schedule_search(self):
+        # Wait for a pause in typing instead of querying on every keystroke.
+        if self._search_after_id is not None:
+            self.after_cancel(self._search_after_id)
+        self._search_after_id = self.after(self.SEARCH_DEBOUNCE_MS, self.load_entries)
 
-        for i, entry in enumerate(entries):
-            tag = "evenrow" if i % 2 == 0 else "oddrow"
-            self.tree.insert("", "end", values=entry, tags=(tag,))
+    def load_entries(self):
+        self._search_after_id = None
+        self.tree.delete(*self.tree.get_children())
+        self._loaded_count = 0
+        self._has_more_entries = True
+        self.load_next_page()
+
+    def load_next_page(self):
+        if not self._has_more_entries:
+            return
+        entries = self.tm.fetch_entries(self.search_var.get(), offset=self._loaded_count, limit=self.PAGE_SIZE)
+        for i, entry in enumerate(entries, start=self._loaded_count):
+            tags = ("evenrow" if i % 2 == 0 else "oddrow",)
+            if entry[3]:
+                tags += ("fuzzyrow",)
+            self.tree.insert("", "end", values=entry, tags=tags)
+        self._loaded_count += len(entries)
+        self._has_more_entries = len(entries) == self.PAGE_SIZE
+
+    def on_tree_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        # Fetch the next page once the user scrolls near the end of what is loaded.
+        if self._has_more_entries and float(last) > 0.9:
+            self.after_idle(self.load_next_page)
 
     def on_item_select(self, event):
         selected_items = self.tree.selection()
@@ -130,7 +159,12 @@ class DatabaseEditorWindow(ctk.CTkToplevel):
         if new_translation:
             self.tm.update_translation(self.selected_source_text, new_translation)
             messagebox.showinfo("Success", "Translation updated successfully.", parent=self)
-            self.load_entries()
+            # Update the row in place so the loaded pages and scroll position are kept. Saving counts as
+            # reviewing, which clears the fuzzy-match marker.
+            for item in self.tree.selection():
+                values = self.tree.item(item)["values"]
+                tags = tuple(tag for tag in self.tree.item(item)["tags"] if tag != "fuzzyrow")
+                self.tree.item(item, values=(values[0], values[1], new_translation, ""), tags=tags)
         else:
             messagebox.showwarning("Input Error", "Translation cannot be empty.", parent=self)
 
@@ -145,8 +179,20 @@ class DatabaseEditorWindow(ctk.CTkToplevel):
             self.tm.delete_entry(self.selected_source_text)
             self.edit_entry.delete(0, "end")
             self.selected_source_text = None
-            self.load_entries()
+            for item in self.tree.selection():
+                index = self.tree.index(item)
+                self.tree.delete(item)
+                self._restripe(index)
+            self._loaded_count = max(0, self._loaded_count - 1)
+
+    def _restripe(self, start: int):
+        # Rows below a deleted one move up by one, so their alternating backgrounds flip.
+        for i, item in enumerate(self.tree.get_children()[start:], start=start):
+            tags = tuple(tag for tag in self.tree.item(item)["tags"] if tag not in ("evenrow", "oddrow"))
+            self.tree.item(item, tags=("evenrow" if i % 2 == 0 else "oddrow",) + tags)
 
     def on_close(self):
+        if self._search_after_id is not None:
+            self.after_cancel(self._search_after_id)
         self.master.db_editor_window = None
         self.destroy()
\ No newline at end of file
@@ -2,9 +2,15 @@
 
 import os
 import sys
+import time
 from tkinter import PhotoImage, Toplevel, Label
 from app import App
 
+# The splash stays up until the models are loaded, but never longer than this; after that the
+# window opens and the Start button shows when it is ready.
+SPLASH_MAX_MS = 10000
+SPLASH_POLL_MS = 100
+
 
 def resource_path(relative_path: str):
     try:
@@ -34,8 +40,11 @@ if __name__ == "__main__":
     splash.wm_attributes('-transparentcolor', transparent_color)
 
     Label(splash, image=splash_img, bg=transparent_color).pack()
+    status_label = Label(splash, text=app.startup_status, bg=transparent_color, fg="white")
+    status_label.pack()
 
-    w, h = splash_img.width(), splash_img.height()
+    splash.update_idletasks()
+    w, h = splash.winfo_reqwidth(), splash.winfo_reqheight()
     x = (splash.winfo_screenwidth() - w) // 2
     y = (splash.winfo_screenheight() - h) // 2
     splash.geometry(f"{w}x{h}+{x}+{y}")
@@ -47,6 +56,16 @@ if __name__ == "__main__":
         app.deiconify()
 
 
-    splash.after(2000, close_splash)
+    splash_shown = time.perf_counter()
+
+    def poll_ready():
+        if app.engine_ready.is_set() or (time.perf_counter() - splash_shown) * 1000 >= SPLASH_MAX_MS:
+            close_splash()
+        else:
+            status_label.configure(text=app.startup_status)
+            splash.after(SPLASH_POLL_MS, poll_ready)
+
+
+    poll_ready()
 
     app.mainloop()
\ No newline at end of file
@@ -0,0 +1,86 @@
+import os
+import shutil
+import zipfile
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from natsort import natsorted
+
+from .batch import IMAGE_EXTENSIONS
+from .pipeline import PagePipeline
+
+ARCHIVE_EXTENSIONS = (".cbz", ".zip")
+_PARTIAL_MARKER = ".partial"
+
+
+def is_archive(path: str) -> bool:
+    return path.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def list_archives(input_dir: str) -> List[str]:
+    return natsorted([f for f in os.listdir(input_dir) if is_archive(f) and not f.startswith(".")])
+
+
+def output_archive_name(archive_name: str) -> str:
+    """Translated chapters are always written as .cbz, whatever the input's extension."""
+    return f"{os.path.splitext(archive_name)[0]}.cbz"
+
+
+def _is_junk(info: zipfile.ZipInfo) -> bool:
+    # Folders, macOS resource forks (__MACOSX/._name) and other hidden files.
+    return info.is_dir() or info.filename.startswith("__MACOSX/") or os.path.basename(info.filename).startswith(".")
+
+
+def _is_page(info: zipfile.ZipInfo) -> bool:
+    return not _is_junk(info) and info.filename.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def list_archive_pages(archive: zipfile.ZipFile) -> List[str]:
+    """Page entry names in reading order."""
+    return natsorted([info.filename for info in archive.infolist() if _is_page(info)])
+
+
+def translate_archive(translator, input_path: str, output_path: str,
+                      pipeline_kwargs: Optional[Dict[str, Any]] = None,
+                      progress_callback: Optional[Callable[[int, int, str, Optional[str]], None]] = None
+                      ) -> List[Tuple[str, Optional[str]]]:
+    """Translate every page of a CBZ/ZIP chapter into a new CBZ at output_path.
+
+    Pages are read from the archive straight into memory and streamed through a PagePipeline; each
+    translated page is appended to the output as soon as it (and every page before it) is done, so
+    nothing is extracted to disk. Entries that are not pages, such as ComicInfo.xml, are copied over
+    unchanged, and a page that fails keeps its original image so the chapter stays complete.
+    Translated pages are encoded by the translator's PageEncoder, so with an output format set
+    their entries are renamed to match. The output is written under a temporary name and renamed
+    into place when finished.
+
+    Returns (entry_name, error) per page, error being None on success.
+    """
+    directory, name = os.path.split(output_path)
+    temp_path = os.path.join(directory, f".{name}{_PARTIAL_MARKER}-{os.getpid()}")
+    results = []
+    try:
+        with zipfile.ZipFile(input_path) as source, zipfile.ZipFile(temp_path, "w") as target:
+            pages = list_archive_pages(source)
+            page_infos = {info.filename: info for info in source.infolist() if info.filename in pages}
+            # Metadata first: readers that stream the archive see ComicInfo.xml before any page.
+            for info in source.infolist():
+                if not _is_junk(info) and info.filename not in page_infos:
+                    with source.open(info) as src, target.open(info, "w") as dst:
+                        shutil.copyfileobj(src, dst)
+
+            pipeline = PagePipeline(translator, **(pipeline_kwargs or {}), read_bytes=source.read, keep_encoded=True)
+            for job, error in pipeline.run_jobs((name, translator.encoder.output_name(name)) for name in pages):
+                info = page_infos[job.input_path]
+                # Pages are already compressed images; storing them is faster and no bigger.
+                entry = zipfile.ZipInfo(info.filename if error else job.output_path, date_time=info.date_time)
+                entry.compress_type = zipfile.ZIP_STORED
+                target.writestr(entry, source.read(info) if error else job.encoded)
+                job.encoded = None
+                results.append((job.input_path, error))
+                if progress_callback:
+                    progress_callback(len(results), len(pages), job.input_path, error)
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return results
@@ -0,0 +1,59 @@
+import json
+import os
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+
+
+class PageArtifacts(NamedTuple):
+    bubbles: List[List[int]]
+    masks: List[Optional[np.ndarray]]
+    texts: List[str]
+
+
+class ArtifactCache:
+    """On-disk cache of each page's detection and OCR results.
+
+    Entries are keyed by the hash of the page's file bytes and live under a directory named after
+    the model version, so changing the detector or OCR model never serves stale results. Bubbles
+    are stored in the order they are typeset. Each page is one compressed .npz file.
+    """
+
+    def __init__(self, cache_dir: str, model_version: str):
+        self.cache_dir = cache_dir
+        self.model_version = model_version
+        self.root = os.path.join(cache_dir, model_version)
+
+    def _path(self, page_hash: str) -> str:
+        return os.path.join(self.root, page_hash[:2], f"{page_hash}.npz")
+
+    def get(self, page_hash: str) -> Optional[PageArtifacts]:
+        path = self._path(page_hash)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                bubbles = data["bubbles"].tolist()
+                texts = json.loads(str(data["texts"]))
+                has_mask = data["has_mask"].tolist()
+                masks = [data[f"mask_{i}"] if present else None for i, present in enumerate(has_mask)]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Ignoring unreadable page cache entry {path}: {e}")
+            return None
+        return PageArtifacts(bubbles, masks, texts)
+
+    def put(self, page_hash: str, bubbles: List[List[int]], masks: List[Optional[np.ndarray]], texts: List[str]):
+        path = self._path(page_hash)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        masks = masks or [None] * len(bubbles)
+        arrays = {f"mask_{i}": mask for i, mask in enumerate(masks) if mask is not None}
+        temp_path = f"{path}.partial-{os.getpid()}.npz"
+        try:
+            np.savez_compressed(temp_path, bubbles=np.asarray(bubbles, dtype=np.int32).reshape(-1, 4),
+                                texts=np.array(json.dumps(texts, ensure_ascii=False)),
+                                has_mask=np.array([mask is not None for mask in masks], dtype=bool), **arrays)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"⚠️ Could not write page cache entry {path}: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
@@ -0,0 +1,187 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Tuple, Dict, Any, Callable, Optional
+
+from natsort import natsorted
+
+from .encoder import WriteStats, output_filename
+from .manifest import RunManifest, config_version, file_hash
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+# Set once per worker process by _init_worker; each process owns its own models.
+_worker_translator = None
+_worker_pipeline = None
+_worker_pipeline_kwargs: Dict[str, Any] = {}
+
+
+def list_image_files(input_dir: str) -> List[str]:
+    return natsorted([f for f in os.listdir(input_dir) if f.lower().endswith(IMAGE_EXTENSIONS)])
+
+
+def default_worker_count() -> int:
+    # YOLO and manga-ocr each want a few intra-op threads to be efficient, so
+    # one process per core oversubscribes; four cores per worker is a good default.
+    return max(1, (os.cpu_count() or 1) // 4)
+
+
+def torch_threads_per_worker(workers: int) -> int:
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def chunk_pages(pairs: List[Tuple[str, str]], pages_per_task: int) -> List[List[Tuple[str, str]]]:
+    pages_per_task = max(1, pages_per_task)
+    return [pairs[i:i + pages_per_task] for i in range(0, len(pairs), pages_per_task)]
+
+
+def _init_worker(api_key_path: str, torch_threads: int, translator_kwargs: Dict[str, Any],
+                 pipeline_kwargs: Dict[str, Any]):
+    global _worker_translator, _worker_pipeline, _worker_pipeline_kwargs
+    # Must be set before torch is imported in this process to size its OpenMP pool.
+    os.environ["OMP_NUM_THREADS"] = str(torch_threads)
+    os.environ["MKL_NUM_THREADS"] = str(torch_threads)
+
+    import torch
+    torch.set_num_threads(torch_threads)
+
+    from .pipeline import PagePipeline
+    from .translator import MangaTranslator
+    _worker_translator = MangaTranslator(google_api_key_path=api_key_path, **translator_kwargs)
+    _worker_pipeline = PagePipeline(_worker_translator, **pipeline_kwargs)
+    _worker_pipeline_kwargs = pipeline_kwargs
+
+
+def _flush_worker_caches():
+    # Pool workers exit via os._exit, skipping atexit, so commit queued TM and OCR cache writes per task.
+    _worker_translator.tm.flush()
+    if _worker_translator.ocr_cache is not None:
+        _worker_translator.ocr_cache.flush()
+
+
+def _process_chunk(pairs: List[Tuple[str, str]]) -> Tuple[List[Tuple[str, Optional[str]]], Dict[str, Any]]:
+    results = list(_worker_pipeline.run(pairs))
+    _flush_worker_caches()
+    return results, _worker_translator.encoder.stats.take().as_dict()
+
+
+def archive_error(results: List[Tuple[str, Optional[str]]]) -> Optional[str]:
+    """One error message for a translated archive whose pages failed, or None if every page succeeded."""
+    failed = [(name, error) for name, error in results if error]
+    if not failed:
+        return None
+    details = "; ".join(f"{name}: {error}" for name, error in failed[:3])
+    return f"{len(failed)} of {len(results)} page(s) kept untranslated ({details})"
+
+
+def _process_archive(pair: Tuple[str, str]) -> Tuple[List[Tuple[str, Optional[str]]], Dict[str, Any]]:
+    from .archive import translate_archive
+
+    input_path, output_path = pair
+    try:
+        error = archive_error(translate_archive(_worker_translator, input_path, output_path, _worker_pipeline_kwargs))
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    _flush_worker_caches()
+    return [(input_path, error)], _worker_translator.encoder.stats.take().as_dict()
+
+
+def run_batch(input_dir: str, output_dir: str, api_key_path: str, workers: int = 1,
+              pages_per_task: int = 1, translator_kwargs: Optional[Dict[str, Any]] = None,
+              pipeline_kwargs: Optional[Dict[str, Any]] = None, incremental: bool = True,
+              progress_callback: Optional[Callable[[int, int, str, Optional[str]], None]] = None,
+              write_stats: Optional[WriteStats] = None) -> List[Tuple[str, Optional[str]]]:
+    """Translate every page in input_dir using a pool of worker processes.
+
+    Pages are handed out in small chunks so faster workers pick up more of the
+    volume; within a worker each chunk streams through a PagePipeline configured by
+    pipeline_kwargs (stage_workers, queue_size, artifacts). CBZ/ZIP chapters in input_dir are
+    each handed to one worker and written to output_dir as .cbz. Returns
+    (input_path, error) for each page or archive that was processed, error being
+    None on success. Pages are named and encoded per translator_kwargs' output_format
+    and quality settings; the workers' encode/write totals are added to write_stats.
+
+    With incremental, pages whose input and settings are unchanged since they were last written
+    (per the output folder's RunManifest) are skipped, and each page is recorded as it finishes.
+    """
+    from .archive import is_archive, list_archives, output_archive_name
+
+    image_files = list_image_files(input_dir)
+    archives = list_archives(input_dir)
+    if not image_files and not archives:
+        return []
+    os.makedirs(output_dir, exist_ok=True)
+
+    output_format = (translator_kwargs or {}).get("output_format")
+    pairs = [(os.path.join(input_dir, f), os.path.join(output_dir, output_filename(f, output_format)))
+             for f in image_files]
+    pairs += [(os.path.join(input_dir, f), os.path.join(output_dir, output_archive_name(f))) for f in archives]
+    manifest = RunManifest(output_dir, config_version(translator_kwargs))
+    input_hashes = {}
+    if incremental:
+        pending = manifest.pending(pairs)
+        pairs = [(input_path, output_path) for input_path, output_path, _ in pending]
+        input_hashes = {input_path: input_hash for input_path, _, input_hash in pending}
+    if not pairs:
+        return []
+    output_paths = dict(pairs)
+    workers = max(1, min(workers, len(pairs)))
+    torch_threads = torch_threads_per_worker(workers)
+
+    # Spawn rather than fork: forking a parent that has touched torch/OpenMP can deadlock.
+    context = multiprocessing.get_context("spawn")
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=(api_key_path, torch_threads, translator_kwargs or {},
+                                       pipeline_kwargs or {})) as pool:
+        page_pairs = [pair for pair in pairs if not is_archive(pair[0])]
+        futures = [pool.submit(_process_chunk, chunk) for chunk in chunk_pages(page_pairs, pages_per_task)]
+        futures += [pool.submit(_process_archive, pair) for pair in pairs if is_archive(pair[0])]
+        for future in as_completed(futures):
+            chunk_results, chunk_stats = future.result()
+            if write_stats is not None:
+                write_stats.merge(chunk_stats)
+            for input_path, error in chunk_results:
+                results.append((input_path, error))
+                if not error:
+                    input_hash = input_hashes.get(input_path) or file_hash(input_path)
+                    manifest.record(output_paths[input_path], input_hash)
+                if progress_callback:
+                    progress_callback(len(results), len(pairs), input_path, error)
+    return results
+
+
+def run_service_batch(client, input_dir: str, output_dir: str, incremental: bool = True,
+                      progress_callback: Optional[Callable[[int, int, str, Optional[str]], None]] = None,
+                      artifacts: str = "use") -> List[Tuple[str, Optional[str]]]:
+    """Like run_batch, but the pages are translated by a running TranslationService through client.
+
+    The output folder's manifest is keyed by the service's settings, and outputs are named for its
+    output format, as reported by its /health. artifacts is passed on to the service's PagePipeline.
+    """
+    health = client.health()
+    if health is None:
+        raise ConnectionError(f"No translation service is listening at {client.url}")
+    image_files = list_image_files(input_dir)
+    if not image_files:
+        return []
+    os.makedirs(output_dir, exist_ok=True)
+
+    pairs = [(os.path.join(input_dir, f), os.path.join(output_dir, output_filename(f, health.get("output_format"))))
+             for f in image_files]
+    manifest = RunManifest(output_dir, health["config_version"])
+    if incremental:
+        pending = manifest.pending(pairs)
+    else:
+        pending = [(input_path, output_path, None) for input_path, output_path in pairs]
+    results = []
+    chapter = client.translate_chapter(((input_path, output_path) for input_path, output_path, _ in pending),
+                                       artifacts)
+    for (input_path, output_path, input_hash), result in zip(pending, chapter):
+        error = result["error"]
+        results.append((input_path, error))
+        if not error:
+            manifest.record(output_path, input_hash or file_hash(input_path))
+        if progress_callback:
+            progress_callback(len(results), len(pending), input_path, error)
+    return results
@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from .manifest import write_bytes_atomic
+
+# "same" keeps each page in its input's format; the others rename outputs to that extension.
+OUTPUT_FORMATS = ("same", "png", "jpg", "webp")
+DEFAULT_JPEG_QUALITY = 95
+# Above 100 OpenCV writes lossless WebP.
+DEFAULT_WEBP_QUALITY = 90
+# zlib level 0-9; None keeps OpenCV's default. Low levels encode much faster for somewhat larger files.
+DEFAULT_PNG_COMPRESSION = None
+
+
+def validate(output_format: str, jpeg_quality: int = DEFAULT_JPEG_QUALITY, webp_quality: int = DEFAULT_WEBP_QUALITY,
+             png_compression: Optional[int] = DEFAULT_PNG_COMPRESSION):
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+    if not 0 <= jpeg_quality <= 100:
+        raise ValueError(f"JPEG quality must be between 0 and 100, got {jpeg_quality}")
+    if not 1 <= webp_quality <= 101:
+        raise ValueError(f"WebP quality must be between 1 and 101 (lossless), got {webp_quality}")
+    if png_compression is not None and not 0 <= png_compression <= 9:
+        raise ValueError(f"PNG compression must be between 0 and 9, got {png_compression}")
+
+
+def output_filename(filename: str, output_format: Optional[str] = "same") -> str:
+    """The name a page is written under: filename with its extension swapped for output_format's."""
+    if not output_format or output_format == "same":
+        return filename
+    return f"{os.path.splitext(filename)[0]}.{output_format}"
+
+
+class WriteStats:
+    """Running totals for encoded and written pages; safe to update from several threads."""
+
+    def __init__(self):
+        self.pages = 0
+        self.bytes = 0
+        self.encode_seconds = 0.0
+        self.write_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, pages: int = 0, size: int = 0, encode_seconds: float = 0.0, write_seconds: float = 0.0):
+        with self._lock:
+            self.pages += pages
+            self.bytes += size
+            self.encode_seconds += encode_seconds
+            self.write_seconds += write_seconds
+
+    def merge(self, stats: Dict[str, Any]):
+        """Add totals reported as a dict by as_dict, e.g. from another process."""
+        self.add(stats["pages"], stats["bytes"], stats["encode_seconds"], stats["write_seconds"])
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"pages": self.pages, "bytes": self.bytes, "encode_seconds": self.encode_seconds,
+                    "write_seconds": self.write_seconds}
+
+    def take(self) -> "WriteStats":
+        """A copy of the totals so far, resetting them to zero, e.g. to report each run separately."""
+        taken = WriteStats()
+        with self._lock:
+            taken.pages, taken.bytes = self.pages, self.bytes
+            taken.encode_seconds, taken.write_seconds = self.encode_seconds, self.write_seconds
+            self.pages = self.bytes = 0
+            self.encode_seconds = self.write_seconds = 0.0
+        return taken
+
+    def summary(self) -> str:
+        totals = self.as_dict()
+        pages = totals["pages"]
+        if not pages:
+            return "no pages written"
+        return (f"{pages} page(s), {totals['bytes'] / 1e6:.1f} MB ({totals['bytes'] / pages / 1e6:.2f} MB/page), "
+                f"encoding {totals['encode_seconds'] * 1000 / pages:.0f} ms/page, "
+                f"writing {totals['write_seconds'] * 1000 / pages:.0f} ms/page")
+
+
+class PageEncoder:
+    """Encodes rendered pages with the configured quality settings and keeps WriteStats for them.
+
+    The codec is picked from the destination's extension, so a path named by output_name gets
+    output_format; the quality settings apply to whichever of JPEG, WebP or PNG that is.
+    """
+
+    def __init__(self, output_format: str = "same", jpeg_quality: int = DEFAULT_JPEG_QUALITY,
+                 webp_quality: int = DEFAULT_WEBP_QUALITY, png_compression: Optional[int] = DEFAULT_PNG_COMPRESSION):
+        validate(output_format, jpeg_quality, webp_quality, png_compression)
+        self.output_format = output_format
+        self.jpeg_quality = jpeg_quality
+        self.webp_quality = webp_quality
+        self.png_compression = png_compression
+        self.stats = WriteStats()
+
+    def output_name(self, filename: str) -> str:
+        return output_filename(filename, self.output_format)
+
+    def _params(self, ext: str) -> List[int]:
+        if ext in (".jpg", ".jpeg"):
+            return [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]
+        if ext == ".webp":
+            return [cv2.IMWRITE_WEBP_QUALITY, self.webp_quality]
+        if ext == ".png" and self.png_compression is not None:
+            return [cv2.IMWRITE_PNG_COMPRESSION, self.png_compression]
+        return []
+
+    def encode(self, image: np.ndarray, path: str) -> bytes:
+        """image encoded in the format of path's extension (PNG if it has none)."""
+        ext = os.path.splitext(path)[1].lower() or ".png"
+        start = time.perf_counter()
+        ok, encoded = cv2.imencode(ext, image, self._params(ext))
+        if not ok:
+            raise IOError(f"Could not encode image: {path}")
+        data = encoded.tobytes()
+        self.stats.add(pages=1, size=len(data), encode_seconds=time.perf_counter() - start)
+        return data
+
+    def write(self, path: str, image: np.ndarray):
+        data = self.encode(image, path)
+        start = time.perf_counter()
+        write_bytes_atomic(path, data)
+        self.stats.add(write_seconds=time.perf_counter() - start)
+
@@ -0,0 +1,140 @@
+import math
+from array import array
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+
+def _length_bucket(length: int) -> int:
+    # Postings are split into buckets of string lengths 1, 2-3, 4-7, 8-15, ...
+    return length.bit_length() - 1
+
+
+class NGramIndex:
+    """Character n-gram inverted index for near-duplicate OCR lines.
+
+    A string whose difflib ratio to the query reaches the threshold has a length within bounds
+    set by the query's and shares a minimum number of the query's n-grams (see _bounds). Postings
+    are split by length bucket, so a lookup only counts shared grams, with numpy, over strings of
+    about the right length; the few strings that share enough are scored with difflib's ratio.
+    Lookups are lossless: every indexed string at or above the threshold is scored.
+    """
+
+    def __init__(self, n: int = 2, threshold: float = 0.8):
+        if not 0 < threshold <= 1:
+            raise ValueError(f"Fuzzy threshold must be in (0, 1], got {threshold}")
+        self.n = n
+        self.threshold = threshold
+        self._ids: Dict[str, int] = {}
+        self._texts: List[Optional[str]] = []
+        # Length per id, 0 once removed; a numpy buffer that doubles as it fills, so add() stays cheap.
+        self._lengths = np.zeros(1024, dtype=np.uintc)
+        # gram -> ids of the strings containing it, in ascending order, split by length bucket (list
+        # index) so lookups only count strings of about the right length.
+        self._postings: Dict[str, List[Optional[array]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _grams(self, text: str) -> Set[str]:
+        # Pad so short lines and their first/last characters still produce distinctive grams.
+        padded = f"\x02{text}\x03"
+        return {padded[i:i + self.n] for i in range(len(padded) - self.n + 1)}
+
+    def add(self, text: str):
+        if not text or text in self._ids:
+            return
+        text_id = len(self._texts)
+        self._ids[text] = text_id
+        self._texts.append(text)
+        if text_id == len(self._lengths):
+            self._lengths = np.concatenate([self._lengths, np.zeros_like(self._lengths)])
+        self._lengths[text_id] = len(text)
+        bucket = _length_bucket(len(text))
+        for gram in self._grams(text):
+            buckets = self._postings.get(gram)
+            if buckets is None:
+                buckets = self._postings[gram] = [None] * (bucket + 1)
+            elif len(buckets) <= bucket:
+                buckets.extend([None] * (bucket + 1 - len(buckets)))
+            if buckets[bucket] is None:
+                buckets[bucket] = array("I", (text_id,))
+            else:
+                buckets[bucket].append(text_id)
+
+    def remove(self, text: str):
+        # Leave a tombstone; postings that still point at it are skipped during lookup.
+        text_id = self._ids.pop(text, None)
+        if text_id is not None:
+            self._texts[text_id] = None
+            self._lengths[text_id] = 0
+
+    def clear(self):
+        self._ids.clear()
+        self._texts.clear()
+        self._lengths[:] = 0
+        self._postings.clear()
+
+    def _bounds(self, length: int, gram_count: int) -> Tuple[int, int, int]:
+        """(shortest, longest, min_shared) for strings whose ratio to a query of this length can reach the threshold.
+
+        ratio is 2M / (|a| + |b|) for M matched characters, which puts |b| within
+        [|a|t / (2 - t), |a|(2 - t) / t]. Each of the |a| - M unmatched query characters breaks at
+        most n of the query's grams, and each gap where the candidate inserts characters breaks at
+        most n - 1 more, so at least gram_count - n(|a| - M) - (n - 1)(|b| - M) grams are shared.
+        With M at its minimum that bound is linear in |b|, so its worst case is at an end of the range.
+        """
+        t = self.threshold
+        # The small tolerance keeps float rounding from excluding a boundary case.
+        shortest, longest = length * t / (2 - t), length * (2 - t) / t
+        worst_broken = max(self.n * length + (self.n - 1) * other - (2 * self.n - 1) * t * (length + other) / 2
+                           for other in (shortest, longest))
+        return (math.ceil(shortest - 1e-9), math.floor(longest + 1e-9),
+                gram_count - math.floor(worst_broken + 1e-9))
+
+    def _candidates(self, grams: Set[str], shortest: int, longest: int, min_shared: int) -> np.ndarray:
+        """Ids of strings of length shortest..longest sharing at least min_shared of grams, most shared first."""
+        first, last = _length_bucket(shortest), _length_bucket(longest)
+        postings = [ids for gram in grams for ids in self._postings.get(gram, ())[first:last + 1] if ids]
+        if not postings:
+            return np.empty(0, dtype=np.intp)
+        counts = np.bincount(np.frombuffer(b"".join(postings), dtype=np.uintc))
+        candidates = np.flatnonzero(counts >= min_shared)
+        # The end buckets may hold strings just outside the bounds.
+        lengths = self._lengths[candidates]
+        candidates = candidates[(lengths >= shortest) & (lengths <= longest)]
+        # Score the strings sharing the most grams first; an early good match prunes the rest quickly.
+        return candidates[np.argsort(-counts[candidates], kind="stable")]
+
+    def best_match(self, text: str) -> Optional[Tuple[str, float]]:
+        """Most similar indexed string other than text itself, if its ratio reaches the threshold."""
+        if not text:
+            return None
+        grams = self._grams(text)
+        shortest, longest, min_shared = self._bounds(len(text), len(grams))
+
+        if min_shared <= 0:
+            # A short query at a low threshold: sharing no gram at all does not rule a string out.
+            lengths = self._lengths[:len(self._texts)]
+            candidates = np.flatnonzero((lengths >= shortest) & (lengths <= longest))
+        else:
+            candidates = self._candidates(grams, shortest, longest, min_shared)
+
+        best_text, best_score = None, self.threshold
+        characters = Counter(text)
+        for text_id in candidates:
+            candidate = self._texts[text_id]
+            if candidate is None or candidate == text:
+                continue
+            # difflib's quick_ratio bound, without building a SequenceMatcher for strings it rules out.
+            total = len(text) + len(candidate)
+            if 2.0 * min(len(text), len(candidate)) / total < best_score or \
+                    2.0 * sum((characters & Counter(candidate)).values()) / total < best_score:
+                continue
+            matcher = SequenceMatcher(None, text, candidate, autojunk=False)
+            score = matcher.ratio()
+            if score >= best_score:
+                best_text, best_score = candidate, score
+        return (best_text, best_score) if best_text is not None else None
@@ -0,0 +1,224 @@
+# Loads the bubble detector and OCR model for PyTorch, ONNX Runtime or OpenVINO.
+#
+# Exported and quantized models are cached next to the originals (yolo_models/, local_models/) and
+# reused on later runs. Everything beyond PyTorch is imported only when that backend is selected:
+# onnx needs onnxruntime, onnx and optimum[onnxruntime]; openvino needs openvino, nncf and
+# optimum[openvino].
+
+import hashlib
+import os
+import shutil
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+INFERENCE_BACKENDS = ("torch", "onnx", "openvino")
+# dynamic: int8 weights, activations quantized on the fly. static: int8 weights and activations,
+# with activation ranges calibrated on sample pages (detector only; the OCR model always uses
+# weight quantization, which is what transformer decoders tolerate).
+QUANTIZATION_MODES = ("dynamic", "static")
+CALIBRATION_PAGES = 32
+DETECTOR_IMGSZ = 640
+
+DEFAULT_OCR_MODEL = "kha-white/manga-ocr-base"
+
+
+def validate(backend: str, quantize: Optional[str]):
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend}")
+    if quantize is not None and quantize not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode: {quantize}")
+    if backend == "torch" and quantize:
+        raise ValueError("Quantization needs the onnx or openvino backend")
+    if backend == "openvino" and quantize == "dynamic":
+        raise ValueError("OpenVINO quantizes the detector statically; use --quantize static with calibration pages")
+
+
+def calibration_hash(image_paths: List[str]) -> str:
+    """Fingerprint of the names and contents of the pages static quantization calibrates on."""
+    digest = hashlib.sha256()
+    for path in sorted(image_paths[:CALIBRATION_PAGES], key=os.path.basename):
+        digest.update(os.path.basename(path).encode("utf-8") + b"\0")
+        with open(path, "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()[:12]
+
+
+def _calibration_inputs(image_paths: List[str]) -> List[np.ndarray]:
+    """Sample pages letterboxed and normalized exactly as ultralytics feeds the detector."""
+    from ultralytics.data.augment import LetterBox
+
+    letterbox = LetterBox(new_shape=(DETECTOR_IMGSZ, DETECTOR_IMGSZ), auto=False)
+    inputs = []
+    for path in image_paths[:CALIBRATION_PAGES]:
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        boxed = letterbox(image=image)
+        tensor = boxed[:, :, ::-1].transpose(2, 0, 1).astype(np.float32) / 255.0
+        inputs.append(np.ascontiguousarray(tensor[None]))
+    if not inputs:
+        raise ValueError("Static quantization needs readable calibration pages")
+    return inputs
+
+
+def _export_detector(yolo_path: str, backend: str) -> str:
+    from ultralytics import YOLO
+
+    root = os.path.splitext(yolo_path)[0]
+    exported = f"{root}.onnx" if backend == "onnx" else f"{root}_openvino_model"
+    if not os.path.exists(exported):
+        print(f"Exporting {os.path.basename(yolo_path)} for {backend} (one-time)...")
+        # dynamic=True keeps the batch and image size free so batched detection still works.
+        exported = YOLO(yolo_path).export(format=backend, imgsz=DETECTOR_IMGSZ, dynamic=True)
+    return exported
+
+
+def _quantize_onnx_detector(onnx_path: str, quantize: str, calibration_images: List[str]) -> str:
+    import onnx
+    from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic,
+                                          quantize_static)
+
+    # Statically quantized models depend on the pages they were calibrated on, so each set gets its own file.
+    suffix = f"_{calibration_hash(calibration_images)}" if quantize == "static" else ""
+    output = f"{os.path.splitext(onnx_path)[0]}_int8_{quantize}{suffix}.onnx"
+    if os.path.exists(output):
+        return output
+    print(f"Quantizing {os.path.basename(onnx_path)} to int8 ({quantize})...")
+    if quantize == "dynamic":
+        quantize_dynamic(onnx_path, output, weight_type=QuantType.QInt8)
+    else:
+        input_name = onnx.load(onnx_path, load_external_data=False).graph.input[0].name
+
+        class _Pages(CalibrationDataReader):
+            def __init__(self):
+                self._inputs = iter(_calibration_inputs(calibration_images))
+
+            def get_next(self):
+                tensor = next(self._inputs, None)
+                return None if tensor is None else {input_name: tensor}
+
+        # QDQ keeps the graph runnable by both ONNX Runtime and OpenVINO.
+        quantize_static(onnx_path, output, _Pages(), quant_format=QuantFormat.QDQ,
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8, per_channel=True)
+
+    # ultralytics reads the task, class names and image size from the model's metadata.
+    source, quantized = onnx.load(onnx_path), onnx.load(output)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(source.metadata_props)
+    onnx.save(quantized, output)
+    return output
+
+
+def _quantize_openvino_detector(model_dir: str, calibration_images: List[str]) -> str:
+    import nncf
+    import openvino as ov
+
+    # ultralytics recognizes OpenVINO models by the "_openvino_model" directory suffix, so the hash goes before it.
+    output_dir = model_dir.replace("_openvino_model", f"_int8_{calibration_hash(calibration_images)}_openvino_model")
+    if os.path.exists(output_dir):
+        return output_dir
+    print(f"Quantizing {os.path.basename(model_dir)} to int8...")
+    xml = next(name for name in os.listdir(model_dir) if name.endswith(".xml"))
+    model = ov.Core().read_model(os.path.join(model_dir, xml))
+    inputs = _calibration_inputs(calibration_images)
+    quantized = nncf.quantize(model, nncf.Dataset(inputs), preset=nncf.QuantizationPreset.MIXED,
+                              subset_size=len(inputs))
+    os.makedirs(output_dir, exist_ok=True)
+    ov.save_model(quantized, os.path.join(output_dir, xml))
+    shutil.copy(os.path.join(model_dir, "metadata.yaml"), output_dir)
+    return output_dir
+
+
+def load_detector(yolo_path: str, backend: str = "torch", quantize: Optional[str] = None, device: str = "cpu",
+                  calibration_images: Optional[List[str]] = None):
+    """The YOLO segmentation model for the given backend, exporting/quantizing it on first use."""
+    from ultralytics import YOLO
+
+    validate(backend, quantize)
+    if backend == "torch":
+        return YOLO(yolo_path).to(device)
+    if quantize == "static" and not calibration_images:
+        raise ValueError("Static quantization needs calibration pages")
+
+    path = _export_detector(yolo_path, backend)
+    if quantize and backend == "onnx":
+        path = _quantize_onnx_detector(path, quantize, calibration_images)
+    elif quantize:
+        path = _quantize_openvino_detector(path, calibration_images)
+    return YOLO(path, task="segment")
+
+
+def _ocr_cache_dir(ocr_path: str, backend: str, quantize: Optional[str]) -> str:
+    suffix = f"-{backend}" + ("-int8" if quantize else "")
+    return f"{ocr_path.rstrip('/')}{suffix}"
+
+
+def _export_onnx_ocr(source: str, ocr_path: str, quantize: Optional[str]):
+    from optimum.onnxruntime import ORTModelForVision2Seq
+
+    float_dir = _ocr_cache_dir(ocr_path, "onnx", None)
+    if not os.path.exists(float_dir):
+        print("Exporting the OCR model to ONNX (one-time)...")
+        ORTModelForVision2Seq.from_pretrained(source, export=True).save_pretrained(float_dir)
+    if not quantize:
+        return ORTModelForVision2Seq.from_pretrained(float_dir)
+
+    int8_dir = _ocr_cache_dir(ocr_path, "onnx", quantize)
+    if not os.path.exists(int8_dir):
+        from optimum.onnxruntime import ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+        print("Quantizing the OCR model to int8 (one-time)...")
+        config = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+        for name in sorted(os.listdir(float_dir)):
+            if name.endswith(".onnx"):
+                ORTQuantizer.from_pretrained(float_dir, file_name=name).quantize(save_dir=int8_dir,
+                                                                                 quantization_config=config)
+        for name in os.listdir(float_dir):
+            if not name.endswith((".onnx", ".onnx_data")) and not os.path.exists(os.path.join(int8_dir, name)):
+                shutil.copy(os.path.join(float_dir, name), int8_dir)
+
+    # The quantizer saves each graph as <name>_quantized.onnx; point the loader at those.
+    files = {name.replace("_quantized", ""): name for name in os.listdir(int8_dir) if name.endswith(".onnx")}
+    kwargs = {"encoder_file_name": files["encoder_model.onnx"]}
+    if "decoder_model_merged.onnx" in files:
+        kwargs["decoder_file_name"] = files["decoder_model_merged.onnx"]
+    else:
+        kwargs["decoder_file_name"] = files["decoder_model.onnx"]
+        if "decoder_with_past_model.onnx" in files:
+            kwargs["decoder_with_past_file_name"] = files["decoder_with_past_model.onnx"]
+    return ORTModelForVision2Seq.from_pretrained(int8_dir, **kwargs)
+
+
+def _export_openvino_ocr(source: str, ocr_path: str, quantize: Optional[str]):
+    from optimum.intel import OVModelForVision2Seq
+
+    cache_dir = _ocr_cache_dir(ocr_path, "openvino", quantize)
+    if not os.path.exists(cache_dir):
+        print("Exporting the OCR model to OpenVINO (one-time)...")
+        OVModelForVision2Seq.from_pretrained(source, export=True, load_in_8bit=bool(quantize)).save_pretrained(cache_dir)
+    return OVModelForVision2Seq.from_pretrained(cache_dir)
+
+
+def load_ocr(ocr_path: str, backend: str = "torch", quantize: Optional[str] = None,
+             device: str = "cpu") -> Tuple[object, object, object]:
+    """(image processor, VisionEncoderDecoder-compatible model, tokenizer) for manga-ocr on the given backend."""
+    validate(backend, quantize)
+    source = ocr_path if os.path.exists(ocr_path) else DEFAULT_OCR_MODEL
+    if backend == "torch":
+        from manga_ocr import MangaOcr
+
+        manga_ocr = MangaOcr(source) if source == ocr_path else MangaOcr()
+        return manga_ocr.processor, manga_ocr.model, manga_ocr.tokenizer
+
+    from transformers import AutoTokenizer, ViTImageProcessor
+
+    processor = ViTImageProcessor.from_pretrained(source)
+    tokenizer = AutoTokenizer.from_pretrained(source)
+    if backend == "onnx":
+        model = _export_onnx_ocr(source, ocr_path, quantize)
+    else:
+        model = _export_openvino_ocr(source, ocr_path, quantize)
+    return processor, model, tokenizer
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+MANIFEST_FILE = ".onyx_manifest.json"
+# Bump when a change to detection, cleaning or typesetting alters what a page renders to, so
+# outputs written by older versions are redone instead of skipped.
+PIPELINE_VERSION = 1
+# MangaTranslator settings that change the rendered output; the rest only affect speed.
+OUTPUT_SETTINGS = ("yolo_model_path", "font_path", "translation_backend", "tm_path", "serve_unreviewed",
+                   "fuzzy_threshold", "fast_clean", "inference_backend", "quantize", "output_format",
+                   "jpeg_quality", "webp_quality", "png_compression", "tile_height", "tile_overlap",
+                   "detection_size", "calibration_dir")
+_PARTIAL_MARKER = ".partial"
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def config_version(translator_kwargs: Optional[Dict[str, Any]] = None) -> str:
+    """Short fingerprint of the pipeline version plus the settings in OUTPUT_SETTINGS."""
+    settings = {key: value for key, value in (translator_kwargs or {}).items() if key in OUTPUT_SETTINGS}
+    payload = json.dumps({"pipeline": PIPELINE_VERSION, **settings}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _partial_path(path: str) -> str:
+    directory, name = os.path.split(path)
+    root, ext = os.path.splitext(name)
+    return os.path.join(directory, f".{root}{_PARTIAL_MARKER}-{os.getpid()}-{threading.get_ident()}{ext}")
+
+
+def write_bytes_atomic(path: str, data: bytes):
+    """Write an encoded page to a temporary file next to path and rename it into place.
+
+    A crash mid-write leaves at most a hidden partial file, never a truncated page under the real name.
+    """
+    temp_path = _partial_path(path)
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class RunManifest:
+    """Per-output-folder record of what each page was rendered from.
+
+    Stores, per output file name, the input's hash, the config_version used and the output's hash.
+    A page whose input, config and output all still match is skipped on the next run; pages are
+    recorded as they finish, so an interrupted run resumes where it stopped.
+    """
+
+    def __init__(self, output_dir: str, version: str):
+        self.output_dir = output_dir
+        self.version = version
+        self.path = os.path.join(output_dir, MANIFEST_FILE)
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, str]] = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f).get("pages", {})
+            except (IOError, ValueError, AttributeError) as e:
+                print(f"⚠️ Ignoring unreadable manifest {self.path}: {e}")
+        self._remove_partial_files()
+
+    def _remove_partial_files(self):
+        if not os.path.isdir(self.output_dir):
+            return
+        for name in os.listdir(self.output_dir):
+            if name.startswith(".") and _PARTIAL_MARKER in name:
+                try:
+                    os.remove(os.path.join(self.output_dir, name))
+                except OSError:
+                    pass
+
+    def is_current(self, output_path: str, input_hash: str) -> bool:
+        entry = self.entries.get(os.path.basename(output_path))
+        if not entry or entry.get("config") != self.version or entry.get("input_hash") != input_hash:
+            return False
+        return os.path.isfile(output_path) and file_hash(output_path) == entry.get("output_hash")
+
+    def pending(self, pairs: List[Tuple[str, str]]) -> List[Tuple[str, str, str]]:
+        """(input_path, output_path, input_hash) for the pairs whose output is missing or out of date."""
+        pending = []
+        for input_path, output_path in pairs:
+            input_hash = file_hash(input_path)
+            if not self.is_current(output_path, input_hash):
+                pending.append((input_path, output_path, input_hash))
+        return pending
+
+    def record(self, output_path: str, input_hash: str):
+        """Note a freshly written output and save the manifest."""
+        output_hash = file_hash(output_path)
+        with self._lock:
+            self.entries[os.path.basename(output_path)] = {"input_hash": input_hash, "config": self.version,
+                                                           "output_hash": output_hash}
+            self._save()
+
+    def _save(self):
+        temp_path = f"{self.path}{_PARTIAL_MARKER}-{os.getpid()}"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"pages": self.entries}, f, indent=1, sort_keys=True)
+        os.replace(temp_path, self.path)
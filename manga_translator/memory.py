@@ -1,24 +1,128 @@
+import atexit
+import queue
 import sqlite3
 import os
 import threading
-from typing import Union, List, Tuple
+from collections import OrderedDict
+from typing import Union, List, Tuple, Dict, Iterable, Optional
+
+from .fuzzy import NGramIndex
+
+# Cache value for a source text the database is known not to contain.
+_ABSENT = None
+_NOT_CACHED = object()
+_STOP_WRITER = object()
 
 
 class TranslationMemory:
-    def __init__(self, db_path="translation_memory.db"):
+    """SQLite-backed translation memory with an in-process LRU tier in front of it.
+
+    The cache holds (translated_text, quality_score) per source text, including negative entries,
+    so repeated lines never reach SQLite. serve_unreviewed controls whether machine translations
+    that nobody has edited yet (quality_score 0) count as hits.
+
+    With write_behind, new translations are queued and written by a single background thread in
+    batched transactions; flush() waits for the queue to drain and close() flushes before returning.
+
+    With a fuzzy_threshold, lookup_fuzzy finds the closest stored line (e.g. the same line with a
+    stray OCR dot). Entries created from a fuzzy hit record the line they were copied from in
+    fuzzy_source until someone reviews them in the editor. The index behind it is built by a
+    background thread as soon as the TM is opened, so it is normally ready by the time the first
+    page has been detected and OCR'd; lookup_fuzzy waits for it otherwise.
+    """
+
+    def __init__(self, db_path="translation_memory.db", cache_size: int = 50000, serve_unreviewed: bool = False,
+                 write_behind: bool = False, write_batch_size: int = 500, fuzzy_threshold: Optional[float] = None):
         self.db_path = db_path
+        self.cache_size = cache_size
+        self.serve_unreviewed = serve_unreviewed
+        self.write_batch_size = write_batch_size
+        self.fuzzy_threshold = fuzzy_threshold
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._fuzzy_index = NGramIndex(threshold=fuzzy_threshold) if fuzzy_threshold is not None else None
+        self._fuzzy_lock = threading.Lock()
+        self._fuzzy_ready = threading.Event()
+        # Index changes made while the background build runs, replayed onto the finished index.
+        self._fuzzy_changes: Optional[List[Tuple[Optional[str], bool]]] = None
+        self._fuzzy_builder = None
         self._thread_local = threading.local()
+        self.search_index_enabled = False
         self._create_table()
+        self._revision_seen = self._revision()
+
+        self._write_queue = None
+        self._writer = None
+        # Rows queued for the writer but not yet committed, and a count of committed batches, so a
+        # lookup never caches a miss for a line that is only waiting to be written.
+        self._pending_writes: Dict[str, Tuple[str, int]] = {}
+        self._pending_lock = threading.Lock()
+        self._write_generation = 0
+        if write_behind:
+            self._write_queue = queue.Queue()
+            self._writer = threading.Thread(target=self._writer_loop, name="tm-writer", daemon=True)
+            self._writer.start()
+            atexit.register(self.close)
+
+        if self._fuzzy_index is not None:
+            self._start_fuzzy_build()
+        else:
+            self._fuzzy_ready.set()
 
     def _get_connection(self):
         if not hasattr(self._thread_local, 'conn'):
             try:
-                self._thread_local.conn = sqlite3.connect(self.db_path)
+                conn = sqlite3.connect(self.db_path, timeout=30)
+                # WAL lets readers in other threads/processes proceed while one writer commits, and
+                # synchronous=NORMAL only fsyncs at checkpoints, which is safe in WAL mode.
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute("PRAGMA cache_size=-16000")
+                conn.execute("PRAGMA temp_store=MEMORY")
+                self._thread_local.conn = conn
             except sqlite3.Error as e:
                 print(f"❌ Database connection error on thread {threading.get_ident()}: {e}")
                 raise
         return self._thread_local.conn
 
+    def _writer_loop(self):
+        while True:
+            batch = [self._write_queue.get()]
+            while len(batch) < self.write_batch_size:
+                try:
+                    batch.append(self._write_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            rows = [item for item in batch if item is not _STOP_WRITER]
+            if rows:
+                try:
+                    conn = self._get_connection()
+                    with conn:
+                        conn.executemany(
+                            "INSERT OR IGNORE INTO translations (source_text, translated_text, fuzzy_source) "
+                            "VALUES (?, ?, ?)",
+                            rows
+                        )
+                except sqlite3.Error as e:
+                    print(f"❌ Error writing queued translations: {e}")
+                with self._pending_lock:
+                    for source_text, _, _ in rows:
+                        self._pending_writes.pop(source_text, None)
+                    self._write_generation += 1
+            for _ in batch:
+                self._write_queue.task_done()
+
+            if len(rows) != len(batch):
+                if hasattr(self._thread_local, 'conn'):
+                    self._thread_local.conn.close()
+                return
+
+    def flush(self):
+        """Block until every queued write has been committed."""
+        if self._writer is not None:
+            self._write_queue.join()
+
     def _create_table(self):
         try:
             conn = self._get_connection()
@@ -29,43 +133,335 @@ class TranslationMemory:
                         source_text TEXT NOT NULL UNIQUE,
                         translated_text TEXT NOT NULL,
                         quality_score INTEGER DEFAULT 0,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        fuzzy_source TEXT
                     )
                 """)
+                columns = [row[1] for row in conn.execute("PRAGMA table_info(translations)")]
+                if "fuzzy_source" not in columns:
+                    conn.execute("ALTER TABLE translations ADD COLUMN fuzzy_source TEXT")
+                # Edits and deletions (e.g. from the DB editor in another process) bump a revision, so
+                # a long-running process can tell its cache went stale; see reload_if_changed.
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS tm_revision (id INTEGER PRIMARY KEY CHECK (id = 0), "
+                    "revision INTEGER NOT NULL)"
+                )
+                conn.execute("INSERT OR IGNORE INTO tm_revision (id, revision) VALUES (0, 0)")
+                for event in ("UPDATE", "DELETE"):
+                    conn.execute(f"""
+                        CREATE TRIGGER IF NOT EXISTS translations_revision_{event.lower()}
+                        AFTER {event} ON translations BEGIN
+                            UPDATE tm_revision SET revision = revision + 1;
+                        END
+                    """)
         except sqlite3.Error as e:
             print(f"❌ Error creating table: {e}")
+            return
+        self._create_search_index()
 
-    def lookup(self, source_text: str) -> Union[str, None]:
+    def _create_search_index(self):
+        # External-content FTS5 table with a trigram tokenizer (works for Japanese, which has no
+        # word boundaries), kept in sync with `translations` by triggers. Needs SQLite 3.34+.
         try:
             conn = self._get_connection()
             with conn:
+                exists = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'translations_fts'"
+                ).fetchone()
+                conn.execute("""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS translations_fts USING fts5(
+                        source_text, translated_text,
+                        content='translations', content_rowid='id', tokenize='trigram'
+                    )
+                """)
+                conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS translations_fts_insert AFTER INSERT ON translations BEGIN
+                        INSERT INTO translations_fts(rowid, source_text, translated_text)
+                        VALUES (new.id, new.source_text, new.translated_text);
+                    END
+                """)
+                conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS translations_fts_delete AFTER DELETE ON translations BEGIN
+                        INSERT INTO translations_fts(translations_fts, rowid, source_text, translated_text)
+                        VALUES ('delete', old.id, old.source_text, old.translated_text);
+                    END
+                """)
+                conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS translations_fts_update AFTER UPDATE ON translations BEGIN
+                        INSERT INTO translations_fts(translations_fts, rowid, source_text, translated_text)
+                        VALUES ('delete', old.id, old.source_text, old.translated_text);
+                        INSERT INTO translations_fts(rowid, source_text, translated_text)
+                        VALUES (new.id, new.source_text, new.translated_text);
+                    END
+                """)
+                if not exists:
+                    # Index rows written before the search index existed.
+                    conn.execute("INSERT INTO translations_fts(translations_fts) VALUES ('rebuild')")
+            self.search_index_enabled = True
+        except sqlite3.Error as e:
+            print(f"⚠️ Full-text search unavailable, falling back to LIKE search: {e}")
+
+    def _cache_get(self, source_text: str):
+        with self._cache_lock:
+            entry = self._cache.get(source_text, _NOT_CACHED)
+            if entry is not _NOT_CACHED:
+                self._cache.move_to_end(source_text)
+            return entry
+
+    def _cache_put(self, source_text: str, entry: Optional[Tuple[str, int]], replace: bool = True):
+        """Cache entry for source_text; with replace=False, only where no row is cached yet."""
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            if not replace and self._cache.get(source_text) is not _ABSENT:
+                return
+            self._cache[source_text] = entry
+            self._cache.move_to_end(source_text)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _serves(self, entry: Optional[Tuple[str, int]]) -> bool:
+        return entry is not _ABSENT and (entry[1] > 0 or self.serve_unreviewed)
+
+    def preload(self, limit: Optional[int] = None):
+        """Warm the cache from this database, reviewed entries first, then the most recent ones.
+
+        Keep one database per series and preloading brings in exactly that series' vocabulary.
+        """
+        limit = self.cache_size if limit is None else min(limit, self.cache_size)
+        try:
+            conn = self._get_connection()
+            cursor = conn.execute(
+                "SELECT source_text, translated_text, quality_score FROM translations "
+                "ORDER BY quality_score DESC, id DESC LIMIT ?",
+                (limit,)
+            )
+            rows = cursor.fetchall()
+        except sqlite3.Error as e:
+            print(f"❌ Error preloading translation cache: {e}")
+            return
+        # Insert lowest priority first so the most valuable entries end up most recently used.
+        for source_text, translated_text, quality_score in reversed(rows):
+            self._cache_put(source_text, (translated_text, quality_score))
+
+    def _queued(self, source_text: str) -> Optional[Tuple[str, int]]:
+        with self._pending_lock:
+            return self._pending_writes.get(source_text)
+
+    def _cache_miss(self, source_text: str, generation: int) -> Optional[Tuple[str, int]]:
+        """Entry for a line the database did not return in a read started at write generation `generation`.
+
+        A row queued since then is returned (and cached) instead of a miss. If a batch was committed
+        during the read, the miss is returned but not cached, since the row may just have landed.
+        """
+        with self._pending_lock:
+            queued = self._pending_writes.get(source_text)
+            if queued is not None:
+                self._cache_put(source_text, queued)
+                return queued
+            if generation == self._write_generation:
+                self._cache_put(source_text, _ABSENT)
+        return _ABSENT
+
+    def lookup(self, source_text: str) -> Union[str, None]:
+        entry = self._cache_get(source_text)
+        if entry is _NOT_CACHED:
+            # A queued row is checked first: once it leaves the queue it is committed, so the read sees it.
+            entry = self._queued(source_text)
+            if entry is None:
+                generation = self._write_generation
+                try:
+                    conn = self._get_connection()
+                    cursor = conn.execute(
+                        "SELECT translated_text, quality_score FROM translations WHERE source_text = ?",
+                        (source_text,)
+                    )
+                    row = cursor.fetchone()
+                except sqlite3.Error as e:
+                    print(f"❌ Error looking up translation: {e}")
+                    return None
+                if row:
+                    entry = tuple(row)
+                    self._cache_put(source_text, entry)
+                else:
+                    entry = self._cache_miss(source_text, generation)
+        return entry[0] if self._serves(entry) else None
+
+    def lookup_many(self, source_texts: Iterable[str]) -> Dict[str, str]:
+        found = {}
+        uncached = []
+        for source_text in source_texts:
+            entry = self._cache_get(source_text)
+            if entry is _NOT_CACHED:
+                entry = self._queued(source_text)
+                if entry is None:
+                    uncached.append(source_text)
+                    continue
+            if self._serves(entry):
+                found[source_text] = entry[0]
+        if not uncached:
+            return found
+
+        generation = self._write_generation
+        try:
+            conn = self._get_connection()
+            # Stay well under SQLite's host-parameter limit.
+            for start in range(0, len(uncached), 500):
+                chunk = uncached[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
                 cursor = conn.execute(
-                    "SELECT translated_text FROM translations WHERE source_text = ? AND quality_score > 0",
-                    (source_text,)
+                    f"SELECT source_text, translated_text, quality_score FROM translations "
+                    f"WHERE source_text IN ({placeholders})",
+                    chunk
                 )
-                result = cursor.fetchone()
-                return result[0] if result else None
+                rows = {source_text: (translated_text, quality_score)
+                        for source_text, translated_text, quality_score in cursor.fetchall()}
+                for source_text in chunk:
+                    entry = rows.get(source_text, _ABSENT)
+                    if entry is _ABSENT:
+                        entry = self._cache_miss(source_text, generation)
+                    else:
+                        self._cache_put(source_text, entry)
+                    if self._serves(entry):
+                        found[source_text] = entry[0]
         except sqlite3.Error as e:
-            print(f"❌ Error looking up translation: {e}")
-            return None
+            print(f"❌ Error looking up translations: {e}")
+        return found
+
+    def _start_fuzzy_build(self):
+        if self._fuzzy_builder is not None:
+            self._fuzzy_builder.join()
+        with self._fuzzy_lock:
+            self._fuzzy_ready.clear()
+            self._fuzzy_changes = []
+        self._fuzzy_builder = threading.Thread(target=self._build_fuzzy_index, name="tm-fuzzy-index", daemon=True)
+        self._fuzzy_builder.start()
 
-    def add_translation(self, source_text: str, translated_text: str):
+    def _build_fuzzy_index(self):
+        # Indexes the entries that did not themselves come from a fuzzy hit, outside _fuzzy_lock so
+        # adds and lookups of exact matches carry on meanwhile.
+        index = NGramIndex(threshold=self.fuzzy_threshold)
         try:
             conn = self._get_connection()
-            with conn:
-                conn.execute(
-                    "INSERT OR IGNORE INTO translations (source_text, translated_text) VALUES (?, ?)",
-                    (source_text, translated_text)
-                )
+            for (source_text,) in conn.execute("SELECT source_text FROM translations WHERE fuzzy_source IS NULL"):
+                index.add(source_text)
         except sqlite3.Error as e:
-            print(f"❌ Error adding translation: {e}")
+            print(f"❌ Error building fuzzy index: {e}")
+        finally:
+            if hasattr(self._thread_local, 'conn'):
+                self._thread_local.conn.close()
+                del self._thread_local.conn
+        with self._fuzzy_lock:
+            for source_text, indexed in self._fuzzy_changes:
+                self._apply_index_change(index, source_text, indexed)
+            self._fuzzy_index = index
+            self._fuzzy_changes = None
+        self._fuzzy_ready.set()
+
+    def lookup_fuzzy(self, source_text: str) -> Optional[Tuple[str, str, float]]:
+        """Closest servable entry to source_text as (translated_text, matched_source_text, similarity)."""
+        if self.fuzzy_threshold is None:
+            return None
+        self._fuzzy_ready.wait()
+        with self._fuzzy_lock:
+            match = self._fuzzy_index.best_match(source_text)
+        if match is None:
+            return None
+        matched_source, score = match
+        translated_text = self.lookup(matched_source)
+        return (translated_text, matched_source, score) if translated_text else None
+
+    @staticmethod
+    def _apply_index_change(index: NGramIndex, source_text: Optional[str], indexed: bool):
+        if source_text is None:
+            index.clear()
+        elif indexed:
+            index.add(source_text)
+        else:
+            index.remove(source_text)
+
+    def _index_changed(self, source_text: Optional[str], indexed: bool):
+        """Add source_text to the fuzzy index or remove it; None removes every entry."""
+        with self._fuzzy_lock:
+            if self._fuzzy_changes is not None:
+                self._fuzzy_changes.append((source_text, indexed))
+            elif self._fuzzy_index is not None:
+                self._apply_index_change(self._fuzzy_index, source_text, indexed)
+
+    def _cache_added(self, source_text: str, translated_text: str):
+        # INSERT OR IGNORE keeps an existing row, so a cached row stays; otherwise the new row is
+        # what the database holds (or will, once the writer gets to it).
+        self._cache_put(source_text, (translated_text, 0), replace=False)
+
+    def _queue_write(self, source_text: str, translated_text: str, fuzzy_source: Optional[str]):
+        with self._pending_lock:
+            # The first queued row for a line is the one INSERT OR IGNORE keeps.
+            self._pending_writes.setdefault(source_text, (translated_text, 0))
+        self._write_queue.put((source_text, translated_text, fuzzy_source))
 
-    def fetch_all_entries(self, search_term: str = "") -> List[Tuple[int, str, str]]:
+    def add_translation(self, source_text: str, translated_text: str, fuzzy_source: Optional[str] = None):
+        if self._writer is not None:
+            self._queue_write(source_text, translated_text, fuzzy_source)
+        else:
+            try:
+                conn = self._get_connection()
+                with conn:
+                    conn.execute(
+                        "INSERT OR IGNORE INTO translations (source_text, translated_text, fuzzy_source) "
+                        "VALUES (?, ?, ?)",
+                        (source_text, translated_text, fuzzy_source)
+                    )
+            except sqlite3.Error as e:
+                print(f"❌ Error adding translation: {e}")
+                return
+        self._cache_added(source_text, translated_text)
+        if fuzzy_source is None:
+            self._index_changed(source_text, indexed=True)
+
+    def add_translations(self, pairs: List[Tuple[str, str]]):
+        if self._writer is not None:
+            for source_text, translated_text in pairs:
+                self._queue_write(source_text, translated_text, None)
+        else:
+            try:
+                conn = self._get_connection()
+                with conn:
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO translations (source_text, translated_text) VALUES (?, ?)",
+                        pairs
+                    )
+            except sqlite3.Error as e:
+                print(f"❌ Error adding translations: {e}")
+                return
+        for source_text, translated_text in pairs:
+            self._cache_added(source_text, translated_text)
+            self._index_changed(source_text, indexed=True)
+
+    def fetch_entries(self, search_term: str = "", offset: int = 0, limit: int = 200) -> List[Tuple[int, str, str, str]]:
+        """One page of (id, source, translation, fuzzy_source) rows, newest first, optionally filtered
+        by a substring of either text column. fuzzy_source is '' for entries not created by a fuzzy hit.
+
+        A limit of -1 returns every remaining row.
+        """
+        self.flush()
         try:
             conn = self._get_connection()
             cursor = conn.cursor()
 
-            query = "SELECT id, source_text, translated_text FROM translations"
+            # The trigram index can only answer terms of three or more characters; shorter ones
+            # scan, but LIMIT lets SQLite stop as soon as a page is filled.
+            if search_term and self.search_index_enabled and len(search_term) >= 3:
+                phrase = '"' + search_term.replace('"', '""') + '"'
+                cursor.execute(
+                    "SELECT t.id, t.source_text, t.translated_text, COALESCE(t.fuzzy_source, '') "
+                    "FROM translations_fts f "
+                    "JOIN translations t ON t.id = f.rowid WHERE translations_fts MATCH ? "
+                    "ORDER BY t.id DESC LIMIT ? OFFSET ?",
+                    (phrase, limit, offset)
+                )
+                return cursor.fetchall()
+
+            query = "SELECT id, source_text, translated_text, COALESCE(fuzzy_source, '') FROM translations"
             params_list = []
 
             if search_term:
@@ -73,35 +469,78 @@ class TranslationMemory:
                 search_pattern = f"%{search_term}%"
                 params_list.extend([search_pattern, search_pattern])
 
-            query += " ORDER BY id DESC"
+            query += " ORDER BY id DESC LIMIT ? OFFSET ?"
+            params_list.extend([limit, offset])
             cursor.execute(query, tuple(params_list))
             return cursor.fetchall()
         except sqlite3.Error as e:
-            print(f"❌ Error fetching all entries: {e}")
+            print(f"❌ Error fetching entries: {e}")
             return []
 
+    def fetch_all_entries(self, search_term: str = "") -> List[Tuple[int, str, str, str]]:
+        return self.fetch_entries(search_term, offset=0, limit=-1)
+
     def update_translation(self, source_text: str, new_translated_text: str):
+        self.flush()
         try:
             conn = self._get_connection()
             with conn:
                 conn.execute(
-                    "UPDATE translations SET translated_text = ?, quality_score = 10 WHERE source_text = ?",
+                    "UPDATE translations SET translated_text = ?, quality_score = 10, fuzzy_source = NULL "
+                    "WHERE source_text = ?",
                     (new_translated_text, source_text)
                 )
+            self._invalidate(source_text)
+            # Once reviewed, a fuzzy-created entry is as good as any other to match against.
+            self._index_changed(source_text, indexed=True)
             print(f"✅ Updated translation for: {source_text[:30]}...")
         except sqlite3.Error as e:
             print(f"❌ Error updating translation: {e}")
 
     def delete_entry(self, source_text: str):
+        self.flush()
         try:
             conn = self._get_connection()
             with conn:
                 conn.execute("DELETE FROM translations WHERE source_text = ?", (source_text,))
+            self._invalidate(source_text)
+            self._index_changed(source_text, indexed=False)
             print(f"✅ Deleted translation for: {source_text[:30]}...")
         except sqlite3.Error as e:
             print(f"❌ Error deleting entry: {e}")
 
+    def _revision(self) -> Optional[int]:
+        try:
+            row = self._get_connection().execute("SELECT revision FROM tm_revision WHERE id = 0").fetchone()
+        except sqlite3.Error as e:
+            print(f"❌ Error reading translation memory revision: {e}")
+            return None
+        return row[0] if row else None
+
+    def reload_if_changed(self) -> bool:
+        """Drop the cache and rebuild the fuzzy index if entries were edited or deleted since the last check.
+
+        Long-running processes (the service) call this before each job so edits made in the DB
+        editor take effect without a restart. Returns whether anything was reloaded.
+        """
+        revision = self._revision()
+        if revision is None or revision == self._revision_seen:
+            return False
+        self._revision_seen = revision
+        self._invalidate()
+        if self.fuzzy_threshold is not None:
+            self._start_fuzzy_build()
+        return True
+
+    def _invalidate(self, source_text: Optional[str] = None):
+        with self._cache_lock:
+            if source_text is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(source_text, None)
+
     def count_entries(self) -> int:
+        self.flush()
         try:
             conn = self._get_connection()
             with conn:
@@ -111,11 +550,20 @@ class TranslationMemory:
             return 0
 
     def close(self):
+        if self._fuzzy_builder is not None:
+            self._fuzzy_builder.join()
+            self._fuzzy_builder = None
+        if self._writer is not None:
+            self._write_queue.put(_STOP_WRITER)
+            self._writer.join()
+            self._writer = None
+            atexit.unregister(self.close)
         if hasattr(self._thread_local, 'conn'):
             self._thread_local.conn.close()
             del self._thread_local.conn
 
     def flush_all(self):
+        self.flush()
         try:
             conn = self._get_connection()
             with conn:
@@ -125,6 +573,8 @@ class TranslationMemory:
                 except sqlite3.Error as e:
                     if "no such table" not in str(e):
                         print(f"⚠️ Could not reset table sequence: {e}")
+            self._invalidate()
+            self._index_changed(None, indexed=False)
             print("✅ Database flushed successfully and committed.")
         except sqlite3.Error as e:
             print(f"❌ Error during database flush transaction: {e}")
\ No newline at end of file
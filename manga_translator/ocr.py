@@ -0,0 +1,51 @@
+import cv2
+import numpy as np
+from typing import List
+
+from PIL import Image
+
+
+class BatchedMangaOcr:
+    """Runs manga-ocr's VisionEncoderDecoder over many bubble crops per generate() call.
+
+    model can be the PyTorch model or an ONNX Runtime / OpenVINO export of it (see inference.py);
+    all of them take pixel_values and implement generate(). Results are returned in the order the
+    crops were given.
+    """
+
+    def __init__(self, processor, model, tokenizer, batch_size: int = 16, max_length: int = 300):
+        from manga_ocr.ocr import post_process
+
+        self._post_process = post_process
+        self.processor = processor
+        self.model = model
+        self.tokenizer = tokenizer
+        self.batch_size = max(1, batch_size)
+        self.max_length = max_length
+
+    @staticmethod
+    def _prepare(crop: np.ndarray) -> Image.Image:
+        # Converted through PIL exactly as MangaOcr does; OpenCV's BGR2GRAY rounds differently and
+        # puts some pixels one level off.
+        return Image.fromarray(cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)).convert("L").convert("RGB")
+
+    def __call__(self, crops: List[np.ndarray]) -> List[str]:
+        import torch
+
+        texts = [""] * len(crops)
+        valid = [i for i, crop in enumerate(crops) if crop.size > 0]
+
+        # Every crop is resized to the same encoder input, but the decoder runs until the longest
+        # line in the batch finishes; grouping crops of similar size keeps those lengths close.
+        valid.sort(key=lambda i: crops[i].shape[0] * crops[i].shape[1])
+
+        for start in range(0, len(valid), self.batch_size):
+            indices = valid[start:start + self.batch_size]
+            images = [self._prepare(crops[i]) for i in indices]
+            pixel_values = self.processor(images, return_tensors="pt").pixel_values
+            with torch.inference_mode():
+                output_ids = self.model.generate(pixel_values.to(self.model.device), max_length=self.max_length)
+            decoded = self.tokenizer.batch_decode(output_ids.cpu(), skip_special_tokens=True)
+            for i, text in zip(indices, decoded):
+                texts[i] = self._post_process(text)
+        return texts
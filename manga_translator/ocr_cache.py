@@ -0,0 +1,223 @@
+import atexit
+import hashlib
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# 16x16 difference hash (256 bits), used to shortlist near-identical crops within a size bucket.
+HASH_SIZE = 16
+MAX_HASH_DISTANCE = 48
+# Shortlisted crops are confirmed on a grayscale thumbnail whose grid scales with the bucket's
+# size: one cell per pixel up to THUMBNAIL_MAX_SIDE pixels on the longer side, area-averaged
+# beyond that. Re-encoding the same crop as JPEG moves no cell by more than ~30 levels, while a
+# single different glyph, even "." against ",", moves some by far more, so a perceptual match
+# alone is never trusted to carry OCR text over.
+THUMBNAIL_MAX_SIDE = 128
+MAX_THUMBNAIL_DIFF = 40
+# Crops are bucketed by size on a log scale, one bucket per ~25% change in width or height.
+SIZE_BUCKET_RATIO = 1.25
+# Bumped whenever signatures change, so entries made with an older scheme are never matched.
+SIGNATURE_VERSION = 2
+
+
+class CropSignature(NamedTuple):
+    bucket: str
+    dhash: bytes
+    thumbnail: bytes
+
+    @property
+    def key(self) -> str:
+        return hashlib.sha1(self.bucket.encode("ascii") + self.thumbnail).hexdigest()
+
+
+def _thumbnail_size(width_step: int, height_step: int) -> Tuple[int, int]:
+    # Every crop of a bucket is scaled to the same grid, sized from the bucket's nominal dimensions.
+    width, height = SIZE_BUCKET_RATIO ** width_step, SIZE_BUCKET_RATIO ** height_step
+    scale = min(1.0, THUMBNAIL_MAX_SIDE / max(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def crop_signature(crop: np.ndarray) -> CropSignature:
+    """Size bucket, difference hash and verification thumbnail of a non-empty BGR bubble crop."""
+    height, width = crop.shape[:2]
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    small = cv2.resize(gray, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA)
+    dhash = np.packbits(small[:, 1:] > small[:, :-1]).tobytes()
+    width_step = int(math.log(max(1, width), SIZE_BUCKET_RATIO))
+    height_step = int(math.log(max(1, height), SIZE_BUCKET_RATIO))
+    thumbnail = cv2.resize(gray, _thumbnail_size(width_step, height_step), interpolation=cv2.INTER_AREA).tobytes()
+    return CropSignature(f"{width_step}x{height_step}", dhash, thumbnail)
+
+
+class _Bucket:
+    """Entries of one size bucket, with their hashes and thumbnails stacked for vectorized matching."""
+
+    def __init__(self):
+        self.keys: List[str] = []
+        self._hashes = None
+        self._thumbnails = None
+
+    def add(self, key: str):
+        self.keys.append(key)
+        self._hashes = self._thumbnails = None
+
+    def remove(self, key: str):
+        self.keys.remove(key)
+        self._hashes = self._thumbnails = None
+
+    def match(self, signature: CropSignature, entries: Dict[str, tuple]) -> Optional[str]:
+        if self._hashes is None:
+            self._hashes = np.frombuffer(b"".join(entries[key][0].dhash for key in self.keys),
+                                         dtype=np.uint8).reshape(len(self.keys), -1)
+            self._thumbnails = np.frombuffer(b"".join(entries[key][0].thumbnail for key in self.keys),
+                                             dtype=np.uint8).reshape(len(self.keys), -1)
+        query_hash = np.frombuffer(signature.dhash, dtype=np.uint8)
+        distances = np.unpackbits(self._hashes ^ query_hash, axis=1).sum(axis=1)
+        shortlist = np.flatnonzero(distances <= MAX_HASH_DISTANCE)
+        if not len(shortlist):
+            return None
+        query = np.frombuffer(signature.thumbnail, dtype=np.uint8).astype(np.int16)
+        diffs = np.abs(self._thumbnails[shortlist].astype(np.int16) - query).max(axis=1)
+        best = int(np.argmin(diffs))
+        return self.keys[shortlist[best]] if diffs[best] <= MAX_THUMBNAIL_DIFF else None
+
+
+class OcrCache:
+    """Persistent map from bubble crops to their OCR text, so repeated SFX, title cards and panels are read once.
+
+    A crop matches a cached one in the same size bucket whose difference hash is close and whose
+    grayscale thumbnail agrees cell for cell within MAX_THUMBNAIL_DIFF. Entries live in an in-process LRU of
+    at most max_entries and are written to SQLite in batches by flush(), which also trims the
+    database to the max_entries most recently used crops. Rows are tagged with the OCR model
+    version, so a different model never reuses old text.
+    """
+
+    def __init__(self, db_path: str = "ocr_cache.db", model_version: str = "", max_entries: int = 20000,
+                 flush_every: int = 256):
+        self.db_path = db_path
+        # Rows written under an older signature scheme are treated like another model's and never loaded.
+        self.model_version = f"{model_version}|signature-{SIGNATURE_VERSION}"
+        self.max_entries = max_entries
+        self.flush_every = flush_every
+        # key -> (signature, text), least recently used first.
+        self._entries = OrderedDict()
+        self._buckets: Dict[str, _Bucket] = {}
+        self._dirty: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._conn = None
+        self.hits = 0
+        self.misses = 0
+        self._load()
+        atexit.register(self.close)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            with self._conn:
+                self._conn.execute("""
+                    CREATE TABLE IF NOT EXISTS crops (
+                        key TEXT PRIMARY KEY,
+                        model_version TEXT NOT NULL,
+                        bucket TEXT NOT NULL,
+                        dhash BLOB NOT NULL,
+                        thumbnail BLOB NOT NULL,
+                        text TEXT NOT NULL,
+                        last_used INTEGER NOT NULL
+                    )
+                """)
+                self._conn.execute("CREATE INDEX IF NOT EXISTS idx_crops_last_used ON crops (last_used)")
+        return self._conn
+
+    def _load(self):
+        try:
+            with self._lock:
+                rows = self._connect().execute(
+                    "SELECT key, bucket, dhash, thumbnail, text FROM crops WHERE model_version = ? "
+                    "ORDER BY last_used DESC LIMIT ?",
+                    (self.model_version, self.max_entries)
+                ).fetchall()
+        except sqlite3.Error as e:
+            print(f"❌ Error loading OCR cache: {e}")
+            return
+        # Rows come newest first; insert oldest first so the LRU order matches.
+        for key, bucket, dhash, thumbnail, text in reversed(rows):
+            self._insert(key, CropSignature(bucket, bytes(dhash), bytes(thumbnail)), text)
+
+    def _insert(self, key: str, signature: CropSignature, text: str):
+        if key not in self._entries:
+            bucket = self._buckets.get(signature.bucket)
+            if bucket is None:
+                bucket = self._buckets[signature.bucket] = _Bucket()
+            bucket.add(key)
+        self._entries[key] = (signature, text)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            old_key, (old_signature, _) = self._entries.popitem(last=False)
+            self._buckets[old_signature.bucket].remove(old_key)
+            self._dirty.pop(old_key, None)
+
+    def get_many(self, signatures: List[CropSignature]) -> List[Optional[str]]:
+        now = int(time.time())
+        results = []
+        with self._lock:
+            for signature in signatures:
+                bucket = self._buckets.get(signature.bucket)
+                key = bucket.match(signature, self._entries) if bucket and bucket.keys else None
+                if key is None:
+                    self.misses += 1
+                    results.append(None)
+                    continue
+                self._entries.move_to_end(key)
+                self._dirty[key] = now
+                self.hits += 1
+                results.append(self._entries[key][1])
+        return results
+
+    def put_many(self, signatures: List[CropSignature], texts: List[str]):
+        now = int(time.time())
+        with self._lock:
+            for signature, text in zip(signatures, texts):
+                key = signature.key
+                self._insert(key, signature, text)
+                self._dirty[key] = now
+            should_flush = len(self._dirty) >= self.flush_every
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        """Write new entries and last-used times to disk, then evict the least recently used rows past max_entries."""
+        with self._lock:
+            rows = []
+            for key, last_used in self._dirty.items():
+                signature, text = self._entries[key]
+                rows.append((key, self.model_version, signature.bucket, signature.dhash, signature.thumbnail, text,
+                             last_used))
+            self._dirty.clear()
+            if not rows:
+                return
+            try:
+                conn = self._connect()
+                with conn:
+                    conn.executemany("INSERT OR REPLACE INTO crops (key, model_version, bucket, dhash, thumbnail, "
+                                     "text, last_used) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                    conn.execute("DELETE FROM crops WHERE key IN "
+                                 "(SELECT key FROM crops ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                                 (self.max_entries,))
+            except sqlite3.Error as e:
+                print(f"❌ Error writing OCR cache: {e}")
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        atexit.unregister(self.close)
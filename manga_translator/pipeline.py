@@ -0,0 +1,398 @@
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .translation import unique_texts
+
+# Threads per stage. Detection and OCR each drive one model, so a single worker keeps them busy
+# without contending for the same weights; the I/O-bound stages get a few threads each.
+DEFAULT_STAGE_WORKERS = {"decode": 2, "detect": 1, "ocr": 1, "translate": 4, "render": 2, "encode": 2}
+# How PagePipeline treats the translator's artifact cache: "use" it when a page is there, "refresh"
+# it by detecting and OCR'ing every page again, or "require" it, failing pages that are not cached.
+ARTIFACT_MODES = ("use", "refresh", "require")
+
+_STOP = object()
+
+
+class _Item:
+    __slots__ = ("index", "payload", "error")
+
+    def __init__(self, index: int, payload: Any, error: Optional[str] = None):
+        self.index = index
+        self.payload = payload
+        self.error = error
+
+
+class Stage:
+    """One step of a Pipeline, run by `workers` threads.
+
+    fn takes a payload and returns the payload for the next stage. With batch_size set, fn instead
+    takes and returns a list: whatever is already waiting in the queue is gathered, up to
+    batch_size items, so a batch never waits for items that have not arrived yet.
+    """
+
+    def __init__(self, name: str, fn: Callable, workers: int = 1, batch_size: Optional[int] = None):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+
+
+class Pipeline:
+    """Runs payloads through a chain of stages connected by bounded queues.
+
+    Every stage works on a different payload at the same time, and a full queue blocks the stage
+    feeding it, so memory stays bounded by queue_size per stage while throughput is set by the
+    slowest stage instead of the sum of all of them. Results come out in input order. A payload
+    whose stage raised skips the remaining stages and comes out with the error message.
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int = 4):
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+
+    def run(self, payloads: Iterable[Any]) -> Iterator[Tuple[Any, Optional[str]]]:
+        """Yield (payload, error) per input payload, in order. Closing the iterator early stops the pipeline."""
+        stop = threading.Event()
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        output = queue.Queue()
+        queues.append(output)
+
+        def put(target: queue.Queue, item):
+            while not stop.is_set():
+                try:
+                    target.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+
+        def feed():
+            try:
+                for index, payload in enumerate(payloads):
+                    if stop.is_set():
+                        return
+                    put(queues[0], _Item(index, payload))
+            except Exception as e:
+                # A failing input iterator ends the run; what was already fed still comes out.
+                print(f"❌ Pipeline input failed: {e}")
+            for _ in range(self.stages[0].workers):
+                put(queues[0], _STOP)
+
+        threads = [threading.Thread(target=feed, name="pipeline-feed", daemon=True)]
+        for i, stage in enumerate(self.stages):
+            next_workers = self.stages[i + 1].workers if i + 1 < len(self.stages) else 1
+            finished = [0]
+            finished_lock = threading.Lock()
+            for n in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._work, name=f"pipeline-{stage.name}-{n}", daemon=True,
+                    args=(stage, queues[i], queues[i + 1], next_workers, finished, finished_lock, put, stop)))
+        for thread in threads:
+            thread.start()
+
+        pending: Dict[int, _Item] = {}
+        next_index = 0
+        try:
+            while True:
+                item = output.get()
+                if item is _STOP:
+                    break
+                pending[item.index] = item
+                while next_index in pending:
+                    ready = pending.pop(next_index)
+                    next_index += 1
+                    yield ready.payload, ready.error
+        finally:
+            stop.set()
+
+    @staticmethod
+    def _work(stage: Stage, source: queue.Queue, target: queue.Queue, next_workers: int,
+              finished: List[int], finished_lock: threading.Lock, put, stop: threading.Event):
+        stopping = False
+        while not stopping:
+            try:
+                item = source.get(timeout=0.1)
+            except queue.Empty:
+                if stop.is_set():
+                    return
+                continue
+            if item is _STOP:
+                break
+
+            batch = [item]
+            while stage.batch_size and len(batch) < stage.batch_size:
+                try:
+                    extra = source.get_nowait()
+                except queue.Empty:
+                    break
+                # Each worker takes exactly one sentinel; finish this batch and then stop.
+                if extra is _STOP:
+                    stopping = True
+                    break
+                batch.append(extra)
+
+            for done in Pipeline._apply(stage, batch):
+                put(target, done)
+
+        # The last worker of a stage to stop tells every worker of the next stage to stop.
+        with finished_lock:
+            finished[0] += 1
+            last = finished[0] == stage.workers
+        if last:
+            for _ in range(next_workers):
+                put(target, _STOP)
+
+    @staticmethod
+    def _apply(stage: Stage, batch: List[_Item]) -> List[_Item]:
+        live = [item for item in batch if item.error is None]
+        if stage.batch_size and len(live) > 1:
+            try:
+                for item, payload in zip(live, stage.fn([item.payload for item in live])):
+                    item.payload = payload
+                return batch
+            except Exception:
+                # The batched call failed somewhere; redo item by item to pin the error on the right payload.
+                pass
+
+        for item in live:
+            try:
+                item.payload = stage.fn([item.payload])[0] if stage.batch_size else stage.fn(item.payload)
+            except Exception as e:
+                item.error = f"{stage.name}: {type(e).__name__}: {e}"
+        return batch
+
+
+class _PixelBudget:
+    """Caps the decoded pixels held by pages in flight. A page bigger than the whole budget runs on its own."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self.closed = False
+        self._condition = threading.Condition()
+
+    def acquire(self, amount: int):
+        with self._condition:
+            while self.used and self.used + amount > self.limit and not self.closed:
+                self._condition.wait()
+            self.used += amount
+
+    def release(self, amount: int):
+        with self._condition:
+            self.used -= amount
+            self._condition.notify_all()
+
+    def close(self):
+        # Unblocks decode workers of a run that was abandoned part-way.
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+
+class _Claim:
+    """A line one page is translating; other pages that need it wait here instead of requesting it again."""
+
+    __slots__ = ("done", "translation")
+
+    def __init__(self):
+        self.done = threading.Event()
+        # Stays None if the request failed.
+        self.translation: Optional[str] = None
+
+
+class PageJob:
+    """A page travelling through the PagePipeline; each stage fills in the next fields."""
+
+    __slots__ = ("input_path", "output_path", "image", "reserved", "page_hash", "recognized", "bubbles", "masks",
+                 "texts", "translated", "encoded")
+
+    def __init__(self, input_path: str, output_path: str):
+        self.input_path = input_path
+        self.output_path = output_path
+        self.image: Optional[np.ndarray] = None
+        # Pixels of this page counted against the PagePipeline's budget until it is written.
+        self.reserved = 0
+        self.page_hash = ""
+        # Set when detection and OCR results came from the artifact cache.
+        self.recognized = False
+        self.bubbles: List[List[int]] = []
+        self.masks: List[Optional[np.ndarray]] = []
+        self.texts: List[str] = []
+        self.translated: Dict[str, str] = {}
+        # The rendered page, encoded, when the PagePipeline hands pages back instead of writing them.
+        self.encoded: Optional[bytes] = None
+
+
+class PagePipeline:
+    """MangaTranslator's stages (decode, detect, OCR, translate, render, encode) as a streaming Pipeline.
+
+    While one page waits on the translation API, the next ones are being detected and OCR'd and
+    earlier ones rendered and written. Lines already in flight for another page are waited on
+    rather than requested again, and finished lines are kept for the rest of the run, so repeats
+    across a chapter are translated once whether or not the TM serves unreviewed lines. Pages
+    found in the translator's artifact cache pass straight through detection and OCR, unless
+    artifacts is "refresh"; with "require", pages missing from it fail instead of being detected.
+
+    Decoded pages count against max_megapixels until they are written, so a chapter of long
+    webtoon strips never has more than that (plus one page per decode worker) held in memory,
+    however many pages the queues could otherwise take.
+
+    Pages are normally files. With read_bytes, input paths are instead names passed to it (e.g.
+    archive entries) to get the page's encoded bytes; with keep_encoded, the encode stage leaves
+    the encoded page in PageJob.encoded rather than writing it.
+
+    The encode stage is the background writer: its workers encode and write finished pages while
+    later ones are still being rendered, and the queue in front of it holds back rendering when
+    the disk falls behind. It uses the translator's PageEncoder, so the format follows
+    output_path's extension (see PageEncoder.output_name) and its WriteStats count every page.
+    A page is only yielded once it is on disk.
+    """
+
+    def __init__(self, translator, stage_workers: Optional[Dict[str, int]] = None, queue_size: int = 4,
+                 max_megapixels: float = 150.0, read_bytes: Optional[Callable[[str], bytes]] = None,
+                 keep_encoded: bool = False, artifacts: str = "use"):
+        if artifacts not in ARTIFACT_MODES:
+            raise ValueError(f"Unknown artifact mode: {artifacts}")
+        self.translator = translator
+        self.artifacts = artifacts
+        self.read_bytes = read_bytes
+        self.keep_encoded = keep_encoded
+        self.max_pixels = int(max_megapixels * 1_000_000)
+        self._budget: Optional[_PixelBudget] = None
+        workers = {**DEFAULT_STAGE_WORKERS, **(stage_workers or {})}
+        batch_size = translator.detection_batch_size
+        self._in_flight: Dict[str, _Claim] = {}
+        # Lines translated so far in the current run.
+        self._finished: Dict[str, str] = {}
+        self._in_flight_lock = threading.Lock()
+        self.pipeline = Pipeline([
+            Stage("decode", self._decode, workers["decode"]),
+            Stage("detect", self._detect, workers["detect"], batch_size=batch_size),
+            Stage("ocr", self._ocr, workers["ocr"], batch_size=batch_size),
+            Stage("translate", self._translate, workers["translate"]),
+            Stage("render", self._render, workers["render"]),
+            Stage("encode", self._encode, workers["encode"]),
+        ], queue_size=queue_size)
+
+    def run(self, pages: Iterable[Tuple[str, str]]) -> Iterator[Tuple[str, Optional[str]]]:
+        """Yield (input_path, error) per (input_path, output_path) pair, in order; error is None on success."""
+        results = self.run_jobs(pages)
+        try:
+            for job, error in results:
+                yield job.input_path, error
+        finally:
+            results.close()
+
+    def run_jobs(self, pages: Iterable[Tuple[str, str]]) -> Iterator[Tuple[PageJob, Optional[str]]]:
+        """Like run(), but yields the finished PageJob, with its bubbles, texts and translations, instead of its path.
+
+        The decoded image is released before the job is yielded.
+        """
+        jobs = (PageJob(input_path, output_path) for input_path, output_path in pages)
+        self._budget = _PixelBudget(self.max_pixels)
+        self._finished = {}
+        try:
+            for job, error in self.pipeline.run(jobs):
+                self._release(job)
+                if error:
+                    print(f"❌ {job.input_path}: {error}")
+                yield job, error
+        finally:
+            self._budget.close()
+
+    def _release(self, job: PageJob):
+        job.image = None
+        if job.reserved:
+            self._budget.release(job.reserved)
+            job.reserved = 0
+
+    def _decode(self, job: PageJob) -> PageJob:
+        if self.read_bytes is not None:
+            job.image, job.page_hash = self.translator.decode_page(self.read_bytes(job.input_path))
+        else:
+            job.image, job.page_hash = self.translator.read_page(job.input_path)
+        if job.image is None:
+            raise IOError(f"Could not read image: {job.input_path}")
+        job.reserved = job.image.shape[0] * job.image.shape[1]
+        self._budget.acquire(job.reserved)
+        if self.artifacts == "refresh":
+            return job
+        cached = self.translator.cached_recognition(job.page_hash)
+        if cached is not None:
+            job.bubbles, job.masks, job.texts = cached
+            job.recognized = True
+        elif self.artifacts == "require":
+            raise LookupError("No cached detection and OCR results for this page")
+        return job
+
+    def _detect(self, jobs: List[PageJob]) -> List[PageJob]:
+        todo = [job for job in jobs if not job.recognized]
+        if todo:
+            detections = self.translator.detect_bubbles_batch([job.image for job in todo], batch_size=len(todo))
+            for job, (bubbles, masks) in zip(todo, detections):
+                job.bubbles, job.masks = bubbles, masks
+        return jobs
+
+    def _ocr(self, jobs: List[PageJob]) -> List[PageJob]:
+        todo = [job for job in jobs if not job.recognized]
+        # OCR every bubble of the batch together, then hand each page its slice back.
+        crops = []
+        for job in todo:
+            crops.extend(self.translator._crop_bubbles(job.image, job.bubbles))
+        texts = self.translator.ocr_crops(crops)
+        offset = 0
+        for job in todo:
+            job.texts = texts[offset:offset + len(job.bubbles)]
+            offset += len(job.bubbles)
+            self.translator.store_recognition(job.page_hash, job.bubbles, job.masks, job.texts)
+        return jobs
+
+    def _translate(self, job: PageJob) -> PageJob:
+        # The lock only guards claiming lines; TM lookups and API calls run outside it.
+        translated: Dict[str, str] = {}
+        shared: Dict[str, _Claim] = {}
+        claimed: Dict[str, _Claim] = {}
+        with self._in_flight_lock:
+            for text in unique_texts(job.texts):
+                if text in self._finished:
+                    translated[text] = self._finished[text]
+                elif text in self._in_flight:
+                    shared[text] = self._in_flight[text]
+                else:
+                    claimed[text] = self._in_flight[text] = _Claim()
+
+        new: Dict[str, str] = {}
+        try:
+            if claimed:
+                new = self.translator.translate_texts(list(claimed))
+        finally:
+            with self._in_flight_lock:
+                for text, claim in claimed.items():
+                    del self._in_flight[text]
+                    if text in new:
+                        claim.translation = self._finished[text] = new[text]
+            for claim in claimed.values():
+                claim.done.set()
+        translated.update(new)
+
+        for text, claim in shared.items():
+            claim.done.wait()
+            # A failed line was reported by the page that requested it.
+            if claim.translation is not None:
+                translated[text] = claim.translation
+        job.translated = translated
+        return job
+
+    def _render(self, job: PageJob) -> PageJob:
+        self.translator.render_page(job.image, job.bubbles, job.texts, job.translated, job.masks)
+        return job
+
+    def _encode(self, job: PageJob) -> PageJob:
+        if self.keep_encoded:
+            job.encoded = self.translator.encoder.encode(job.image, job.output_path)
+        else:
+            self.translator.encoder.write(job.output_path, job.image)
+        self._release(job)
+        return job
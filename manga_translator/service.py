@@ -0,0 +1,337 @@
+import base64
+import hmac
+import json
+import os
+import secrets
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+import numpy as np
+
+from .batch import IMAGE_EXTENSIONS
+from .pipeline import ARTIFACT_MODES, PagePipeline
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_URL = f"http://{DEFAULT_HOST}:{DEFAULT_PORT}"
+OUTPUT_FORMATS = ("png", "jpg", "webp")
+OUTPUT_EXTENSIONS = tuple(f".{fmt}" for fmt in OUTPUT_FORMATS) + (".jpeg",)
+TOKEN_HEADER = "X-Onyx-Token"
+# Each launch of the service writes a fresh token here, one file per port, readable only by the
+# user who started it; clients on the same account read it from there.
+TOKEN_DIR = os.path.join(os.path.expanduser("~"), ".onyx")
+
+
+class ServiceError(Exception):
+    pass
+
+
+def token_path(port: int) -> str:
+    return os.path.join(TOKEN_DIR, f"service-{port}.token")
+
+
+def write_token(port: int, token: str):
+    os.makedirs(TOKEN_DIR, mode=0o700, exist_ok=True)
+    path = token_path(port)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(token)
+
+
+def read_token(port: int) -> Optional[str]:
+    try:
+        with open(token_path(port), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def bubble_records(bubbles: List[List[int]], texts: List[str], translated: Dict[str, str]) -> List[Dict[str, Any]]:
+    """JSON-ready description of a page's bubbles. translated_text is None where the translation request failed."""
+    return [{"bbox": [int(v) for v in bbox], "original_text": text,
+             "translated_text": translated.get(text) if text.strip() else ""}
+            for bbox, text in zip(bubbles, texts)]
+
+
+class TranslationService:
+    """One MangaTranslator (models, TM, OCR cache, translation client) kept loaded and shared over local HTTP.
+
+    GET /health
+        {"ready", "config_version", "output_format", "jobs", "tm_entries"}; clients name output files
+        for output_format with encoder.output_filename.
+    POST /page
+        JSON {"input_path", "output_path"?, "format"?} or {"image", "format"?} with the page
+        base64-encoded. Answers {"bubbles", "output_path"} when the page was written to
+        output_path, else {"bubbles", "format", "image"} with the translated page base64-encoded.
+    POST /chapter
+        JSON {"pages": [[input_path, output_path], ...]}. Pages stream through a PagePipeline and
+        one JSON line {"input_path", "output_path", "error", "bubbles"} is sent per page, in order,
+        as soon as it is written.
+
+    Every request must carry the launch's token in the X-Onyx-Token header, and POST bodies must
+    be application/json; together these keep web pages open in a browser from reaching the
+    service. Input paths must be pages (.png/.jpg/.jpeg) and output paths .png/.jpg/.jpeg/.webp
+    files, and with roots set, both must lie under one of them.
+
+    Pages are encoded with the translator's PageEncoder settings, in the format of the output
+    path's extension or the requested one. Paths are on the service's machine. Jobs from
+    different clients run one at a time, since they share the models; a chapter still overlaps
+    its own pages' stages as usual. TM entries edited or deleted in the DB editor meanwhile are
+    picked up at the start of the next job.
+    """
+
+    def __init__(self, translator, config_version: str, pipeline_kwargs: Optional[Dict[str, Any]] = None,
+                 roots: Optional[Sequence[str]] = None, token: Optional[str] = None):
+        self.translator = translator
+        self.config_version = config_version
+        self.pipeline_kwargs = pipeline_kwargs or {}
+        self.pipeline = PagePipeline(translator, **self.pipeline_kwargs)
+        self.roots = [os.path.realpath(root) for root in roots or []]
+        self.token = token or secrets.token_urlsafe(32)
+        self.jobs = 0
+        self._job_lock = threading.Lock()
+
+    def health(self) -> Dict[str, Any]:
+        return {"ready": True, "config_version": self.config_version,
+                "output_format": self.translator.encoder.output_format, "jobs": self.jobs,
+                "tm_entries": self.translator.tm.count_entries()}
+
+    def check_path(self, path: Any, extensions: Tuple[str, ...], kind: str) -> str:
+        """path, if it names an allowed file for kind ("input" or "output"); raises PermissionError otherwise."""
+        if not isinstance(path, str) or not path:
+            raise ValueError(f"Missing {kind} path")
+        real = os.path.realpath(path)
+        # Checked on the resolved path too, so a symlink named page.png cannot point elsewhere.
+        if not path.lower().endswith(extensions) or not real.lower().endswith(extensions):
+            raise PermissionError(f"The {kind} must be a {'/'.join(extensions)} file: {path}")
+        if self.roots and not any(os.path.commonpath([real, root]) == root for root in self.roots):
+            raise PermissionError(f"The {kind} is outside the service's allowed folders: {path}")
+        return path
+
+    def _start_job(self):
+        self.jobs += 1
+        # Pick up entries edited or deleted in the DB editor since the last job.
+        if self.translator.tm.reload_if_changed():
+            print("🔄 Translation memory was edited; reloaded it.")
+
+    def translate_page(self, data: bytes) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+        image, page_hash = self.translator.decode_page(data)
+        if image is None:
+            raise ValueError("Could not decode the image")
+        with self._job_lock:
+            self._start_job()
+            recognized, translated = self.translator.translate_image(image, page_hash)
+        return image, bubble_records(recognized.bubbles, recognized.texts, translated)
+
+    def translate_chapter(self, pages: List[Tuple[str, str]], artifacts: str = "use") -> Iterator[Dict[str, Any]]:
+        """Run pages through the pipeline; artifacts is one of ARTIFACT_MODES (see PagePipeline)."""
+        pipeline = self.pipeline
+        if artifacts != pipeline.artifacts:
+            pipeline = PagePipeline(self.translator, **{**self.pipeline_kwargs, "artifacts": artifacts})
+        with self._job_lock:
+            self._start_job()
+            for job, error in pipeline.run_jobs(pages):
+                yield {"input_path": job.input_path, "output_path": job.output_path, "error": error,
+                       "bubbles": [] if error else bubble_records(job.bubbles, job.texts, job.translated)}
+
+    def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        server = ThreadingHTTPServer((host, port), _Handler)
+        server.daemon_threads = True
+        server.service = self
+        write_token(port, self.token)
+        print(f"🚀 Translation service listening on http://{host}:{port} (token in {token_path(port)})")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("Shutting down...")
+        finally:
+            server.server_close()
+            try:
+                os.remove(token_path(port))
+            except OSError:
+                pass
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "Onyx"
+
+    @property
+    def service(self) -> TranslationService:
+        return self.server.service
+
+    def log_message(self, format, *args):
+        print(f"[service] {self.address_string()} {format % args}")
+
+    def _send_json(self, status: int, payload: Dict[str, Any]):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self) -> bool:
+        if hmac.compare_digest(self.headers.get(TOKEN_HEADER, ""), self.service.token):
+            return True
+        self._send_json(401, {"error": f"Missing or wrong {TOKEN_HEADER} header"})
+        return False
+
+    def _read_json(self) -> Dict[str, Any]:
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        request = json.loads(body)
+        if not isinstance(request, dict):
+            raise ValueError("Expected a JSON object")
+        return request
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        if urlparse(self.path).path == "/health":
+            self._send_json(200, self.service.health())
+        else:
+            self._send_json(404, {"error": f"Unknown endpoint: {self.path}"})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        url = urlparse(self.path)
+        if url.path not in ("/page", "/chapter"):
+            self._send_json(404, {"error": f"Unknown endpoint: {url.path}"})
+            return
+        # Browsers send other content types cross-origin without asking first; JSON needs a preflight.
+        if self.headers.get("Content-Type", "").split(";")[0].strip().lower() != "application/json":
+            self._send_json(415, {"error": "Request bodies must be application/json"})
+            return
+        try:
+            if url.path == "/page":
+                self._page(self._read_json())
+            else:
+                self._chapter(self._read_json())
+        except PermissionError as e:
+            self._send_json(403, {"error": str(e)})
+        except (ValueError, KeyError, TypeError, OSError) as e:
+            self._send_json(400, {"error": f"{type(e).__name__}: {e}"})
+        except Exception as e:
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def _page(self, request: Dict[str, Any]):
+        output_path = request.get("output_path")
+        if output_path is not None:
+            self.service.check_path(output_path, OUTPUT_EXTENSIONS, "output")
+        if "image" in request:
+            body = base64.b64decode(request["image"], validate=True)
+            fmt = request.get("format") or "png"
+        else:
+            input_path = self.service.check_path(request.get("input_path"), IMAGE_EXTENSIONS, "input")
+            fmt = request.get("format") or os.path.splitext(input_path)[1].lstrip(".").lower()
+            with open(input_path, "rb") as f:
+                body = f.read()
+        if fmt == "jpeg":
+            fmt = "jpg"
+        if not output_path and fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format: {fmt}")
+
+        image, bubbles = self.service.translate_page(body)
+        if output_path:
+            self.service.translator.encoder.write(output_path, image)
+            self._send_json(200, {"bubbles": bubbles, "output_path": output_path})
+        else:
+            self._send_json(200, {"bubbles": bubbles, "format": fmt,
+                                  "image": base64.b64encode(self.service.translator.encoder.encode(
+                                      image, f"page.{fmt}")).decode("ascii")})
+
+    def _chapter(self, request: Dict[str, Any]):
+        # Every path is checked before anything is translated or written.
+        pages = [(self.service.check_path(input_path, IMAGE_EXTENSIONS, "input"),
+                  self.service.check_path(output_path, OUTPUT_EXTENSIONS, "output"))
+                 for input_path, output_path in request["pages"]]
+        artifacts = request.get("artifacts", "use")
+        if artifacts not in ARTIFACT_MODES:
+            raise ValueError(f"artifacts must be one of {', '.join(ARTIFACT_MODES)}")
+        # One line per page as it is written; the connection closing ends the stream.
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        results = self.service.translate_chapter(pages, artifacts)
+        try:
+            for result in results:
+                self._write_line(result)
+        except (BrokenPipeError, ConnectionResetError):
+            print("[service] Client went away; abandoning the chapter.")
+        except Exception as e:
+            # The status line is already sent; report the failure in-stream instead.
+            self._write_line({"input_path": None, "output_path": None, "error": f"{type(e).__name__}: {e}",
+                              "bubbles": []})
+        finally:
+            # Stops the pipeline and frees the models for the next job.
+            results.close()
+
+    def _write_line(self, payload: Dict[str, Any]):
+        self.wfile.write(json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+
+class ServiceClient:
+    """Submits pages and chapters to a running TranslationService.
+
+    The token defaults to the one the service on url's port wrote for this user at launch.
+    """
+
+    def __init__(self, url: str = DEFAULT_URL, timeout: float = 600.0, token: Optional[str] = None):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.token = token or read_token(urlparse(self.url).port or DEFAULT_PORT)
+
+    def _request(self, path: str, data: Optional[bytes] = None, timeout: Optional[float] = None):
+        headers = {TOKEN_HEADER: self.token or ""}
+        if data is not None:
+            headers["Content-Type"] = "application/json"
+        request = urllib.request.Request(f"{self.url}{path}", data=data, headers=headers)
+        try:
+            return urllib.request.urlopen(request, timeout=timeout or self.timeout)
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error", str(e))
+            except ValueError:
+                message = str(e)
+            raise ServiceError(message) from e
+        except (urllib.error.URLError, OSError) as e:
+            raise ServiceError(f"Translation service at {self.url} is not reachable: {e}") from e
+
+    def _post_json(self, path: str, payload: Dict[str, Any]):
+        return self._request(path, json.dumps(payload).encode("utf-8"))
+
+    def health(self, timeout: float = 2.0) -> Optional[Dict[str, Any]]:
+        """The service's /health answer, or None if nothing is listening (or it rejects our token)."""
+        try:
+            with self._request("/health", timeout=timeout) as response:
+                return json.load(response)
+        except ServiceError:
+            return None
+
+    def translate_file(self, input_path: str, output_path: str) -> List[Dict[str, Any]]:
+        """Translate a page the service can read and have it written to output_path; returns the bubbles."""
+        with self._post_json("/page", {"input_path": os.path.abspath(input_path),
+                                       "output_path": os.path.abspath(output_path)}) as response:
+            return json.load(response)["bubbles"]
+
+    def translate_bytes(self, data: bytes, fmt: str = "png") -> Tuple[bytes, List[Dict[str, Any]]]:
+        """Translate an encoded page; returns the translated page encoded as fmt, and its bubbles."""
+        with self._post_json("/page", {"image": base64.b64encode(data).decode("ascii"), "format": fmt}) as response:
+            result = json.load(response)
+        return base64.b64decode(result["image"]), result["bubbles"]
+
+    def translate_chapter(self, pages: Iterable[Tuple[str, str]], artifacts: str = "use") -> Iterator[Dict[str, Any]]:
+        """Yield one result per (input_path, output_path) pair, in order, as the service finishes each page.
+
+        artifacts says how the service treats its artifact cache for these pages; see PagePipeline.
+        """
+        pages = [[os.path.abspath(input_path), os.path.abspath(output_path)] for input_path, output_path in pages]
+        with self._post_json("/chapter", {"pages": pages, "artifacts": artifacts}) as response:
+            for line in response:
+                if line.strip():
+                    yield json.loads(line)
@@ -0,0 +1,86 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+def tile_spans(height: int, tile_height: int, overlap: int) -> List[Tuple[int, int]]:
+    """(top, bottom) rows of overlapping horizontal bands covering a strip of the given height.
+
+    Consecutive bands share `overlap` rows, so any bubble shorter than that lies wholly inside at
+    least one band. The last band is aligned to the bottom edge rather than left short.
+    """
+    if height <= tile_height:
+        return [(0, height)]
+    step = max(1, tile_height - overlap)
+    spans = []
+    top = 0
+    while top + tile_height < height:
+        spans.append((top, top + tile_height))
+        top += step
+    spans.append((height - tile_height, height))
+    return spans
+
+
+def _overlap_ratio(a: List[int], b: List[int]) -> float:
+    """Intersection area over the smaller box's area."""
+    ix = min(a[2], b[2]) - max(a[0], b[0])
+    iy = min(a[3], b[3]) - max(a[1], b[1])
+    if ix <= 0 or iy <= 0:
+        return 0.0
+    smaller = min((a[2] - a[0]) * (a[3] - a[1]), (b[2] - b[0]) * (b[3] - b[1]))
+    return ix * iy / smaller if smaller > 0 else 0.0
+
+
+def merge_tile_detections(detections: List[Tuple[List[List[int]], List[Optional[np.ndarray]]]],
+                          min_overlap: float = 0.5) -> Tuple[List[List[int]], List[Optional[np.ndarray]]]:
+    """Combine per-tile (boxes, masks), already in page coordinates, into one set for the page.
+
+    A bubble that crosses a seam is detected whole in one tile and cut off in its neighbour, or
+    cut off in both; boxes from different tiles covering mostly the same area are replaced by
+    their union, with their masks OR'ed together. Boxes within one tile are left as the detector
+    returned them. The result is ordered top to bottom.
+    """
+    boxes, masks, tiles = [], [], []
+    for tile_index, (tile_boxes, tile_masks) in enumerate(detections):
+        boxes.extend(tile_boxes)
+        masks.extend(tile_masks or [None] * len(tile_boxes))
+        tiles.extend([tile_index] * len(tile_boxes))
+
+    parent = list(range(len(boxes)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i in range(len(boxes)):
+        for j in range(i + 1, len(boxes)):
+            # Tiles are processed top-down, so only neighbouring tiles can share a bubble.
+            if tiles[j] - tiles[i] > 1:
+                break
+            if tiles[i] != tiles[j] and _overlap_ratio(boxes[i], boxes[j]) >= min_overlap:
+                parent[find(j)] = find(i)
+
+    groups = {}
+    for i in range(len(boxes)):
+        groups.setdefault(find(i), []).append(i)
+
+    merged = []
+    for members in groups.values():
+        x1 = min(boxes[i][0] for i in members)
+        y1 = min(boxes[i][1] for i in members)
+        x2 = max(boxes[i][2] for i in members)
+        y2 = max(boxes[i][3] for i in members)
+        mask = None
+        if any(masks[i] is not None for i in members):
+            mask = np.zeros((y2 - y1, x2 - x1), dtype=np.uint8)
+            for i in members:
+                if masks[i] is not None:
+                    bx1, by1, bx2, by2 = boxes[i]
+                    region = mask[by1 - y1:by2 - y1, bx1 - x1:bx2 - x1]
+                    np.maximum(region, masks[i][:region.shape[0], :region.shape[1]], out=region)
+        merged.append(([x1, y1, x2, y2], mask))
+
+    merged.sort(key=lambda item: (item[0][1], item[0][0]))
+    return [box for box, _ in merged], [mask for _, mask in merged]
@@ -0,0 +1,208 @@
+import html
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import List, Dict, Tuple, Optional
+
+# Cloud Translation Basic (v2) accepts at most 128 segments per request and recommends
+# keeping a request under 5k characters.
+MAX_SEGMENTS_PER_REQUEST = 128
+MAX_CHARS_PER_REQUEST = 5000
+
+
+def pack_requests(texts: List[str], max_chars: int = MAX_CHARS_PER_REQUEST,
+                  max_segments: int = MAX_SEGMENTS_PER_REQUEST) -> List[List[str]]:
+    """Greedily pack texts, in order, into request-sized groups under both limits.
+
+    A single text longer than max_chars gets a request of its own.
+    """
+    requests = []
+    current, current_chars = [], 0
+    for text in texts:
+        if current and (len(current) >= max_segments or current_chars + len(text) > max_chars):
+            requests.append(current)
+            current, current_chars = [], 0
+        current.append(text)
+        current_chars += len(text)
+    if current:
+        requests.append(current)
+    return requests
+
+
+def unique_texts(texts: List[str]) -> List[str]:
+    """Non-blank texts with duplicates removed, in first-seen order."""
+    return list(dict.fromkeys(text for text in texts if text.strip()))
+
+
+class TranslationError(Exception):
+    pass
+
+
+class TranslationBackend:
+    """A translation service. Implementations translate a list of segments in one call."""
+
+    name = "base"
+
+    def translate(self, texts: List[str], source_language: str, target_language: str) -> List[str]:
+        raise NotImplementedError
+
+    def is_retryable(self, error: Exception) -> bool:
+        return not isinstance(error, (ValueError, TypeError))
+
+
+class GoogleTranslateBackend(TranslationBackend):
+    name = "google"
+
+    def __init__(self, api_key_path: str):
+        from google.cloud import translate_v2 as translate
+
+        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = api_key_path
+        self.client = translate.Client()
+
+    def translate(self, texts: List[str], source_language: str, target_language: str) -> List[str]:
+        results = self.client.translate(texts, source_language=source_language, target_language=target_language)
+        return [html.unescape(result['translatedText']) for result in results]
+
+    def is_retryable(self, error: Exception) -> bool:
+        from google.api_core import exceptions as api_exceptions
+
+        # Bad requests and auth/quota-configuration problems will fail the same way every time.
+        if isinstance(error, (api_exceptions.BadRequest, api_exceptions.Unauthorized, api_exceptions.Forbidden,
+                              api_exceptions.NotFound)):
+            return False
+        return super().is_retryable(error)
+
+
+class StubTranslationBackend(TranslationBackend):
+    """Offline backend for load-testing the pipeline without network access.
+
+    Returns each segment tagged with the target language after a simulated round-trip,
+    and can inject transient failures to exercise the retry path.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency: float = 0.05, failure_rate: float = 0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+
+    def translate(self, texts: List[str], source_language: str, target_language: str) -> List[str]:
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise ConnectionError("Simulated transient translation failure")
+        return [f"[{target_language}] {text}" for text in texts]
+
+
+def create_backend(name: str, api_key_path: Optional[str] = None) -> TranslationBackend:
+    if name == "google":
+        return GoogleTranslateBackend(api_key_path)
+    if name == "stub":
+        return StubTranslationBackend()
+    raise ValueError(f"Unknown translation backend: {name}")
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: float) -> float:
+        """Take amount tokens, going into debt if needed; returns how long the caller must wait."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= amount
+        return max(0.0, -self.tokens / self.rate)
+
+
+class RateLimiter:
+    """Requests-per-second and characters-per-minute budget shared by all in-flight requests."""
+
+    def __init__(self, requests_per_second: Optional[float] = None, chars_per_minute: Optional[int] = None):
+        self._lock = threading.Lock()
+        self._requests = _TokenBucket(requests_per_second, max(1.0, requests_per_second)) \
+            if requests_per_second else None
+        self._chars = _TokenBucket(chars_per_minute / 60.0, chars_per_minute) if chars_per_minute else None
+
+    def acquire(self, chars: int):
+        with self._lock:
+            wait = 0.0
+            if self._requests:
+                wait = max(wait, self._requests.reserve(1))
+            if self._chars:
+                wait = max(wait, self._chars.reserve(chars))
+        if wait:
+            time.sleep(wait)
+
+
+class TranslationClient:
+    """Runs backend requests on a bounded pool, under a rate budget, with jittered exponential backoff.
+
+    A request that still fails after max_retries raises TranslationError instead of returning
+    placeholder text, so callers can leave the affected bubbles untouched.
+    """
+
+    def __init__(self, backend: TranslationBackend, source_language: str = 'ja', target_language: str = 'en',
+                 max_in_flight: int = 4, requests_per_second: Optional[float] = 10.0,
+                 chars_per_minute: Optional[int] = None, max_retries: int = 5,
+                 backoff_base: float = 0.5, backoff_max: float = 30.0,
+                 max_chars_per_request: int = MAX_CHARS_PER_REQUEST,
+                 max_segments_per_request: int = MAX_SEGMENTS_PER_REQUEST):
+        self.backend = backend
+        self.source_language = source_language
+        self.target_language = target_language
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_chars_per_request = max_chars_per_request
+        self.max_segments_per_request = max_segments_per_request
+        self.rate_limiter = RateLimiter(requests_per_second, chars_per_minute)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_in_flight), thread_name_prefix="translate")
+
+    def _call_with_retry(self, texts: List[str]) -> List[str]:
+        chars = sum(len(text) for text in texts)
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire(chars)
+            try:
+                results = self.backend.translate(texts, self.source_language, self.target_language)
+                if len(results) != len(texts):
+                    raise TranslationError(f"{self.backend.name} returned {len(results)} results for {len(texts)} segments")
+                return results
+            except Exception as e:
+                if attempt >= self.max_retries or not self.backend.is_retryable(e):
+                    raise TranslationError(f"{self.backend.name} translation failed after {attempt + 1} attempt(s): {e}") from e
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+                print(f"   ⚠️ Translation request failed ({e}); retrying in {delay:.1f}s...")
+                time.sleep(delay)
+                attempt += 1
+
+    def submit(self, texts: List[str]) -> Future:
+        return self._executor.submit(self._call_with_retry, texts)
+
+    def translate(self, texts: List[str]) -> List[str]:
+        return self.submit(texts).result()
+
+    def submit_many(self, texts: List[str]) -> List[Tuple[List[str], Future]]:
+        """Pack texts into requests and put them all in flight at once."""
+        requests = pack_requests(texts, self.max_chars_per_request, self.max_segments_per_request)
+        return [(request, self.submit(request)) for request in requests]
+
+    @staticmethod
+    def collect(jobs: List[Tuple[List[str], Future]]) -> Dict[str, str]:
+        """Wait for submit_many jobs. Segments of requests that failed are left out of the result."""
+        translations = {}
+        for request, future in jobs:
+            try:
+                translations.update(zip(request, future.result()))
+            except TranslationError as e:
+                print(f"   ❌ {e}")
+        return translations
+
+    def close(self):
+        self._executor.shutdown(wait=True)
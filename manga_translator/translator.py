@@ -1,16 +1,23 @@
+import hashlib
 import os
 import sys
+import threading
+import time
 import cv2
-import torch
 import numpy as np
 import html
-from PIL import Image, ImageDraw, ImageFont
-from ultralytics import YOLO
-from manga_ocr import MangaOcr
-from google.cloud import translate_v2 as translate
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 
+from .artifacts import ArtifactCache, PageArtifacts
+from .encoder import DEFAULT_JPEG_QUALITY, DEFAULT_PNG_COMPRESSION, DEFAULT_WEBP_QUALITY, PageEncoder
+from .inference import calibration_hash, load_detector, load_ocr, validate as validate_inference
 from .memory import TranslationMemory
+from .ocr import BatchedMangaOcr
+from .ocr_cache import OcrCache, crop_signature
+from .pipeline import PagePipeline
+from .tiling import merge_tile_detections, tile_spans
+from .translation import TranslationClient, create_backend, unique_texts
+from .typesetting import Typesetter
 
 
 def resource_path(relative_path: str) -> str:
@@ -22,69 +29,356 @@ def resource_path(relative_path: str) -> str:
 
 
 class MangaTranslator:
+    INPAINT_RADIUS = 5
+    # Inpainting only reads known pixels within INPAINT_RADIUS of the mask, so a region of interest
+    # padded a little past that gives the same result as inpainting the whole page.
+    INPAINT_ROI_PADDING = INPAINT_RADIUS + 3
+    # Fast clean: a bubble interior counts as plain when its non-text pixels vary less than this
+    # (per-channel standard deviation) and at least FAST_CLEAN_MIN_BACKGROUND of it is background.
+    FAST_CLEAN_MAX_STD = 12.0
+    FAST_CLEAN_MIN_BACKGROUND = 0.3
+    DETECTION_CONF = 0.15
+    DETECTION_IOU = 0.7
+    DETECTION_MAX_DET = 50
+    # Pages taller than this many times their width are detected in overlapping bands.
+    TILE_MIN_ASPECT = 2.5
+
     def __init__(self, google_api_key_path: str, yolo_model_path="yolo_models/yolov8m.pt",
-                 font_path="fonts/mangat.ttf"):
-        if torch.cuda.is_available():
-            self.device = "cuda"
-        elif torch.backends.mps.is_available():
-            self.device = "mps"
-        else:
-            self.device = "cpu"
+                 font_path="fonts/mangat.ttf", detection_batch_size: int = 4, ocr_batch_size: int = 16,
+                 translation_backend: str = "google", max_in_flight: int = 4,
+                 requests_per_second: Optional[float] = 10.0, chars_per_minute: Optional[int] = None,
+                 tm_path: str = "translation_memory.db", tm_cache_size: int = 50000, serve_unreviewed: bool = True,
+                 tm_write_behind: bool = True, fuzzy_threshold: Optional[float] = None, fast_clean: bool = False,
+                 artifact_cache_dir: Optional[str] = "page_cache", ocr_cache_path: Optional[str] = "ocr_cache.db",
+                 ocr_cache_size: int = 20000, tile_height: Optional[int] = None, tile_overlap: int = 400,
+                 detection_size: Optional[int] = None, inference_backend: str = "torch",
+                 quantize: Optional[str] = None, calibration_dir: Optional[str] = None,
+                 output_format: str = "same", jpeg_quality: int = DEFAULT_JPEG_QUALITY,
+                 webp_quality: int = DEFAULT_WEBP_QUALITY, png_compression: Optional[int] = DEFAULT_PNG_COMPRESSION):
+        self.device = self._select_device()
 
-        self.google_api_key_path = resource_path(google_api_key_path)
+        self.google_api_key_path = resource_path(google_api_key_path or "")
         yolo_path = resource_path(yolo_model_path)
         ocr_path = resource_path("local_models/manga-ocr-base")
         self.font_path = resource_path(font_path)
 
-        if not os.path.exists(self.google_api_key_path):
+        if translation_backend == "google" and not os.path.isfile(self.google_api_key_path):
             raise FileNotFoundError(f"Google API Key file not found at: {self.google_api_key_path}")
-        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = self.google_api_key_path
-        self.translate_client = translate.Client()
-
-        self.yolo_model = YOLO(yolo_path).to(self.device)
+        self.translation_client = TranslationClient(create_backend(translation_backend, self.google_api_key_path),
+                                                    max_in_flight=max_in_flight,
+                                                    requests_per_second=requests_per_second,
+                                                    chars_per_minute=chars_per_minute)
 
-        if os.path.exists(ocr_path):
-            self.ocr_model = MangaOcr(ocr_path)
-        else:
-            self.ocr_model = MangaOcr()
+        # Band height for tall strips (default 1.5x the page width) and rows shared by neighbouring
+        # bands; a bubble taller than the overlap may be split in two across a seam.
+        self.tile_height = tile_height
+        self.tile_overlap = tile_overlap
+        # Longest side, in pixels, pages are reduced to before detection; None detects at full size.
+        self.detection_size = detection_size
+        # The models are loaded on first use, so re-rendering pages from the artifact cache never pays for them.
+        validate_inference(inference_backend, quantize)
+        self.inference_backend = inference_backend
+        self.quantize = quantize
+        self.calibration_dir = calibration_dir
+        self.yolo_path = yolo_path
+        self.ocr_path = ocr_path
+        self.ocr_batch_size = ocr_batch_size
+        self._yolo_model = None
+        self._batch_ocr = None
+        self._model_lock = threading.Lock()
+        self.artifacts = ArtifactCache(artifact_cache_dir, self.model_version()) if artifact_cache_dir else None
+        self.ocr_cache = OcrCache(ocr_cache_path, self._ocr_version(), max_entries=ocr_cache_size) \
+            if ocr_cache_path else None
 
-        self.tm = TranslationMemory()
+        self.tm = TranslationMemory(tm_path, cache_size=tm_cache_size, serve_unreviewed=serve_unreviewed,
+                                    write_behind=tm_write_behind, fuzzy_threshold=fuzzy_threshold)
+        self.tm.preload()
         self.default_font_size = 28
+        self.typesetter = Typesetter(self.font_path, max_font_size=self.default_font_size + 2)
+        self.detection_batch_size = max(1, detection_batch_size)
+        self.fast_clean = fast_clean
+        # Used by the PagePipeline's encode stage, which writes finished pages while later ones are processed.
+        self.encoder = PageEncoder(output_format, jpeg_quality=jpeg_quality, webp_quality=webp_quality,
+                                   png_compression=png_compression)
+
+    @staticmethod
+    def _select_device() -> str:
+        # torch is imported here rather than at module level so importing this module (e.g. from the
+        # GUI) stays cheap; the cost is paid by whoever constructs the translator.
+        import torch
+
+        if torch.cuda.is_available():
+            return "cuda"
+        if torch.backends.mps.is_available():
+            return "mps"
+        return "cpu"
+
+    @property
+    def yolo_model(self):
+        with self._model_lock:
+            if self._yolo_model is None:
+                self._yolo_model = load_detector(self.yolo_path, self.inference_backend, self.quantize, self.device,
+                                                 self._calibration_images())
+            return self._yolo_model
+
+    @property
+    def batch_ocr(self) -> BatchedMangaOcr:
+        with self._model_lock:
+            if self._batch_ocr is None:
+                processor, model, tokenizer = load_ocr(self.ocr_path, self.inference_backend, self.quantize,
+                                                       self.device)
+                self._batch_ocr = BatchedMangaOcr(processor, model, tokenizer, batch_size=self.ocr_batch_size)
+            return self._batch_ocr
 
-    def _detect_bubbles(self, image_path: str) -> List[List[int]]:
-        results = self.yolo_model(image_path, conf=0.15, iou=0.7, agnostic_nms=True, max_det=50)
-        if not results or not results[0].boxes:
-            return []
-        bboxes = results[0].boxes.xyxy.int().tolist()
-        return bboxes
+    def share_models(self, other: "MangaTranslator"):
+        """Reuse other's already-loaded detector and OCR model if they were built with the same settings."""
+        if other.model_version() != self.model_version() or other.device != self.device:
+            return
+        with self._model_lock, other._model_lock:
+            self._yolo_model = self._yolo_model or other._yolo_model
+            self._batch_ocr = self._batch_ocr or other._batch_ocr
+
+    def warm_up(self) -> Dict[str, float]:
+        """Load both models and run each once on a blank input, so the first real page doesn't pay for it.
+
+        Returns the seconds spent on each step.
+        """
+        timings = {}
+        start = time.perf_counter()
+        _ = self.yolo_model
+        timings["load detector"] = time.perf_counter() - start
 
-    def _translate_with_feedback(self, text: str) -> str:
-        if not text.strip():
-            return ""
+        start = time.perf_counter()
+        self.detect_bubbles_batch([np.full((1024, 720, 3), 255, dtype=np.uint8)])
+        timings["warm up detector"] = time.perf_counter() - start
 
-        cached_translation = self.tm.lookup(text)
-        if cached_translation:
-            return cached_translation
+        start = time.perf_counter()
+        ocr = self.batch_ocr
+        timings["load OCR"] = time.perf_counter() - start
 
+        start = time.perf_counter()
+        ocr([np.full((96, 64, 3), 255, dtype=np.uint8)])
+        timings["warm up OCR"] = time.perf_counter() - start
+        return timings
+
+    @staticmethod
+    def _file_version(path: str) -> str:
         try:
-            result = self.translate_client.translate(text, source_language='ja', target_language='en')
-            cleaned_text = self._clean_text(result['translatedText'])
-            self.tm.add_translation(text, cleaned_text)
-            return cleaned_text
-        except Exception as e:
-            print(f"   ❌ Google Translate API Error: {e}")
-            return "Translation Failed"
-
-    def _ocr_and_translate(self, image: np.ndarray, bubbles: List[List[int]]) -> List[Dict[str, Any]]:
+            stat = os.stat(path)
+            return f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+        except OSError:
+            return f"{os.path.basename(path)}:missing"
+
+    def _calibration_images(self) -> Optional[List[str]]:
+        if not self.calibration_dir:
+            return None
+        from .batch import list_image_files
+        return [os.path.join(self.calibration_dir, f) for f in list_image_files(self.calibration_dir)]
+
+    def _ocr_version(self) -> str:
+        return f"{self._file_version(os.path.join(self.ocr_path, 'config.json'))}|{self.inference_backend}|{self.quantize}"
+
+    def model_version(self) -> str:
+        """Fingerprint of the detection and OCR models and settings, for keying cached page results."""
+        parts = [f"conf={self.DETECTION_CONF},iou={self.DETECTION_IOU},max_det={self.DETECTION_MAX_DET}",
+                 f"backend={self.inference_backend},quantize={self.quantize}",
+                 f"tiles={self.TILE_MIN_ASPECT},{self.tile_height},{self.tile_overlap}",
+                 f"detection_size={self.detection_size}",
+                 self._file_version(self.yolo_path), self._ocr_version()]
+        if self.quantize == "static" and self.calibration_dir:
+            # A detector calibrated on other pages finds slightly different bubbles.
+            parts.append(f"calibration={calibration_hash(self._calibration_images())}")
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def read_page(image_path: str) -> Tuple[Optional[np.ndarray], str]:
+        """Decode a page and hash its file bytes from a single read. The image is None if it cannot be decoded."""
+        with open(image_path, "rb") as f:
+            return MangaTranslator.decode_page(f.read())
+
+    @staticmethod
+    def decode_page(data: bytes) -> Tuple[Optional[np.ndarray], str]:
+        """Decode an encoded page held in memory and hash its bytes. The image is None if it cannot be decoded."""
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR) if data else None
+        return image, hashlib.sha256(data).hexdigest()
+
+    def cached_recognition(self, page_hash: str) -> Optional[PageArtifacts]:
+        return self.artifacts.get(page_hash) if self.artifacts else None
+
+    def store_recognition(self, page_hash: str, bubbles: List[List[int]], masks: List[Optional[np.ndarray]],
+                          texts: List[str]):
+        if self.artifacts:
+            self.artifacts.put(page_hash, bubbles, masks, texts)
+
+    def recognize_page(self, image: np.ndarray, page_hash: Optional[str] = None) -> PageArtifacts:
+        """Bubbles, masks and OCR text for a page, from the artifact cache when page_hash is known there."""
+        cached = self.cached_recognition(page_hash) if page_hash else None
+        if cached is not None:
+            return cached
+        bubbles, masks = self._detect_bubbles(image)
+        texts = self._ocr_bubbles(image, bubbles) if bubbles else []
+        if page_hash:
+            self.store_recognition(page_hash, bubbles, masks, texts)
+        return PageArtifacts(bubbles, masks, texts)
+
+    def _detect_bubbles(self, image: np.ndarray) -> Tuple[List[List[int]], List[Optional[np.ndarray]]]:
+        return self.detect_bubbles_batch([image])[0]
+
+    def detect_bubbles_batch(self, images: List[np.ndarray], batch_size: Optional[int] = None
+                             ) -> List[Tuple[List[List[int]], List[Optional[np.ndarray]]]]:
+        """Run bubble detection over already-decoded BGR pages, batch_size images per forward pass.
+
+        Returns (boxes, masks) per input page, in input order. Boxes are [x1, y1, x2, y2]; each mask
+        is the segmentation model's bubble shape as a uint8 array the size of its box, or None when
+        the detector does not produce masks.
+
+        Pages more than TILE_MIN_ASPECT times taller than wide (webtoon strips) are detected as
+        overlapping bands whose results are merged across the seams, since letterboxing a whole
+        strip down to the model's input size would shrink its bubbles to a few pixels.
+
+        With detection_size set, each page or band whose longer side exceeds it is downscaled to
+        that size before detection and the boxes and masks are mapped back to full resolution, so
+        OCR and typesetting still work on the full-resolution page.
+        """
+        batch_size = batch_size or self.detection_batch_size
+        # One forward-pass input per page, or per band of a tall page: (page index, band top, scale, view).
+        views = []
+        for page_index, image in enumerate(images):
+            for top, bottom in self._tile_spans(image):
+                view, scale = self._detection_input(image[top:bottom])
+                views.append((page_index, top, scale, view))
+
+        per_page = [[] for _ in images]
+        for start in range(0, len(views), batch_size):
+            batch = views[start:start + batch_size]
+            results = self.yolo_model([view for _, _, _, view in batch], conf=self.DETECTION_CONF,
+                                      iou=self.DETECTION_IOU, agnostic_nms=True, max_det=self.DETECTION_MAX_DET)
+            for (page_index, top, scale, _), result in zip(batch, results):
+                if not result.boxes:
+                    per_page[page_index].append(([], []))
+                    continue
+                height, width = images[page_index].shape[:2]
+                bboxes = self._scale_boxes(result.boxes.xyxy.cpu().numpy(), scale, width, height - top)
+                masks = self._bubble_masks(result, bboxes, scale)
+                per_page[page_index].append(([[x1, y1 + top, x2, y2 + top] for x1, y1, x2, y2 in bboxes], masks))
+        return [tiles[0] if len(tiles) == 1 else merge_tile_detections(tiles) for tiles in per_page]
+
+    def _detection_input(self, image: np.ndarray) -> Tuple[np.ndarray, float]:
+        """The image YOLO sees and its scale relative to the original (1.0 when not reduced)."""
+        height, width = image.shape[:2]
+        if not self.detection_size or max(height, width) <= self.detection_size:
+            return image, 1.0
+        scale = self.detection_size / max(height, width)
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        return cv2.resize(image, size, interpolation=cv2.INTER_AREA), scale
+
+    @staticmethod
+    def _scale_boxes(xyxy: np.ndarray, scale: float, width: int, height: int) -> List[List[int]]:
+        if scale != 1.0:
+            xyxy = np.clip(xyxy / scale, 0, [width, height, width, height])
+        return xyxy.astype(np.int32).tolist()
+
+    def _tile_spans(self, image: np.ndarray) -> List[Tuple[int, int]]:
+        height, width = image.shape[:2]
+        if height <= width * self.TILE_MIN_ASPECT:
+            return [(0, height)]
+        tile_height = self.tile_height or int(width * 1.5)
+        return tile_spans(height, tile_height, min(self.tile_overlap, tile_height // 2))
+
+    @staticmethod
+    def _bubble_masks(result, bboxes: List[List[int]], scale: float = 1.0) -> List[Optional[np.ndarray]]:
+        if result.masks is None:
+            return [None] * len(bboxes)
+        # masks.xy holds the outline polygons already scaled back to the detector's input image,
+        # which is far cheaper to rasterize per box than upsampling the model-resolution mask tensor.
+        masks = []
+        for (x1, y1, x2, y2), polygon in zip(bboxes, result.masks.xy):
+            mask = np.zeros((max(0, y2 - y1), max(0, x2 - x1)), dtype=np.uint8)
+            if len(polygon):
+                points = np.round(polygon / scale - (x1, y1)).astype(np.int32)
+                cv2.fillPoly(mask, [points], 255)
+            masks.append(mask)
+        return masks
+
+    def submit_translations(self, texts: List[str]) -> Tuple[Dict[str, str], list]:
+        """Start translating a batch of OCR'd strings without waiting for the API.
+
+        Strings are deduplicated and checked against the TM; only the misses are sent, packed into
+        as few list requests as the API limits allow. Pass the result to collect_translations.
+        """
+        unique = unique_texts(texts)
+        cached = self.tm.lookup_many(unique)
+        misses = self._fill_from_fuzzy_matches([text for text in unique if text not in cached], cached)
+        return cached, self.translation_client.submit_many(misses)
+
+    def _fill_from_fuzzy_matches(self, misses: List[str], found: Dict[str, str]) -> List[str]:
+        """Reuse near-identical TM lines for exact misses; returns the lines still untranslated."""
+        if self.tm.fuzzy_threshold is None:
+            return misses
+        remaining = []
+        for text in misses:
+            match = self.tm.lookup_fuzzy(text)
+            if match is None:
+                remaining.append(text)
+                continue
+            translated_text, matched_source, _ = match
+            found[text] = translated_text
+            self.tm.add_translation(text, translated_text, fuzzy_source=matched_source)
+        return remaining
+
+    def collect_translations(self, pending: Tuple[Dict[str, str], list]) -> Dict[str, str]:
+        cached, jobs = pending
+        new_translations = self.translation_client.collect(jobs)
+        if new_translations:
+            self.tm.add_translations(list(new_translations.items()))
+        return {**cached, **new_translations}
+
+    def translate_texts(self, texts: List[str]) -> Dict[str, str]:
+        """Translate a whole chapter's worth of strings; lines whose request failed are left out."""
+        return self.collect_translations(self.submit_translations(texts))
+
+    @staticmethod
+    def _crop_bubbles(image: np.ndarray, bubbles: List[List[int]]) -> List[np.ndarray]:
+        return [image[y1:y2, x1:x2] for x1, y1, x2, y2 in bubbles]
+
+    def _ocr_bubbles(self, image: np.ndarray, bubbles: List[List[int]]) -> List[str]:
+        return self.ocr_crops(self._crop_bubbles(image, bubbles))
+
+    def ocr_crops(self, crops: List[np.ndarray]) -> List[str]:
+        """OCR text per bubble crop. Crops matching one in the OCR cache skip the model."""
+        texts = [""] * len(crops)
+        indices = [i for i, crop in enumerate(crops) if crop.size > 0]
+        signatures = {}
+        if self.ocr_cache is not None and indices:
+            signatures = {i: crop_signature(crops[i]) for i in indices}
+            cached = self.ocr_cache.get_many([signatures[i] for i in indices])
+            for i, text in zip(indices, cached):
+                if text is not None:
+                    texts[i] = text
+            indices = [i for i, text in zip(indices, cached) if text is None]
+        if indices:
+            recognized = [text.strip() for text in self.batch_ocr([crops[i] for i in indices])]
+            for i, text in zip(indices, recognized):
+                texts[i] = text
+            if signatures:
+                self.ocr_cache.put_many([signatures[i] for i in indices], recognized)
+        return texts
+
+    def _ocr_and_translate(self, image: np.ndarray, bubbles: List[List[int]],
+                           original_texts: Optional[List[str]] = None,
+                           translated: Optional[Dict[str, str]] = None,
+                           masks: Optional[List[Optional[np.ndarray]]] = None) -> List[Dict[str, Any]]:
+        if original_texts is None:
+            original_texts = self._ocr_bubbles(image, bubbles)
+        if translated is None:
+            translated = self.translate_texts(original_texts)
+
         translations = []
-        for i, bbox in enumerate(bubbles):
-            x1, y1, x2, y2 = bbox
-            cropped_bubble = image[y1:y2, x1:x2]
-            pil_image = Image.fromarray(cv2.cvtColor(cropped_bubble, cv2.COLOR_BGR2RGB))
-            original_text = self.ocr_model(pil_image).strip()
-            translated_text = self._translate_with_feedback(original_text)
+        for i, (bbox, original_text) in enumerate(zip(bubbles, original_texts)):
+            translated_text = translated.get(original_text) if original_text.strip() else ""
             translations.append({
-                "id": i, "bbox": bbox, "original_text": original_text, "translated_text": translated_text
+                "id": i, "bbox": bbox, "original_text": original_text, "translated_text": translated_text,
+                "mask": masks[i] if masks else None
             })
         return translations
 
@@ -92,81 +386,151 @@ class MangaTranslator:
     def _clean_text(text: str) -> str:
         return html.unescape(text)
 
-    def _apply_translations(self, image: np.ndarray, translations: List[Dict[str, Any]]) -> np.ndarray:
-        output_image = image.copy()
+    def _apply_translations(self, image: np.ndarray, translations: List[Dict[str, Any]],
+                            in_place: bool = False) -> np.ndarray:
+        """Clean and typeset every bubble on the BGR page.
+
+        Text is rasterized into small per-bubble coverage tiles and blended straight into the page
+        array, so no full-page colour conversion or PIL copy is made. With in_place the caller's
+        buffer is modified and returned.
+        """
+        output_image = image if in_place else image.copy()
 
         for bubble in translations:
-            x1, y1, x2, y2 = bubble['bbox']
-            bubble_crop = output_image[y1:y2, x1:x2]
-            gray_crop = cv2.cvtColor(bubble_crop, cv2.COLOR_BGR2GRAY)
-            _, text_mask = cv2.threshold(gray_crop, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-            kernel = np.ones((3, 3), np.uint8)
-            dilated_mask = cv2.dilate(text_mask, kernel, iterations=2)
-            full_mask = np.zeros(output_image.shape[:2], dtype=np.uint8)
-            full_mask[y1:y2, x1:x2] = dilated_mask
-            output_image = cv2.inpaint(output_image, full_mask, inpaintRadius=5, flags=cv2.INPAINT_NS)
-
-        img_pil = Image.fromarray(cv2.cvtColor(output_image, cv2.COLOR_BGR2RGB))
-        draw = ImageDraw.Draw(img_pil)
+            # No translation came back for this bubble; keep the original lettering rather than blank it.
+            if bubble.get("translated_text") is None:
+                continue
+            self._clean_bubble(output_image, bubble['bbox'], bubble.get("mask"))
 
         for bubble in translations:
-            translated_text = self._clean_text(bubble.get("translated_text", ""))
+            translated_text = self._clean_text(bubble.get("translated_text") or "")
             if not translated_text:
                 continue
 
             x1, y1, x2, y2 = bubble['bbox']
             padding = 15
             bubble_w, bubble_h = (x2 - x1) - padding, (y2 - y1) - padding
-            font_size = self.default_font_size + 2
 
-            wrapped_text = ""
-            while font_size > 8:
-                font = ImageFont.truetype(self.font_path, font_size)
-                wrapped_text = self._wrap_text(translated_text, font, bubble_w)
-                text_bbox = draw.textbbox((0, 0), wrapped_text, font=font, align="center")
-                text_w, text_h = text_bbox[2] - text_bbox[0], text_bbox[3] - text_bbox[1]
+            layout = self.typesetter.layout(translated_text, bubble_w, bubble_h)
+            text_x = x1 + ((x2 - x1) - layout.width) // 2
+            text_y = y1 + ((y2 - y1) - layout.height) // 2
+            coverage, tile_x, tile_y = self.typesetter.render_mask(layout, text_x, text_y)
+            self._blend_black_text(output_image, coverage, tile_x, tile_y)
 
-                if text_w < bubble_w and text_h < bubble_h:
-                    break
-                font_size -= 1
+        return output_image
 
-            text_bbox = draw.textbbox((0, 0), wrapped_text, font=font, align="center")
-            text_w, text_h = text_bbox[2] - text_bbox[0], text_bbox[3] - text_bbox[1]
-            text_x = x1 + ((x2 - x1) - text_w) // 2
-            text_y = y1 + ((y2 - y1) - text_h) // 2
-            draw.text((text_x, text_y), wrapped_text, font=font, fill="black", align="center")
+    @staticmethod
+    def _blend_black_text(image: np.ndarray, coverage: np.ndarray, x: int, y: int):
+        """Blend black ink into image through an 8-bit coverage tile placed at (x, y), in place.
 
-        return cv2.cvtColor(np.array(img_pil), cv2.COLOR_RGB2BGR)
+        Uses the same fixed-point arithmetic as PIL's ink-through-mask paste, so the result is
+        identical to drawing black text on an RGB copy of the page.
+        """
+        height, width = image.shape[:2]
+        x1, y1 = max(0, x), max(0, y)
+        x2, y2 = min(width, x + coverage.shape[1]), min(height, y + coverage.shape[0])
+        if x1 >= x2 or y1 >= y2:
+            return
+        alpha = coverage[y1 - y:y2 - y, x1 - x:x2 - x].astype(np.int32)[..., None]
+        roi = image[y1:y2, x1:x2]
+        tmp = roi.astype(np.int32) * (255 - alpha) + 128
+        roi[:] = ((tmp >> 8) + tmp) >> 8
 
-    @staticmethod
-    def _wrap_text(text: str, font: ImageFont.FreeTypeFont, max_width: int) -> str:
-        words = text.split()
-        lines = []
-        current_line = ""
-        for word in words:
-            test_line = f"{current_line} {word}".strip()
-            if font.getbbox(test_line)[2] <= max_width:
-                current_line = test_line
-            else:
-                lines.append(current_line)
-                current_line = word
-        lines.append(current_line)
-        return "\n".join(lines)
+    def _clean_bubble(self, image: np.ndarray, bbox: List[int], bubble_mask: Optional[np.ndarray] = None):
+        """Erase the lettering inside bbox, in place, by inpainting a padded region around it.
 
-    def process_page(self, image_path: str, output_path: str):
-        image = cv2.imread(image_path)
-        if image is None:
-            print(f"❌ Could not read image: {image_path}")
+        Bubbles are cleaned one after another on the same buffer, so where they overlap each one
+        sees the previous result exactly as a whole-page pass would. In fast-clean mode, plain
+        bubbles with a segmentation mask are filled with their background colour instead.
+        """
+        x1, y1, x2, y2 = bbox
+        bubble_crop = image[y1:y2, x1:x2]
+        if bubble_crop.size == 0:
             return
+        gray_crop = cv2.cvtColor(bubble_crop, cv2.COLOR_BGR2GRAY)
+        _, text_mask = cv2.threshold(gray_crop, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        kernel = np.ones((3, 3), np.uint8)
+        dilated_mask = cv2.dilate(text_mask, kernel, iterations=2)
 
-        bubbles = self._detect_bubbles(image_path)
-        if not bubbles:
-            cv2.imwrite(output_path, image)
+        if self.fast_clean and bubble_mask is not None and self._fill_plain_bubble(bubble_crop, bubble_mask,
+                                                                                   dilated_mask):
             return
 
-        translations = self._ocr_and_translate(image, bubbles)
-        final_image = self._apply_translations(image, translations)
-        cv2.imwrite(output_path, final_image)
+        height, width = image.shape[:2]
+        pad = self.INPAINT_ROI_PADDING
+        rx1, ry1 = max(0, x1 - pad), max(0, y1 - pad)
+        rx2, ry2 = min(width, x2 + pad), min(height, y2 + pad)
+        roi = image[ry1:ry2, rx1:rx2]
+        roi_mask = np.zeros(roi.shape[:2], dtype=np.uint8)
+        roi_mask[y1 - ry1:y2 - ry1, x1 - rx1:x2 - rx1] = dilated_mask
+        roi[:] = cv2.inpaint(roi, roi_mask, inpaintRadius=self.INPAINT_RADIUS, flags=cv2.INPAINT_NS)
+
+    def _fill_plain_bubble(self, bubble_crop: np.ndarray, bubble_mask: np.ndarray, text_mask: np.ndarray) -> bool:
+        """Paint a plain bubble's interior with its sampled background colour, in place.
+
+        Returns False, leaving the crop untouched, when the interior is textured (screentone,
+        gradients, art behind a translucent bubble) and has to be inpainted instead.
+        """
+        kernel = np.ones((3, 3), np.uint8)
+        # Stay a few pixels inside the outline so the bubble's border line is kept.
+        interior = cv2.erode(bubble_mask, kernel, iterations=3) > 0
+        interior_area = np.count_nonzero(interior)
+        if interior_area == 0:
+            return False
+
+        background = bubble_crop[interior & (text_mask == 0)]
+        if len(background) < interior_area * self.FAST_CLEAN_MIN_BACKGROUND:
+            return False
+        if background.std(axis=0).max() > self.FAST_CLEAN_MAX_STD:
+            return False
+
+        bubble_crop[interior] = np.median(background, axis=0).astype(np.uint8)
+        return True
+
+    def process_page(self, image_path: str, output_path: str):
+        """Translate one page and write it to output_path."""
+        self.process_pages([(image_path, output_path)])
+
+    def process_pages(self, pages: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """Process (image_path, output_path) pairs as one chapter through a PagePipeline.
+
+        Lines repeated across the chapter are translated once, and every page is on disk when this
+        returns. Returns (image_path, error) for the pages that failed; they have been reported already.
+        """
+        return [(image_path, error) for image_path, error in PagePipeline(self).run(pages) if error]
+
+    def set_output_format(self, output_format: str = "same", jpeg_quality: int = DEFAULT_JPEG_QUALITY,
+                          webp_quality: int = DEFAULT_WEBP_QUALITY,
+                          png_compression: Optional[int] = DEFAULT_PNG_COMPRESSION):
+        """Switch the output format and quality for pages encoded from now on, keeping the running stats."""
+        encoder = PageEncoder(output_format, jpeg_quality=jpeg_quality, webp_quality=webp_quality,
+                              png_compression=png_compression)
+        encoder.stats = self.encoder.stats
+        self.encoder = encoder
+
+    def translate_image(self, image: np.ndarray, page_hash: Optional[str] = None
+                        ) -> Tuple[PageArtifacts, Dict[str, str]]:
+        """Recognize, translate and typeset one decoded page in place.
+
+        Returns the page's artifacts and the translations used; lines whose request failed are
+        missing from the latter and their bubbles are left untouched.
+        """
+        recognized = self.recognize_page(image, page_hash)
+        translated = self.translate_texts(recognized.texts) if recognized.bubbles else {}
+        self.render_page(image, recognized.bubbles, recognized.texts, translated, recognized.masks)
+        return recognized, translated
+
+    def render_page(self, image: np.ndarray, bubbles: List[List[int]], original_texts: Optional[List[str]] = None,
+                    translated: Optional[Dict[str, str]] = None,
+                    masks: Optional[List[Optional[np.ndarray]]] = None) -> np.ndarray:
+        """Clean and typeset the page's bubbles into image, in place, and return it."""
+        if not bubbles:
+            return image
+        translations = self._ocr_and_translate(image, bubbles, original_texts, translated, masks)
+        return self._apply_translations(image, translations, in_place=True)
 
     def close(self):
-        self.tm.close()
\ No newline at end of file
+        self.translation_client.close()
+        self.tm.close()
+        if self.ocr_cache is not None:
+            self.ocr_cache.close()
\ No newline at end of file
@@ -0,0 +1,121 @@
+import math
+import threading
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+
+class Layout(NamedTuple):
+    font_size: int
+    text: str
+    width: int
+    height: int
+
+
+class Typesetter:
+    """Fits translated text into bubble boxes.
+
+    Picks the largest font size from max_font_size down to min_font_size whose wrapped text fits,
+    falling back to min_font_size when none does. Fonts are loaded once per size, line
+    measurements are memoized per size, and finished layouts are kept in an LRU keyed by
+    (text, box size) since the same lines recur across a chapter.
+
+    Sizes are tried from the top down rather than bisected: with greedy wrapping and a strict fit
+    test, fitting is not monotonic in font size, and bisecting picks a different size for a
+    noticeable share of bubbles.
+    """
+
+    def __init__(self, font_path: str, max_font_size: int = 30, min_font_size: int = 9,
+                 layout_cache_size: int = 4096):
+        self.font_path = font_path
+        self.max_font_size = max_font_size
+        self.min_font_size = min_font_size
+        self.layout_cache_size = layout_cache_size
+        self._fonts: Dict[int, ImageFont.FreeTypeFont] = {}
+        self._line_widths: Dict[Tuple[int, str], int] = {}
+        self._text_sizes: Dict[Tuple[int, str], Tuple[int, int]] = {}
+        self._layouts = OrderedDict()
+        # Only used for measuring; textbbox does not depend on the canvas it is called on.
+        self._measure = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+        # FreeType faces are not safe to use from several threads at once.
+        self.lock = threading.RLock()
+
+    def font(self, size: int) -> ImageFont.FreeTypeFont:
+        font = self._fonts.get(size)
+        if font is None:
+            font = self._fonts[size] = ImageFont.truetype(self.font_path, size)
+        return font
+
+    def _line_width(self, size: int, line: str) -> int:
+        key = (size, line)
+        width = self._line_widths.get(key)
+        if width is None:
+            width = self._line_widths[key] = self.font(size).getbbox(line)[2]
+            if len(self._line_widths) > 100000:
+                self._line_widths.clear()
+        return width
+
+    def wrap(self, text: str, size: int, max_width: int) -> str:
+        # Greedy word wrap, measuring each candidate line exactly as it would be drawn.
+        lines = []
+        current_line = ""
+        for word in text.split():
+            test_line = f"{current_line} {word}".strip()
+            if self._line_width(size, test_line) <= max_width:
+                current_line = test_line
+            else:
+                lines.append(current_line)
+                current_line = word
+        lines.append(current_line)
+        return "\n".join(lines)
+
+    def _text_size(self, size: int, wrapped: str) -> Tuple[int, int]:
+        # Measuring multiline text dominates fitting; different box sizes often wrap a line the same way.
+        key = (size, wrapped)
+        text_size = self._text_sizes.get(key)
+        if text_size is None:
+            left, top, right, bottom = self._measure.textbbox((0, 0), wrapped, font=self.font(size), align="center")
+            text_size = self._text_sizes[key] = (right - left, bottom - top)
+            if len(self._text_sizes) > 100000:
+                self._text_sizes.clear()
+        return text_size
+
+    def _try_size(self, text: str, size: int, box_w: int, box_h: int) -> Tuple[Layout, bool]:
+        wrapped = self.wrap(text, size, box_w)
+        layout = Layout(size, wrapped, *self._text_size(size, wrapped))
+        return layout, layout.width < box_w and layout.height < box_h
+
+    def layout(self, text: str, box_w: int, box_h: int) -> Layout:
+        key = (text, box_w, box_h)
+        with self.lock:
+            cached = self._layouts.get(key)
+            if cached is not None:
+                self._layouts.move_to_end(key)
+                return cached
+
+            for size in range(self.max_font_size, self.min_font_size - 1, -1):
+                best, fits = self._try_size(text, size, box_w, box_h)
+                if fits:
+                    break
+
+            self._layouts[key] = best
+            if len(self._layouts) > self.layout_cache_size:
+                self._layouts.popitem(last=False)
+            return best
+
+    def render_mask(self, layout: Layout, x: float, y: float) -> Tuple[np.ndarray, int, int]:
+        """Rasterize a layout drawn at (x, y) into a small 8-bit coverage tile.
+
+        Returns the tile and the page coordinates of its top-left corner. The tile sits on whole
+        pixels and the text keeps its sub-pixel offset inside it, so the pixels match drawing the
+        text straight onto the full page.
+        """
+        with self.lock:
+            font = self.font(layout.font_size)
+            left, top, right, bottom = self._measure.textbbox((x, y), layout.text, font=font, align="center")
+            tile_x, tile_y = math.floor(left) - 1, math.floor(top) - 1
+            tile = Image.new("L", (math.ceil(right) - tile_x + 1, math.ceil(bottom) - tile_y + 1), 0)
+            ImageDraw.Draw(tile).text((x - tile_x, y - tile_y), layout.text, font=font, fill=255, align="center")
+        return np.asarray(tile), tile_x, tile_y
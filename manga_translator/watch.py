@@ -0,0 +1,227 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Iterator, Optional, Tuple
+
+from .batch import IMAGE_EXTENSIONS
+from .manifest import RunManifest, file_hash
+
+# A file counts as fully written once its size and modification time have held still this long.
+SETTLE_SECONDS = 2.0
+# How often the folder is rescanned when no change notifications are available.
+POLL_INTERVAL = 1.0
+# A file that has settled but still lacks its end-of-image marker is handed on after this long
+# anyway, so a truncated upload shows up as a decode error instead of being waited on forever.
+INCOMPLETE_TIMEOUT = 60.0
+
+
+def _signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _looks_complete(path: str) -> bool:
+    """Whether a PNG or JPEG ends with its end-of-image marker; other files are taken on trust."""
+    try:
+        with open(path, "rb") as f:
+            f.seek(max(0, os.path.getsize(path) - 64))
+            tail = f.read()
+    except OSError:
+        return False
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".png":
+        return tail[-8:-4] == b"IEND"
+    if ext in (".jpg", ".jpeg"):
+        # Some writers pad past the marker.
+        return tail.rstrip(b"\x00").endswith(b"\xff\xd9")
+    return True
+
+
+class FolderWatcher:
+    """Reports image files dropped into a folder once they have finished being written.
+
+    Change notifications come from watchdog when it is installed (inotify on Linux, the native
+    API on Windows and macOS); otherwise the folder is rescanned every poll_interval. Either
+    way, changes to a file only restart its settle timer, and it is reported once its size and
+    modification time have not moved for settle_seconds and, for PNG and JPEG, its end-of-image
+    marker is present. Each version of a file is reported at most once.
+    """
+
+    def __init__(self, input_dir: str, settle_seconds: float = SETTLE_SECONDS, poll_interval: float = POLL_INTERVAL,
+                 use_events: bool = True, include_existing: bool = True):
+        self.input_dir = input_dir
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        # path -> (signature, time it was first seen with that signature)
+        self._candidates: Dict[str, Tuple[Optional[Tuple[int, int]], float]] = {}
+        self._reported: Dict[str, Tuple[int, int]] = {}
+        self._scanned: Dict[str, Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+        self._observer = self._start_observer() if use_events else None
+        if include_existing:
+            self._scan()
+        else:
+            self._reported = {path: signature for path, signature in self._listing().items()}
+            self._scanned = dict(self._reported)
+
+    @property
+    def mode(self) -> str:
+        return "events" if self._observer is not None else "polling"
+
+    def _start_observer(self):
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            print("⚠️ watchdog is not installed; polling the folder for new pages instead.")
+            return None
+
+        watcher = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_created(self, event):
+                watcher._touch(event.src_path)
+
+            def on_modified(self, event):
+                watcher._touch(event.src_path)
+
+            def on_moved(self, event):
+                watcher._touch(event.dest_path)
+
+        observer = Observer()
+        observer.schedule(_Handler(), self.input_dir, recursive=False)
+        try:
+            observer.start()
+        except OSError as e:
+            # e.g. the inotify watch limit is exhausted.
+            print(f"⚠️ Could not watch {self.input_dir} for changes ({e}); polling instead.")
+            return None
+        return observer
+
+    @staticmethod
+    def _is_page(name: str) -> bool:
+        # Hidden files include the .partial files written by write_bytes_atomic and most tools' temp files.
+        return not name.startswith(".") and name.lower().endswith(IMAGE_EXTENSIONS)
+
+    def _touch(self, path: str):
+        if os.path.dirname(os.path.abspath(path)) != os.path.abspath(self.input_dir):
+            return
+        if not self._is_page(os.path.basename(path)):
+            return
+        with self._lock:
+            self._candidates[path] = (None, time.monotonic())
+
+    def _listing(self) -> Dict[str, Tuple[int, int]]:
+        listing = {}
+        try:
+            entries = list(os.scandir(self.input_dir))
+        except OSError as e:
+            print(f"⚠️ Could not list {self.input_dir}: {e}")
+            return listing
+        for entry in entries:
+            if entry.is_file() and self._is_page(entry.name):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                listing[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        return listing
+
+    def _scan(self):
+        listing = self._listing()
+        with self._lock:
+            for path, signature in listing.items():
+                if self._scanned.get(path) != signature:
+                    self._candidates.setdefault(path, (None, time.monotonic()))
+            self._scanned = listing
+
+    def _settled(self) -> Iterator[str]:
+        now = time.monotonic()
+        with self._lock:
+            candidates = list(self._candidates.items())
+        for path, (previous, since) in candidates:
+            signature = _signature(path)
+            with self._lock:
+                if signature is None:
+                    # Deleted, or renamed away, before it settled.
+                    self._candidates.pop(path, None)
+                    continue
+                if signature != previous:
+                    self._candidates[path] = (signature, now)
+                    continue
+                if now - since < self.settle_seconds:
+                    continue
+                if signature == self._reported.get(path):
+                    self._candidates.pop(path, None)
+                    continue
+                if not _looks_complete(path) and now - since < INCOMPLETE_TIMEOUT:
+                    continue
+                self._candidates.pop(path, None)
+                self._reported[path] = signature
+            yield path
+
+    def pages(self, stop: threading.Event) -> Iterator[str]:
+        """Yield settled page paths until stop is set."""
+        tick = min(self.poll_interval, self.settle_seconds / 4) if self._observer else self.poll_interval
+        while not stop.is_set():
+            if self._observer is None:
+                self._scan()
+            for path in self._settled():
+                yield path
+            stop.wait(tick)
+
+    def close(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+
+
+def pending_pages(watcher: FolderWatcher, output_dir: str, manifest: RunManifest, stop: threading.Event,
+                  output_name: Optional[Callable[[str], str]] = None) -> Iterator[Tuple[str, str, str]]:
+    """(input_path, output_path, input_hash) for each settled page whose output is missing or out of date.
+
+    output_name maps a page's file name to its output's, e.g. PageEncoder.output_name; by default
+    outputs keep the input's name.
+    """
+    for input_path in watcher.pages(stop):
+        name = os.path.basename(input_path)
+        output_path = os.path.join(output_dir, output_name(name) if output_name else name)
+        try:
+            input_hash = file_hash(input_path)
+        except OSError as e:
+            print(f"⚠️ Skipping {input_path}: {e}")
+            continue
+        # Re-saved or re-copied pages with the same content are not translated again.
+        if not manifest.is_current(output_path, input_hash):
+            yield input_path, output_path, input_hash
+
+
+def translate_as_they_land(pipeline, watcher: FolderWatcher, output_dir: str, manifest: RunManifest,
+                           stop: threading.Event) -> Iterator[Tuple[str, Optional[str]]]:
+    """Feed pages into a PagePipeline as they settle; yields (input_path, error) per page and records successes.
+
+    Runs until stop is set, then finishes the pages already in flight.
+    """
+    queued: Deque[Tuple[str, str]] = deque()
+
+    def pairs():
+        for input_path, output_path, input_hash in pending_pages(watcher, output_dir, manifest, stop,
+                                                                 pipeline.translator.encoder.output_name):
+            queued.append((output_path, input_hash))
+            yield input_path, output_path
+
+    results = pipeline.run(pairs())
+    try:
+        for input_path, error in results:
+            # Pages come out of the pipeline in the order they went in.
+            output_path, input_hash = queued.popleft()
+            if not error:
+                manifest.record(output_path, input_hash)
+            yield input_path, error
+    finally:
+        results.close()
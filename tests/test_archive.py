@@ -0,0 +1,88 @@
+import zipfile
+
+import cv2
+import numpy as np
+
+from manga_translator.archive import translate_archive
+from manga_translator.encoder import PageEncoder
+from manga_translator.translator import MangaTranslator
+
+COMIC_INFO = b"<?xml version='1.0'?><ComicInfo><Title>Chapter 1</Title></ComicInfo>"
+
+
+class _InvertingTranslator:
+    """Finds no bubbles and "translates" a page by inverting it, so translated entries are easy to tell apart."""
+
+    detection_batch_size = 2
+    read_page = staticmethod(MangaTranslator.read_page)
+    decode_page = staticmethod(MangaTranslator.decode_page)
+
+    def __init__(self, output_format="same"):
+        self.encoder = PageEncoder(output_format)
+
+    def cached_recognition(self, page_hash):
+        return None
+
+    def detect_bubbles_batch(self, images, batch_size=None):
+        return [([], []) for _ in images]
+
+    @staticmethod
+    def _crop_bubbles(image, bubbles):
+        return []
+
+    def ocr_crops(self, crops):
+        return []
+
+    def store_recognition(self, *args):
+        pass
+
+    def translate_texts(self, texts):
+        return {}
+
+    def render_page(self, image, bubbles, texts, translated, masks):
+        np.subtract(255, image, out=image)
+        return image
+
+
+def _page(value, ext):
+    return cv2.imencode(ext, np.full((12, 8, 3), value, np.uint8))[1].tobytes()
+
+
+def _chapter(path):
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("010.png", _page(30, ".png"))
+        archive.writestr(zipfile.ZipInfo("ComicInfo.xml", date_time=(2020, 5, 17, 12, 0, 0)), COMIC_INFO,
+                         compress_type=zipfile.ZIP_DEFLATED)
+        archive.writestr("002.png", b"not really a png")
+        archive.writestr("extras/credits.txt", b"scans by nobody")
+        archive.writestr("__MACOSX/._001.png", b"resource fork")
+        archive.writestr("001.png", _page(200, ".png"))
+
+
+def test_metadata_is_copied_and_failed_pages_keep_their_original(tmp_path):
+    source, output = tmp_path / "chapter.cbz", tmp_path / "out.cbz"
+    _chapter(source)
+    results = translate_archive(_InvertingTranslator(), str(source), str(output))
+
+    assert [name for name, _ in results] == ["001.png", "002.png", "010.png"]
+    assert [error is not None for _, error in results] == [False, True, False]
+    with zipfile.ZipFile(source) as original, zipfile.ZipFile(output) as translated:
+        assert translated.namelist() == ["ComicInfo.xml", "extras/credits.txt", "001.png", "002.png", "010.png"]
+        for name in ("ComicInfo.xml", "extras/credits.txt"):
+            assert translated.read(name) == original.read(name)
+            assert translated.getinfo(name).date_time == original.getinfo(name).date_time
+            assert translated.getinfo(name).compress_type == original.getinfo(name).compress_type
+        assert translated.read("002.png") == original.read("002.png")
+        page = cv2.imdecode(np.frombuffer(translated.read("001.png"), np.uint8), cv2.IMREAD_COLOR)
+        assert (page == 55).all()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["chapter.cbz", "out.cbz"]
+
+
+def test_translated_pages_are_renamed_to_the_output_format(tmp_path):
+    source, output = tmp_path / "chapter.cbz", tmp_path / "out.cbz"
+    _chapter(source)
+    translate_archive(_InvertingTranslator("webp"), str(source), str(output))
+    with zipfile.ZipFile(output) as translated:
+        # The failed page keeps its original entry, name and all.
+        assert translated.namelist() == ["ComicInfo.xml", "extras/credits.txt", "001.webp", "002.png", "010.webp"]
+        assert translated.read("001.webp")[8:12] == b"WEBP"
@@ -0,0 +1,50 @@
+import cv2
+import numpy as np
+
+from manga_translator.translator import MangaTranslator
+
+
+def _translator() -> MangaTranslator:
+    # _clean_bubble needs no models, so skip the constructor that loads them.
+    translator = MangaTranslator.__new__(MangaTranslator)
+    translator.fast_clean = False
+    return translator
+
+
+def _page(seed: int, bubbles):
+    rng = np.random.default_rng(seed)
+    height, width = 600, 400
+    y, x = np.mgrid[0:height, 0:width]
+    # Screentone-like texture, so inpainting has structure to continue into the bubbles.
+    tone = 128 + 60 * np.sin(x / 7.0) * np.cos(y / 11.0) + rng.normal(0, 8, (height, width))
+    page = np.repeat(np.clip(tone, 0, 255).astype(np.uint8)[..., None], 3, axis=2)
+    for x1, y1, x2, y2 in bubbles:
+        cv2.ellipse(page, ((x1 + x2) // 2, (y1 + y2) // 2), ((x2 - x1) // 2, (y2 - y1) // 2), 0, 0, 360,
+                    (250, 250, 250), -1)
+        for row in range(y1 + 12, y2 - 12, 18):
+            cv2.putText(page, "ABC", (x1 + 10, row), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (10, 10, 10), 2)
+    return page
+
+
+def _clean_full_page(page: np.ndarray, bbox):
+    # The whole-page inpaint ROI cleaning replaced: same text mask, but over the full page.
+    x1, y1, x2, y2 = bbox
+    gray = cv2.cvtColor(page[y1:y2, x1:x2], cv2.COLOR_BGR2GRAY)
+    _, text_mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    mask = np.zeros(page.shape[:2], dtype=np.uint8)
+    mask[y1:y2, x1:x2] = cv2.dilate(text_mask, np.ones((3, 3), np.uint8), iterations=2)
+    page[:] = cv2.inpaint(page, mask, inpaintRadius=MangaTranslator.INPAINT_RADIUS, flags=cv2.INPAINT_NS)
+
+
+def test_roi_inpainting_matches_full_page_inpainting():
+    # Includes bubbles touching the page edges and two that overlap.
+    bubbles = [[30, 40, 190, 160], [150, 120, 330, 260], [0, 400, 120, 520], [280, 480, 400, 600]]
+    translator = _translator()
+    for seed in range(3):
+        expected = _page(seed, bubbles)
+        actual = expected.copy()
+        for bbox in bubbles:
+            _clean_full_page(expected, bbox)
+            translator._clean_bubble(actual, bbox)
+        diff = np.abs(actual.astype(np.int16) - expected.astype(np.int16))
+        assert diff.max() == 0
@@ -0,0 +1,53 @@
+import cv2
+import numpy as np
+import pytest
+
+from manga_translator.encoder import OUTPUT_FORMATS, PageEncoder, output_filename, validate
+
+SIGNATURES = {".png": b"\x89PNG", ".jpg": b"\xff\xd8\xff", ".webp": b"RIFF"}
+
+
+@pytest.mark.parametrize("output_format", OUTPUT_FORMATS)
+def test_output_filename(output_format):
+    for name in ("001.png", "chapter 1/002.JPG", "page.v2.webp", "cover.jpeg"):
+        renamed = output_filename(name, output_format)
+        if output_format == "same":
+            assert renamed == name
+        else:
+            assert renamed == name.rsplit(".", 1)[0] + f".{output_format}"
+    assert output_filename("001.png", None) == "001.png"
+
+
+@pytest.mark.parametrize("output_format", OUTPUT_FORMATS)
+def test_validate_accepts_every_format_with_any_valid_settings(output_format):
+    validate(output_format)
+    validate(output_format, jpeg_quality=0, webp_quality=1, png_compression=0)
+    validate(output_format, jpeg_quality=100, webp_quality=101, png_compression=9)
+    validate(output_format, png_compression=None)
+
+
+@pytest.mark.parametrize("settings", [{"output_format": "gif"}, {"output_format": "JPG"},
+                                      {"output_format": "png", "jpeg_quality": 101},
+                                      {"output_format": "jpg", "jpeg_quality": -1},
+                                      {"output_format": "webp", "webp_quality": 0},
+                                      {"output_format": "webp", "webp_quality": 102},
+                                      {"output_format": "png", "png_compression": 10},
+                                      {"output_format": "same", "png_compression": -1}])
+def test_validate_rejects_bad_settings(settings):
+    with pytest.raises(ValueError):
+        validate(**settings)
+    with pytest.raises(ValueError):
+        PageEncoder(**settings)
+
+
+@pytest.mark.parametrize("output_format", OUTPUT_FORMATS)
+def test_encoder_writes_pages_in_the_output_format(output_format, tmp_path):
+    image = np.random.default_rng(0).integers(0, 256, (24, 16, 3), dtype=np.uint8)
+    encoder = PageEncoder(output_format, webp_quality=101)
+    path = tmp_path / encoder.output_name("page.jpg")
+    encoder.write(str(path), image)
+    data = path.read_bytes()
+    assert data.startswith(SIGNATURES[path.suffix])
+    if path.suffix != ".jpg":
+        assert np.array_equal(cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR), image)
+    assert encoder.stats.pages == 1 and encoder.stats.bytes == len(data)
@@ -0,0 +1,55 @@
+import random
+from difflib import SequenceMatcher
+
+from manga_translator.fuzzy import NGramIndex
+
+
+def test_match_of_different_length_is_found():
+    index = NGramIndex(threshold=0.8)
+    index.add("っあいうえおかきくけうひこ")
+    match = index.best_match("あいうえおかきくけこ")
+    assert match is not None
+    assert match[0] == "っあいうえおかきくけうひこ"
+    assert abs(match[1] - 20 / 23) < 1e-9
+
+
+def test_best_match_agrees_with_a_full_scan():
+    rng = random.Random(7)
+    alphabet = "あいうえおかきくけこさしすせそ。ー"
+    lines = sorted({"".join(rng.choices(alphabet, k=rng.randint(1, 14))) for _ in range(600)})
+    for threshold in (0.5, 0.8, 0.9):
+        index = NGramIndex(threshold=threshold)
+        for line in lines:
+            index.add(line)
+        for _ in range(60):
+            query = list(rng.choice(lines))
+            for _ in range(rng.randint(0, 3)):
+                if len(query) < 2:
+                    break
+                position = rng.randrange(len(query))
+                query[position:position + 1] = rng.choice([[], [rng.choice(alphabet)], [query[position], "。"]])
+            query = "".join(query)
+            best = max(SequenceMatcher(None, query, line, autojunk=False).ratio() for line in lines if line != query)
+            match = index.best_match(query)
+            if best >= threshold:
+                assert match is not None and abs(match[1] - best) < 1e-9, (threshold, query)
+            else:
+                assert match is None, (threshold, query)
+
+
+def test_removed_strings_are_never_matched_after_the_index_grows():
+    rng = random.Random(11)
+    alphabet = "あいうえおかきくけこ"
+    lines = sorted({"".join(rng.choices(alphabet, k=rng.randint(4, 20))) for _ in range(1500)})
+    index = NGramIndex(threshold=0.8)
+    for line in lines:
+        index.add(line)
+    removed = set(lines[::2])
+    for line in removed:
+        index.remove(line)
+    for query in lines[:60]:
+        match = index.best_match(query)
+        assert match is None or match[0] not in removed
+        best = max(SequenceMatcher(None, query, line, autojunk=False).ratio()
+                   for line in lines if line != query and line not in removed)
+        assert (match is not None) == (best >= 0.8)
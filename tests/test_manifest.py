@@ -0,0 +1,65 @@
+import os
+
+from manga_translator.manifest import RunManifest, config_version, write_bytes_atomic
+
+
+def _chapter(tmp_path):
+    input_dir, output_dir = tmp_path / "in", tmp_path / "out"
+    input_dir.mkdir()
+    output_dir.mkdir()
+    pairs = []
+    for name in ("001.png", "002.png"):
+        (input_dir / name).write_bytes(f"page {name}".encode("ascii"))
+        pairs.append((str(input_dir / name), str(output_dir / name)))
+    return output_dir, pairs
+
+
+def _translate(manifest, pending):
+    for input_path, output_path, input_hash in pending:
+        with open(input_path, "rb") as f:
+            write_bytes_atomic(output_path, b"translated " + f.read())
+        manifest.record(output_path, input_hash)
+
+
+def test_unchanged_pages_are_skipped(tmp_path):
+    output_dir, pairs = _chapter(tmp_path)
+    version = config_version({"font_path": "fonts/mangat.ttf", "max_in_flight": 4})
+    manifest = RunManifest(str(output_dir), version)
+    assert [p[:2] for p in manifest.pending(pairs)] == pairs
+    _translate(manifest, manifest.pending(pairs))
+
+    assert RunManifest(str(output_dir), version).pending(pairs) == []
+    # Settings that only affect speed do not invalidate finished pages.
+    assert RunManifest(str(output_dir), config_version({"font_path": "fonts/mangat.ttf",
+                                                        "max_in_flight": 16})).pending(pairs) == []
+
+
+def test_changed_input_settings_or_output_are_redone(tmp_path):
+    output_dir, pairs = _chapter(tmp_path)
+    version = config_version({"font_path": "fonts/mangat.ttf"})
+    manifest = RunManifest(str(output_dir), version)
+    _translate(manifest, manifest.pending(pairs))
+
+    other_settings = RunManifest(str(output_dir), config_version({"font_path": "fonts/other.ttf"}))
+    assert [p[:2] for p in other_settings.pending(pairs)] == pairs
+
+    with open(pairs[0][0], "ab") as f:
+        f.write(b" edited")
+    assert [p[:2] for p in RunManifest(str(output_dir), version).pending(pairs)] == pairs[:1]
+    _translate(manifest, manifest.pending(pairs))
+    assert RunManifest(str(output_dir), version).pending(pairs) == []
+
+    with open(pairs[1][1], "wb") as f:
+        f.write(b"touched up by hand")
+    assert [p[:2] for p in RunManifest(str(output_dir), version).pending(pairs)] == pairs[1:]
+    os.remove(pairs[1][1])
+    assert [p[:2] for p in RunManifest(str(output_dir), version).pending(pairs)] == pairs[1:]
+
+
+def test_leftover_partial_files_are_removed(tmp_path):
+    output_dir, pairs = _chapter(tmp_path)
+    (output_dir / ".001.partial-123-456.png").write_bytes(b"half a page")
+    (output_dir / ".onyx_manifest.json.partial-123").write_text("{")
+    (output_dir / ".hidden.png").write_bytes(b"not ours")
+    RunManifest(str(output_dir), config_version())
+    assert sorted(os.listdir(output_dir)) == [".hidden.png"]
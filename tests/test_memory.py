@@ -0,0 +1,90 @@
+import sqlite3
+
+from manga_translator.memory import TranslationMemory
+
+
+def _hold_write_lock(db_path):
+    # Keeps the background writer from committing until released, so queued rows stay pending.
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("BEGIN IMMEDIATE")
+    return conn
+
+
+def test_write_behind_add_is_visible_before_and_after_flush(tmp_path):
+    db_path = str(tmp_path / "tm.db")
+    tm = TranslationMemory(db_path, serve_unreviewed=True, write_behind=True)
+    blocker = _hold_write_lock(db_path)
+    try:
+        tm.add_translation("猫", "cat")
+        assert tm.lookup("猫") == "cat"
+        assert tm.lookup_many(["猫", "犬"]) == {"猫": "cat"}
+    finally:
+        blocker.rollback()
+        blocker.close()
+    tm.flush()
+    assert tm.lookup("猫") == "cat"
+    tm.close()
+
+
+def test_write_behind_lookup_without_cache_sees_queued_rows(tmp_path):
+    db_path = str(tmp_path / "tm.db")
+    tm = TranslationMemory(db_path, cache_size=0, serve_unreviewed=True, write_behind=True)
+    blocker = _hold_write_lock(db_path)
+    try:
+        tm.add_translations([("猫", "cat"), ("犬", "dog")])
+        assert tm.lookup("犬") == "dog"
+        assert tm.lookup_many(["猫", "犬", "鳥"]) == {"猫": "cat", "犬": "dog"}
+    finally:
+        blocker.rollback()
+        blocker.close()
+    tm.flush()
+    assert tm.lookup_many(["猫", "犬", "鳥"]) == {"猫": "cat", "犬": "dog"}
+    tm.close()
+
+
+def test_cached_miss_is_replaced_by_a_queued_add(tmp_path):
+    db_path = str(tmp_path / "tm.db")
+    tm = TranslationMemory(db_path, serve_unreviewed=True, write_behind=True)
+    assert tm.lookup("猫") is None
+    tm.add_translation("猫", "cat")
+    assert tm.lookup("猫") == "cat"
+    tm.flush()
+    tm.add_translation("猫", "kitty")
+    assert tm.lookup("猫") == "cat"
+    tm.close()
+
+
+def test_fuzzy_index_is_built_at_open_and_follows_changes(tmp_path):
+    db_path = str(tmp_path / "tm.db")
+    tm = TranslationMemory(db_path, serve_unreviewed=True)
+    tm.add_translations([("あいうえおかきくけこ", "alphabet")])
+    tm.close()
+
+    tm = TranslationMemory(db_path, serve_unreviewed=True, fuzzy_threshold=0.8)
+    tm.add_translation("さしすせそたちつてと", "more")
+    assert tm.lookup_fuzzy("あいうえおかきくけこ。") == ("alphabet", "あいうえおかきくけこ", 20 / 21)
+    assert tm.lookup_fuzzy("さしすせそたちつてと。")[0] == "more"
+    tm.delete_entry("あいうえおかきくけこ")
+    assert tm.lookup_fuzzy("あいうえおかきくけこ。") is None
+    tm.close()
+
+
+def test_reload_picks_up_edits_from_another_connection(tmp_path):
+    db_path = str(tmp_path / "tm.db")
+    service_tm = TranslationMemory(db_path, serve_unreviewed=True, fuzzy_threshold=0.8)
+    service_tm.add_translations([("猫が好き", "I like cats"), ("犬が好き", "I like dogs")])
+    assert service_tm.lookup("猫が好き") == "I like cats"
+    assert service_tm.reload_if_changed() is False
+
+    editor_tm = TranslationMemory(db_path)
+    editor_tm.update_translation("猫が好き", "I love cats")
+    editor_tm.delete_entry("犬が好き")
+    editor_tm.close()
+
+    assert service_tm.lookup("猫が好き") == "I like cats"
+    assert service_tm.reload_if_changed() is True
+    assert service_tm.lookup("猫が好き") == "I love cats"
+    assert service_tm.lookup("犬が好き") is None
+    assert service_tm.lookup_fuzzy("猫が好き。")[0] == "I love cats"
+    assert service_tm.reload_if_changed() is False
+    service_tm.close()
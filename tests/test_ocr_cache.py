@@ -0,0 +1,38 @@
+import cv2
+import numpy as np
+
+from manga_translator.ocr_cache import OcrCache, crop_signature
+
+
+def _bubble(last_line, width=520, height=700):
+    img = np.full((height, width, 3), 255, np.uint8)
+    for i, line in enumerate(["THE QUICK", "BROWN FOX", "JUMPS OVER", last_line]):
+        cv2.putText(img, line, (60, 150 + 110 * i), cv2.FONT_HERSHEY_SIMPLEX, 2.0, (0, 0, 0), 5)
+    return img
+
+
+def _jpeg(img, quality):
+    return cv2.imdecode(cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])[1], cv2.IMREAD_COLOR)
+
+
+def _cached_text(cached, query):
+    cache = OcrCache(":memory:")
+    cache.put_many([crop_signature(cached)], ["cached text"])
+    return cache.get_many([crop_signature(query)])[0]
+
+
+def test_reencoded_crop_hits():
+    crop = _bubble("IT.")
+    assert _cached_text(crop, _jpeg(crop, 75)) == "cached text"
+
+
+def test_near_duplicate_crops_miss():
+    assert _cached_text(_bubble("IT."), _bubble("IT,")) is None
+    assert _cached_text(_bubble("IT."), _bubble("IS.")) is None
+
+
+def test_small_near_duplicate_crops_miss():
+    period = cv2.resize(_bubble("IT."), (130, 175), interpolation=cv2.INTER_AREA)
+    comma = cv2.resize(_bubble("IT,"), (130, 175), interpolation=cv2.INTER_AREA)
+    assert _cached_text(period, _jpeg(period, 75)) == "cached text"
+    assert _cached_text(period, comma) is None
@@ -0,0 +1,107 @@
+import random
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from manga_translator.encoder import PageEncoder
+from manga_translator.pipeline import PagePipeline, Pipeline, Stage
+from manga_translator.translator import MangaTranslator
+
+
+def _jitter(value):
+    time.sleep(random.random() * 0.005)
+    return value
+
+
+def test_results_come_out_in_input_order():
+    pipeline = Pipeline([
+        Stage("a", _jitter, workers=4),
+        Stage("b", lambda batch: [_jitter(value) * 2 for value in batch], workers=3, batch_size=3),
+        Stage("c", _jitter, workers=2),
+    ], queue_size=2)
+    assert list(pipeline.run(range(60))) == [(i * 2, None) for i in range(60)]
+
+
+def test_a_failing_payload_skips_later_stages_and_the_run_goes_on():
+    reached_last = []
+
+    def check(value):
+        if value % 5 == 3:
+            raise ValueError(f"bad {value}")
+        return value
+
+    def last(batch):
+        reached_last.extend(batch)
+        return batch
+
+    pipeline = Pipeline([Stage("check", check, workers=2), Stage("last", last, batch_size=4)])
+    results = list(pipeline.run(range(12)))
+    assert [value for value, _ in results] == list(range(12))
+    assert [error for _, error in results if error] == ["check: ValueError: bad 3", "check: ValueError: bad 8"]
+    assert sorted(reached_last) == [v for v in range(12) if v % 5 != 3]
+
+
+class _FakeTranslator:
+    """Every page has one bubble; no models are involved."""
+
+    detection_batch_size = 2
+    read_page = staticmethod(MangaTranslator.read_page)
+    decode_page = staticmethod(MangaTranslator.decode_page)
+
+    def __init__(self):
+        self.encoder = PageEncoder()
+
+    def cached_recognition(self, page_hash):
+        return None
+
+    def detect_bubbles_batch(self, images, batch_size=None):
+        return [([[0, 0, 2, 2]], [None]) for _ in images]
+
+    @staticmethod
+    def _crop_bubbles(image, bubbles):
+        return [image[y1:y2, x1:x2] for x1, y1, x2, y2 in bubbles]
+
+    def ocr_crops(self, crops):
+        return ["猫"] * len(crops)
+
+    def store_recognition(self, *args):
+        pass
+
+    def translate_texts(self, texts):
+        return {text: "cat" for text in texts}
+
+    def render_page(self, image, bubbles, texts, translated, masks):
+        return image
+
+
+def _pages(tmp_path, sizes):
+    pages = []
+    for i, (height, width) in enumerate(sizes):
+        input_path = str(tmp_path / f"{i:03d}.png")
+        cv2.imwrite(input_path, np.full((height, width, 3), 255, np.uint8))
+        pages.append((input_path, str(tmp_path / f"out_{i:03d}.png")))
+    return pages
+
+
+def test_page_errors_are_reported_in_order(tmp_path):
+    pages = _pages(tmp_path, [(16, 16)] * 5)
+    with open(pages[2][0], "wb") as f:
+        f.write(b"not an image")
+    results = list(PagePipeline(_FakeTranslator()).run(pages))
+    assert [path for path, _ in results] == [input_path for input_path, _ in pages]
+    assert [error is not None for _, error in results] == [False, False, True, False, False]
+    assert "Could not read image" in results[2][1]
+
+
+def test_pages_larger_than_the_pixel_budget_do_not_deadlock(tmp_path):
+    pages = _pages(tmp_path, [(400, 300), (16, 16), (500, 200), (400, 300)])
+    pipeline = PagePipeline(_FakeTranslator(), max_megapixels=0.01, queue_size=1)
+    results = []
+    runner = threading.Thread(target=lambda: results.extend(pipeline.run(pages)), daemon=True)
+    runner.start()
+    runner.join(timeout=30)
+    assert not runner.is_alive()
+    assert results == [(input_path, None) for input_path, _ in pages]
+    assert pipeline._budget.used == 0
@@ -0,0 +1,117 @@
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import cv2
+import numpy as np
+import pytest
+
+from manga_translator.artifacts import PageArtifacts
+from manga_translator.encoder import PageEncoder
+from manga_translator.memory import TranslationMemory
+from manga_translator.service import TOKEN_HEADER, ServiceClient, ServiceError, TranslationService, _Handler
+from manga_translator.translator import MangaTranslator
+
+
+class _FakeTranslator:
+    """Reads every page as one bubble saying 猫 and translates it from the TM, without any models."""
+
+    encoder = PageEncoder()
+    detection_batch_size = 1
+    decode_page = staticmethod(MangaTranslator.decode_page)
+
+    def __init__(self, tm):
+        self.tm = tm
+
+    def translate_image(self, image, page_hash=None):
+        translation = self.tm.lookup("猫")
+        return PageArtifacts([[0, 0, 4, 4]], [None], ["猫"]), {"猫": translation} if translation else {}
+
+
+@pytest.fixture
+def served(tmp_path):
+    tm = TranslationMemory(str(tmp_path / "tm.db"), serve_unreviewed=True)
+    pages = tmp_path / "pages"
+    pages.mkdir()
+    cv2.imwrite(str(pages / "001.png"), np.full((8, 8, 3), 255, np.uint8))
+    service = TranslationService(_FakeTranslator(tm), "v1", roots=[str(pages)])
+    # The same wiring as TranslationService.serve, on a free port and without touching ~/.onyx.
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.service = service
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield service, url, pages
+    server.shutdown()
+    server.server_close()
+    tm.close()
+
+
+def _status(url, data=None, headers=None):
+    request = urllib.request.Request(url, data=data, headers=headers or {})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def test_requests_without_the_token_are_rejected(served):
+    service, url, pages = served
+    assert _status(f"{url}/health") == 401
+    assert _status(f"{url}/health", headers={TOKEN_HEADER: "wrong"}) == 401
+    body = json.dumps({"input_path": str(pages / "001.png")}).encode("utf-8")
+    assert _status(f"{url}/page", body, {TOKEN_HEADER: "wrong", "Content-Type": "application/json"}) == 401
+    assert ServiceClient(url, token="wrong").health() is None
+    assert _status(f"{url}/health", headers={TOKEN_HEADER: service.token}) == 200
+    assert service.jobs == 0
+
+
+def test_paths_outside_the_roots_are_refused(served, tmp_path):
+    service, url, pages = served
+    client = ServiceClient(url, token=service.token)
+    outside = tmp_path / "outside.png"
+    cv2.imwrite(str(outside), np.full((8, 8, 3), 255, np.uint8))
+    os.symlink(outside, pages / "link.png")
+
+    with pytest.raises(ServiceError, match="outside the service's allowed folders"):
+        client.translate_file(str(outside), str(pages / "out.png"))
+    with pytest.raises(ServiceError, match="outside the service's allowed folders"):
+        client.translate_file(str(pages / "001.png"), str(tmp_path / "out.png"))
+    with pytest.raises(ServiceError, match="outside the service's allowed folders"):
+        client.translate_file(str(pages / "link.png"), str(pages / "out.png"))
+    with pytest.raises(ServiceError, match="outside the service's allowed folders"):
+        list(client.translate_chapter([(str(pages / "001.png"), str(pages / "out.png")),
+                                       (str(pages / "001.png"), str(tmp_path / "out.png"))]))
+    with pytest.raises(ServiceError, match="must be a"):
+        client.translate_file(str(pages / "001.png"), str(pages / "out.txt"))
+    assert not os.path.exists(tmp_path / "out.png") and not os.path.exists(pages / "out.png")
+    assert service.jobs == 0
+
+
+def test_non_json_bodies_are_rejected(served):
+    service, url, pages = served
+    body = json.dumps({"input_path": str(pages / "001.png")}).encode("utf-8")
+    assert _status(f"{url}/page", body, {TOKEN_HEADER: service.token}) == 415
+    assert _status(f"{url}/page", body, {TOKEN_HEADER: service.token, "Content-Type": "text/plain"}) == 415
+    assert _status(f"{url}/page", b"not json", {TOKEN_HEADER: service.token, "Content-Type": "application/json"}) == 400
+    assert _status(f"{url}/page", b"[]", {TOKEN_HEADER: service.token, "Content-Type": "application/json"}) == 400
+    assert service.jobs == 0
+
+
+def test_each_job_picks_up_tm_edits_made_elsewhere(served):
+    service, url, pages = served
+    client = ServiceClient(url, token=service.token)
+    service.translator.tm.add_translation("猫", "cat")
+    service.translator.tm.flush()
+    assert client.translate_file(str(pages / "001.png"), str(pages / "out.png"))[0]["translated_text"] == "cat"
+
+    editor_tm = TranslationMemory(service.translator.tm.db_path)
+    editor_tm.update_translation("猫", "kitty")
+    editor_tm.close()
+
+    assert client.translate_file(str(pages / "001.png"), str(pages / "out.png"))[0]["translated_text"] == "kitty"
+    assert service.jobs == 2
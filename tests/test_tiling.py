@@ -0,0 +1,43 @@
+import numpy as np
+
+from manga_translator.tiling import merge_tile_detections, tile_spans
+
+
+def test_spans_cover_the_strip_with_the_requested_overlap():
+    for height, tile_height, overlap in [(10000, 1200, 400), (1600, 1200, 400), (2000, 1200, 400), (7777, 900, 300)]:
+        spans = tile_spans(height, tile_height, overlap)
+        assert spans[0][0] == 0 and spans[-1][1] == height
+        assert all(bottom - top == tile_height for top, bottom in spans)
+        # Neighbouring bands share at least `overlap` rows; only the bottom-aligned last band may share more.
+        shared = [previous[1] - current[0] for previous, current in zip(spans, spans[1:])]
+        assert all(rows == overlap for rows in shared[:-1])
+        assert overlap <= shared[-1] < tile_height
+
+
+def test_short_strip_is_one_band():
+    assert tile_spans(900, 1200, 400) == [(0, 900)]
+    assert tile_spans(1200, 1200, 400) == [(0, 1200)]
+
+
+def test_bubble_crossing_a_seam_is_merged():
+    # Bands (0, 1200) and (800, 2000): the bubble spans rows 1000-1300, so the first band sees its
+    # top and the second the whole of it.
+    top_part = np.full((200, 300), 255, np.uint8)
+    whole = np.zeros((300, 300), np.uint8)
+    whole[150:] = 255
+    detections = [
+        ([[100, 300, 400, 500], [100, 1000, 400, 1200]], [None, top_part]),
+        ([[100, 1000, 400, 1300], [500, 1500, 700, 1700]], [whole, None]),
+    ]
+    boxes, masks = merge_tile_detections(detections)
+    assert boxes == [[100, 300, 400, 500], [100, 1000, 400, 1300], [500, 1500, 700, 1700]]
+    assert masks[0] is None and masks[2] is None
+    assert masks[1].shape == (300, 300)
+    # The first band's mask fills in the rows the second band's left empty.
+    assert masks[1].all()
+
+
+def test_distinct_bubbles_in_neighbouring_bands_are_kept_apart():
+    detections = [([[0, 1000, 100, 1150]], [None]), ([[60, 1100, 200, 1300]], [None])]
+    boxes, _ = merge_tile_detections(detections)
+    assert boxes == [[0, 1000, 100, 1150], [60, 1100, 200, 1300]]
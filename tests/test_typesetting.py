@@ -0,0 +1,76 @@
+import os
+import random
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+
+from manga_translator.translator import MangaTranslator, resource_path
+from manga_translator.typesetting import Typesetter
+
+WORDS = ["I", "can't", "believe", "it!", "What", "are", "you", "doing", "here?", "Wait...", "the", "treasure",
+         "is", "mine", "Onii-chan", "GRAAAAH", "a", "really-long-hyphenated-word"]
+
+
+@pytest.fixture(scope="module")
+def font_path(tmp_path_factory):
+    path = resource_path("fonts/mangat.ttf")
+    if os.path.isfile(path):
+        return path
+    # Without the bundled manga font, Pillow's own scalable default font stands in.
+    path = tmp_path_factory.mktemp("fonts") / "default.ttf"
+    path.write_bytes(ImageFont.load_default(size=20).font_bytes)
+    return str(path)
+
+
+def _baseline_text(image, bubbles, font_path):
+    # The original typesetting path: fit from size 30 down, then draw.text on an RGB copy of the page.
+    img_pil = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    draw = ImageDraw.Draw(img_pil)
+    for (x1, y1, x2, y2), text in bubbles:
+        bubble_w, bubble_h = (x2 - x1) - 15, (y2 - y1) - 15
+        font_size = 30
+        while font_size > 8:
+            font = ImageFont.truetype(font_path, font_size)
+            lines, current_line = [], ""
+            for word in text.split():
+                test_line = f"{current_line} {word}".strip()
+                if font.getbbox(test_line)[2] <= bubble_w:
+                    current_line = test_line
+                else:
+                    lines.append(current_line)
+                    current_line = word
+            lines.append(current_line)
+            wrapped_text = "\n".join(lines)
+            text_bbox = draw.textbbox((0, 0), wrapped_text, font=font, align="center")
+            text_w, text_h = text_bbox[2] - text_bbox[0], text_bbox[3] - text_bbox[1]
+            if text_w < bubble_w and text_h < bubble_h:
+                break
+            font_size -= 1
+        text_x = x1 + ((x2 - x1) - text_w) // 2
+        text_y = y1 + ((y2 - y1) - text_h) // 2
+        draw.text((text_x, text_y), wrapped_text, font=font, fill="black", align="center")
+    return cv2.cvtColor(np.array(img_pil), cv2.COLOR_RGB2BGR)
+
+
+def test_typeset_text_matches_drawing_on_the_page_with_pil(font_path):
+    rng = random.Random(3)
+    image = np.random.default_rng(3).integers(0, 256, (700, 500, 3), dtype=np.uint8)
+    bubbles = []
+    for _ in range(40):
+        x1, y1 = rng.randint(-10, 480), rng.randint(-10, 680)
+        box = [x1, y1, x1 + rng.randint(20, 260), y1 + rng.randint(20, 260)]
+        bubbles.append((box, " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 12)))))
+
+    expected = _baseline_text(image, bubbles, font_path)
+
+    typesetter = Typesetter(font_path, max_font_size=30)
+    for (x1, y1, x2, y2), text in bubbles:
+        layout = typesetter.layout(text, (x2 - x1) - 15, (y2 - y1) - 15)
+        text_x = x1 + ((x2 - x1) - layout.width) // 2
+        text_y = y1 + ((y2 - y1) - layout.height) // 2
+        coverage, tile_x, tile_y = typesetter.render_mask(layout, text_x, text_y)
+        MangaTranslator._blend_black_text(image, coverage, tile_x, tile_y)
+
+    assert np.array_equal(image, expected)